@@ -0,0 +1,395 @@
+"""
+Benchmarks of the routing, recording and evidence hot paths.
+
+For every storage backend and request count, the suite routes that many
+requests through route_request, records an outcome for each with
+record_delayed_outcome, then times compile_evidence and compute_statistics.
+It reports throughput and latency percentiles per operation and the peak
+traced memory of the whole workload, and can write the results as JSON so
+runs can be compared across commits.
+
+With --instrumentation it instead measures the per-call cost that
+src.instrumentation adds to route_request and record_delayed_outcome, with
+call timing only and with stage timing.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run --sizes 1e3 1e5 --backends memory columnar \\
+        --output results.json --baseline previous.json
+    python -m benchmarks.run --instrumentation
+
+Sizes up to 1e7 are supported; the database backend (in-memory SQLite) is
+only practical up to ~1e5.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from src import core, instrumentation
+from src.database import get_engine, get_session_factory, init_db
+from src.statistics import compute_statistics
+from src.storage import ConcurrentInMemoryStorage, DatabaseStorage, InMemoryStorage
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+WARMUP_SIZE = 100
+
+# compile_evidence calls timed per case; each reads running aggregates
+EVIDENCE_CALLS = 100
+
+# compute_statistics on raw outcome arrays is O(n): repeat it until about
+# this many outcomes have been processed, within [3, 100] calls
+STATISTICS_WORK = 10_000_000
+
+# Instrumentation settings compared by instrumentation_overhead
+INSTRUMENTATION_MODES = {
+    "off": None,
+    "calls": {"stages": False},
+    "stages": {"stages": True},
+}
+
+
+def _database_storage():
+    engine = get_engine("sqlite://")
+    init_db(engine)
+    return DatabaseStorage(get_session_factory(engine))
+
+
+BACKENDS = {
+    "memory": InMemoryStorage,
+    "columnar": lambda: InMemoryStorage(columnar=True, store_input=False),
+    "concurrent": ConcurrentInMemoryStorage,
+    "database": _database_storage,
+}
+
+
+def _summarise(latencies_ns, seconds):
+    # Throughput and latency percentiles of one operation
+    latencies_us = latencies_ns / 1000
+    p50, p90, p99 = np.percentile(latencies_us, [50, 90, 99])
+    return {
+        "calls": len(latencies_ns),
+        "seconds": seconds,
+        "throughput_per_s": len(latencies_ns) / seconds if seconds > 0 else None,
+        "latency_us": {
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+            "max": float(latencies_us.max()),
+        },
+    }
+
+
+def _timed(call, arguments):
+    # Call once per argument, timing every call
+    latencies = np.empty(len(arguments), dtype=np.int64)
+    results = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, argument in enumerate(arguments):
+        before = clock()
+        results.append(call(argument))
+        latencies[i] = clock() - before
+    seconds = (clock() - start) / 1e9
+    return results, latencies, seconds
+
+
+def _workload(make_storage, size, seed):
+    # Route, record and compile evidence against a fresh backend; returns
+    # the per-operation measurements
+    rng = np.random.default_rng(seed)
+    outcomes = rng.normal(0.5, 0.1, size).tolist()
+    backend = make_storage()
+    previous = core.storage
+    core.set_storage(backend)
+    try:
+        core.register_models(lambda x: x, lambda x: x)
+        operations = {}
+
+        routed, latencies, seconds = _timed(
+            lambda x: core.route_request(x, probability_split=0.5), range(size)
+        )
+        operations["route_request"] = _summarise(latencies, seconds)
+
+        request_ids = [request_id for _, request_id in routed]
+        _, latencies, seconds = _timed(
+            lambda i: core.record_delayed_outcome(request_ids[i], outcomes[i]),
+            range(size),
+        )
+        operations["record_delayed_outcome"] = _summarise(latencies, seconds)
+
+        _, latencies, seconds = _timed(
+            lambda _: core.compile_evidence(), range(EVIDENCE_CALLS)
+        )
+        operations["compile_evidence"] = _summarise(latencies, seconds)
+
+        values = np.asarray(outcomes)
+        half = size // 2
+        halves = (values[:half], values[half:])
+        repeats = min(max(STATISTICS_WORK // size, 3), 100)
+        _, latencies, seconds = _timed(
+            lambda _: compute_statistics(*halves), range(repeats)
+        )
+        operations["compute_statistics"] = _summarise(latencies, seconds)
+        return operations
+    finally:
+        core.set_storage(previous)
+        if isinstance(backend, DatabaseStorage):
+            backend.close()
+
+
+def _peak_memory(make_storage, size, seed):
+    # Peak traced allocation of the workload. A separate pass, since tracing
+    # every allocation slows the timed paths down.
+    tracemalloc.start()
+    try:
+        _workload(make_storage, size, seed)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _per_call_us(call, arguments):
+    # Mean wall time of call over arguments, without per-call clock reads
+    clock = time.perf_counter_ns
+    start = clock()
+    for argument in arguments:
+        call(argument)
+    return (clock() - start) / len(arguments) / 1000
+
+
+def instrumentation_overhead(size=50_000, repeats=5, backend="columnar"):
+    """
+    Measure what src.instrumentation adds to the routing and recording calls.
+
+    Parameters:
+    size : int
+        Requests routed and outcomes recorded per measurement.
+    repeats : int
+        Measurements per mode; the modes are interleaved and the fastest
+        measurement of each is kept, which filters out scheduling noise.
+    backend : str
+        Key of BACKENDS to route into.
+
+    Returns:
+    dict
+        Per mode of INSTRUMENTATION_MODES ("off", "calls", "stages"): the
+        mean microseconds per route_request and record_delayed_outcome,
+        and for the enabled modes the overhead over "off".
+    """
+    best = {mode: {} for mode in INSTRUMENTATION_MODES}
+    previous = core.storage
+    was_enabled, had_stages = instrumentation.enabled, instrumentation.stage_timing
+    try:
+        for _ in range(repeats):
+            for mode, options in INSTRUMENTATION_MODES.items():
+                core.set_storage(BACKENDS[backend]())
+                core.register_models(lambda x: x, lambda x: x)
+                if options is None:
+                    instrumentation.disable()
+                else:
+                    instrumentation.enable(**options)
+                routed = []
+                route_us = _per_call_us(
+                    lambda x: routed.append(core.route_request(x, 0.5)[1]),
+                    range(size),
+                )
+                record_us = _per_call_us(
+                    lambda request_id: core.record_delayed_outcome(request_id, 1.0),
+                    routed,
+                )
+                for name, value in (
+                    ("route_request_us", route_us),
+                    ("record_delayed_outcome_us", record_us),
+                ):
+                    best[mode][name] = min(best[mode].get(name, value), value)
+    finally:
+        core.set_storage(previous)
+        instrumentation.disable()
+        instrumentation.reset()
+        if was_enabled:
+            instrumentation.enable(stages=had_stages)
+
+    for mode in INSTRUMENTATION_MODES:
+        if mode != "off":
+            for name in list(best[mode]):
+                best[mode][name.replace("_us", "_overhead_us")] = (
+                    best[mode][name] - best["off"][name]
+                )
+    return best
+
+
+def _format_overhead(overhead):
+    lines = [f"{'mode':<8}{'route us':>10}{'+us':>8}{'record us':>11}{'+us':>8}"]
+    for mode, costs in overhead.items():
+        lines.append(
+            f"{mode:<8}{costs['route_request_us']:>10.2f}"
+            f"{costs.get('route_request_overhead_us', 0.0):>8.2f}"
+            f"{costs['record_delayed_outcome_us']:>11.2f}"
+            f"{costs.get('record_delayed_outcome_overhead_us', 0.0):>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, backends=tuple(BACKENDS), memory=True, seed=0):
+    """
+    Run the benchmark suite.
+
+    Parameters:
+    sizes : sequence of int
+        Numbers of requests to route and record per case.
+    backends : sequence of str
+        Keys of BACKENDS to benchmark.
+    memory : bool
+        Also measure peak memory with tracemalloc (one extra, untimed pass
+        per case).
+    seed : int
+        Seed of the generated outcomes.
+
+    Returns:
+    dict
+        {"environment": ..., "results": [...]} with one result per
+        (backend, size): its operations (calls, seconds, throughput_per_s
+        and latency_us percentiles per operation) and peak_memory_bytes.
+    """
+    results = []
+    for backend in backends:
+        make_storage = BACKENDS[backend]
+        # Untimed warm-up, so one-off costs (lazy imports, first bucket
+        # table) do not land in the first case
+        _workload(make_storage, WARMUP_SIZE, seed)
+        for size in sizes:
+            results.append(
+                {
+                    "backend": backend,
+                    "size": size,
+                    "operations": _workload(make_storage, size, seed),
+                    "peak_memory_bytes": (
+                        _peak_memory(make_storage, size, seed) if memory else None
+                    ),
+                }
+            )
+    return {"environment": _environment(), "results": results}
+
+
+def _format_report(report, baseline=None):
+    # Plain-text table; with a baseline, throughput relative to it
+    previous = {}
+    if baseline is not None:
+        for result in baseline["results"]:
+            for name, operation in result["operations"].items():
+                key = (result["backend"], result["size"], name)
+                previous[key] = operation["throughput_per_s"]
+
+    header = (
+        f"{'backend':<11}{'size':>10}  {'operation':<23}{'ops/s':>12}"
+        f"{'p50 us':>10}{'p99 us':>10}{'peak MiB':>10}"
+    )
+    if previous:
+        header += f"{'vs base':>9}"
+    lines = [header]
+    for result in report["results"]:
+        peak = result["peak_memory_bytes"]
+        for name, operation in result["operations"].items():
+            latency = operation["latency_us"]
+            line = (
+                f"{result['backend']:<11}{result['size']:>10}  {name:<23}"
+                f"{operation['throughput_per_s'] or 0:>12.0f}"
+                f"{latency['p50']:>10.1f}{latency['p99']:>10.1f}"
+                f"{peak / 2**20 if peak is not None else float('nan'):>10.1f}"
+            )
+            before = previous.get((result["backend"], result["size"], name))
+            if before and operation["throughput_per_s"]:
+                line += f"{operation['throughput_per_s'] / before:>8.2f}x"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark routing, recording and evidence per backend."
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=lambda value: int(float(value)),
+        default=list(DEFAULT_SIZES),
+        help="numbers of requests per case, e.g. 1e3 1e5 (default: 1e3 1e4 1e5)",
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=list(BACKENDS),
+        default=list(BACKENDS),
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare")
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip the tracemalloc pass (halves the run time)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--instrumentation",
+        action="store_true",
+        help="measure the per-call overhead of src.instrumentation instead",
+    )
+    args = parser.parse_args(argv)
+
+    if args.instrumentation:
+        overhead = instrumentation_overhead()
+        print(_format_overhead(overhead))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(
+                    {"environment": _environment(), "instrumentation": overhead},
+                    f,
+                    indent=2,
+                )
+        return 0
+
+    report = run_benchmarks(args.sizes, args.backends, not args.no_memory, args.seed)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(_format_report(report, baseline))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import http.client
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Errors worth retrying on a fresh connection: refused/reset sockets,
+# timeouts and half-closed keep-alive connections
+_RETRYABLE_ERRORS = (OSError, http.client.HTTPException)
+
+
+class ModelAdapterError(RuntimeError):
+    # Raised when a remote model cannot produce a prediction
+    pass
+
+
+class HTTPModelAdapter:
+    """
+    Callable that serves predictions from a model behind an HTTP endpoint.
+
+    Wire format:
+    - POST <url> with JSON body {"inputs": [x_1, ..., x_n]}
+    - Response JSON body {"predictions": [y_1, ..., y_n]}
+
+    Behavior:
+    - Keeps a bounded pool of persistent (keep-alive) connections, so a
+      prediction reuses an open socket instead of paying a new TCP (and
+      TLS) handshake.
+    - With batch=False, each call sends one input and returns one
+      prediction, which is what register_models/route_request expect.
+    - With batch=True, each call receives a whole sub-batch, which is what
+      route_requests passes. Batches larger than max_batch_size are split
+      into chunks that are sent concurrently over the pool.
+    - Connection errors, timeouts and 5xx responses are retried up to
+      max_retries times with exponential backoff on a fresh connection;
+      4xx responses fail immediately. A connection error also closes the
+      idle pooled connections, which have likely been dropped by the
+      server as well (e.g. after its keep-alive timeout).
+
+    Notes:
+    http.client cannot pipeline requests on one connection, so concurrent
+    requests are spread over the pooled connections and several inputs
+    share one request through batch=True instead.
+    """
+
+    def __init__(
+        self,
+        url,
+        pool_size=8,
+        timeout=5.0,
+        max_retries=2,
+        backoff=0.05,
+        batch=False,
+        max_batch_size=256,
+        headers=None,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch = batch
+        self.max_batch_size = max_batch_size
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path += "?" + parts.query
+
+        # Idle connections; LIFO keeps the warmest sockets in use
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_db_model(cls, db_model, **kwargs):
+        """
+        Build an adapter from a row of the models table.
+
+        Parameters:
+        db_model : DBModel
+            Row with adapter_type "http_endpoint" and the endpoint URL in
+            location. Keys of its metadata JSON (e.g. "timeout", "batch",
+            "pool_size") are used as constructor arguments.
+        kwargs :
+            Overrides for the values found in metadata.
+        """
+        if db_model.adapter_type != "http_endpoint":
+            raise ValueError(
+                f"Model {db_model.model_id} has adapter_type "
+                f"{db_model.adapter_type!r}, expected 'http_endpoint'."
+            )
+        options = dict(db_model.model_metadata or {})
+        options.update(kwargs)
+        return cls(db_model.location, **options)
+
+    # -- connection pool ----------------------------------------------------
+
+    def _acquire(self, fresh=False):
+        # A pooled connection, or a new one if fresh or none is idle
+        self._slots.acquire()
+        if not fresh:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+        return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    def _release(self, connection, reusable):
+        if reusable:
+            self._idle.put(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def _drain(self):
+        # Close every idle connection
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def close(self):
+        # Close idle connections and the chunk executor
+        self._drain()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -- requests -------------------------------------------------------------
+
+    def _post(self, inputs):
+        body = json.dumps({"inputs": inputs}).encode("utf-8")
+
+        for attempt in range(self.max_retries + 1):
+            connection = self._acquire(fresh=attempt > 0)
+            reusable = False
+            try:
+                connection.request("POST", self._path, body=body, headers=self.headers)
+                response = connection.getresponse()
+                # The body must be read completely before the socket is reused
+                payload = response.read()
+                reusable = not response.will_close
+            except _RETRYABLE_ERRORS as exc:
+                error = exc
+                self._drain()
+            else:
+                if response.status < 400:
+                    return json.loads(payload)["predictions"]
+                error = ModelAdapterError(
+                    f"{self.url} answered {response.status}: {payload[:200]!r}"
+                )
+                if response.status < 500:
+                    raise error
+            finally:
+                self._release(connection, reusable)
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * 2**attempt)
+
+        raise ModelAdapterError(
+            f"{self.url} failed after {self.max_retries + 1} attempts"
+        ) from error
+
+    def predict_batch(self, X_batch):
+        inputs = X_batch.tolist() if hasattr(X_batch, "tolist") else list(X_batch)
+        if len(inputs) <= self.max_batch_size:
+            return self._post(inputs)
+
+        chunks = []
+        for start in range(0, len(inputs), self.max_batch_size):
+            end = start + self.max_batch_size
+            chunks.append(inputs[start:end])
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        predictions = []
+        for chunk_predictions in self._executor.map(self._post, chunks):
+            predictions.extend(chunk_predictions)
+        return predictions
+
+    def __call__(self, X):
+        if self.batch:
+            return self.predict_batch(X)
+        if hasattr(X, "tolist"):
+            X = X.tolist()
+        return self._post([X])[0]
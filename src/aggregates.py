@@ -0,0 +1,242 @@
+import copy
+import math
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from src.models import ModelVariant, OutcomeSummary
+
+# Bucket widths in seconds: minute, hour and day roll-ups
+DEFAULT_RESOLUTIONS = (60, 3600, 86400)
+
+
+class TimeBucketedSummaries:
+    """
+    Per-variant running summaries kept in fixed time buckets.
+
+    Every outcome is folded into one bucket per resolution (by default a
+    minute, an hour and a day bucket), so coarser levels are maintained
+    roll-ups of the finest one. A time range query covers the range with
+    as many coarse buckets as fit and fills the edges with finer ones, so
+    it merges O(buckets) summaries instead of scanning outcomes.
+
+    Parameters:
+    summary_type : type
+        OutcomeSummary or ProportionSummary; anything with update, remove
+        and merge.
+    resolutions : sequence of int
+        Bucket widths in seconds, finest first; each must be a multiple of
+        the previous one.
+
+    Notes:
+    - Range boundaries are aligned to the finest resolution: start is
+      rounded down and end rounded up, so a range always includes whole
+      buckets of the finest level.
+    - Memory is O(number of non-empty buckets), dominated by the finest
+      level.
+    """
+
+    def __init__(
+        self,
+        summary_type=OutcomeSummary,
+        resolutions: Sequence[int] = DEFAULT_RESOLUTIONS,
+    ):
+        resolutions = tuple(resolutions)
+        if not resolutions or any(
+            coarse % fine for fine, coarse in zip(resolutions, resolutions[1:])
+        ):
+            raise ValueError("Each resolution must be a multiple of the previous one.")
+        self.summary_type = summary_type
+        self.resolutions = resolutions
+        # One {bucket index: {variant: summary}} dict per resolution
+        self._levels: Tuple[Dict[int, Dict[ModelVariant, object]], ...] = tuple(
+            {} for _ in resolutions
+        )
+        # Finest bucket index of the last write and its bucket per level:
+        # outcomes mostly arrive in the current minute
+        self._last_index = None
+        self._last_buckets: Tuple[Dict[ModelVariant, object], ...] = ()
+
+    def _buckets(self, timestamp):
+        index = int(timestamp // self.resolutions[0])
+        if index == self._last_index:
+            return self._last_buckets
+        buckets = []
+        for resolution, level in zip(self.resolutions, self._levels):
+            level_index = int(timestamp // resolution)
+            bucket = level.get(level_index)
+            if bucket is None:
+                bucket = level[level_index] = {
+                    v: self.summary_type() for v in ModelVariant
+                }
+            buckets.append(bucket)
+        self._last_index, self._last_buckets = index, tuple(buckets)
+        return self._last_buckets
+
+    def add(self, variant: ModelVariant, timestamp: float, value: float) -> None:
+        for bucket in self._buckets(timestamp):
+            bucket[variant].update(value)
+
+    def remove(self, variant: ModelVariant, timestamp: float, value: float) -> None:
+        # Back out an overwritten outcome from the buckets it was added to
+        for bucket in self._buckets(timestamp):
+            bucket[variant].remove(value)
+
+    def merge(self, variant: ModelVariant, timestamp: float, summary) -> None:
+        # Fold a pre-aggregated batch of outcomes sharing one timestamp
+        for bucket in self._buckets(timestamp):
+            bucket[variant].merge(summary)
+
+    def _merge_range(self, summaries, depth, lo, hi) -> None:
+        # Merge finest-level buckets [lo, hi) into summaries, using the
+        # coarsest level at index <= depth that fits
+        if lo >= hi:
+            return
+        level = self._levels[depth]
+        ratio = self.resolutions[depth] // self.resolutions[0]
+        first = -(-lo // ratio)
+        last = hi // ratio
+        if depth and first >= last:
+            self._merge_range(summaries, depth - 1, lo, hi)
+            return
+
+        if last - first <= len(level):
+            buckets = (level.get(index) for index in range(first, last))
+        else:
+            buckets = (b for index, b in level.items() if first <= index < last)
+        for bucket in buckets:
+            if bucket is not None:
+                for variant, summary in bucket.items():
+                    summaries[variant].merge(summary)
+
+        if depth:
+            self._merge_range(summaries, depth - 1, lo, first * ratio)
+            self._merge_range(summaries, depth - 1, last * ratio, hi)
+
+    def window(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Dict[ModelVariant, object]:
+        """
+        Merged per-variant summaries of the outcomes in [start, end).
+
+        Parameters:
+        start, end : float, optional
+            Unix timestamps; an open bound extends to the first / last
+            bucket.
+
+        Returns:
+        dict
+            A fresh summary per variant.
+        """
+        summaries = {variant: self.summary_type() for variant in ModelVariant}
+        finest = self._levels[0]
+        if not finest:
+            return summaries
+        resolution = self.resolutions[0]
+        lo = min(finest) if start is None else math.floor(start / resolution)
+        hi = max(finest) + 1 if end is None else math.ceil(end / resolution)
+        self._merge_range(summaries, len(self._levels) - 1, lo, hi)
+        return summaries
+
+
+# Value that stands in for every segment value beyond the cardinality cap
+OTHER_SEGMENT = "__other__"
+
+DEFAULT_MAX_SEGMENT_VALUES = 100
+
+
+class SegmentCap:
+    """
+    Bounds the number of distinct values tracked per segment dimension.
+
+    The first max_values values seen for a dimension are admitted; every
+    later value maps to OTHER_SEGMENT. Admission is permanent, so a request
+    always maps to the same segment cells. Thread-safe: admitted values are
+    read without locking, new values are admitted under a lock.
+    """
+
+    def __init__(self, max_values: int = DEFAULT_MAX_SEGMENT_VALUES):
+        self.max_values = max_values
+        self._admitted: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, segments: Dict[str, Any]) -> Dict[str, Any]:
+        # Returns segments itself when no value had to be capped
+        capped = None
+        for dimension, value in segments.items():
+            admitted = self._admitted.get(dimension)
+            if admitted is not None and value in admitted:
+                continue
+            if not self._admit(dimension, value):
+                if capped is None:
+                    capped = dict(segments)
+                capped[dimension] = OTHER_SEGMENT
+        return segments if capped is None else capped
+
+    def _admit(self, dimension, value) -> bool:
+        with self._lock:
+            admitted = self._admitted.setdefault(dimension, set())
+            if value in admitted:
+                return True
+            if len(admitted) >= self.max_values:
+                return False
+            admitted.add(value)
+            return True
+
+    def __getstate__(self):
+        # Pickled (e.g. in storage snapshots) without the lock
+        return {"max_values": self.max_values, "admitted": self._admitted}
+
+    def __setstate__(self, state):
+        self.max_values = state["max_values"]
+        self._admitted = state["admitted"]
+        self._lock = threading.Lock()
+
+
+class SegmentCube:
+    """
+    Per-(dimension, value, variant) running summaries.
+
+    Each outcome of a request with segments {dimension: value} is folded
+    into one cell per dimension, so a per-segment breakdown is a dict
+    lookup instead of a re-scan and re-grouping of all outcomes.
+
+    Parameters:
+    summary_type : type
+        OutcomeSummary or ProportionSummary.
+
+    Notes:
+    - Segment values must already be capped (see SegmentCap), which bounds
+      memory to dimensions x (max_values + 1) x variants summaries.
+    """
+
+    def __init__(self, summary_type=OutcomeSummary):
+        self.summary_type = summary_type
+        # dimension -> value -> {variant: summary}
+        self._cells: Dict[str, Dict[Any, Dict[ModelVariant, object]]] = {}
+
+    def _summaries(self, variant, segments):
+        for dimension, value in segments.items():
+            cells = self._cells.setdefault(dimension, {})
+            cell = cells.get(value)
+            if cell is None:
+                cell = cells[value] = {v: self.summary_type() for v in ModelVariant}
+            yield cell[variant]
+
+    def add(self, variant: ModelVariant, segments, value: float) -> None:
+        for summary in self._summaries(variant, segments):
+            summary.update(value)
+
+    def remove(self, variant: ModelVariant, segments, value: float) -> None:
+        for summary in self._summaries(variant, segments):
+            summary.remove(value)
+
+    @property
+    def dimensions(self) -> Tuple[str, ...]:
+        return tuple(self._cells)
+
+    def slice(self, dimension: str) -> Dict[Any, Dict[ModelVariant, object]]:
+        # Copies of the per-variant summaries of every value of a dimension
+        return {
+            value: {variant: copy.copy(s) for variant, s in cell.items()}
+            for value, cell in self._cells.get(dimension, {}).items()
+        }
@@ -0,0 +1,239 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+DEFAULT_RESAMPLES = 10_000
+
+# Resamples per task; every block gets its own child seed, so results
+# depend only on the seed, never on the number of workers
+BLOCK_SIZE = 250
+
+# Below this many resampled values (outcomes x resamples) the bootstrap
+# runs in-process: starting a pool would cost more than it saves
+PARALLEL_THRESHOLD = 50_000_000
+
+# Elements per index matrix / weight matrix generated at once
+_MAX_MATRIX = 2_000_000
+
+# P(W <= k) of W ~ Poisson(1) scaled to uint32. Comparing uniform uint32
+# draws against these is much faster than rng.poisson; the tail beyond the
+# last threshold is below the uint32 resolution.
+_POISSON_THRESHOLDS = np.floor(stats.poisson.cdf(np.arange(12), 1.0) * 2**32).astype(
+    np.uint32
+)
+
+# Outcomes of the running bootstrap, set once per worker process
+_worker_outcomes = None
+
+
+def _poisson_weights(rng, shape):
+    u = rng.integers(0, 2**32, size=shape, dtype=np.uint32)
+    # Weights 0-3 with dense comparisons; only ~2% of draws go further, so
+    # the tail is resolved on those draws alone
+    weights = (u >= _POISSON_THRESHOLDS[0]).view(np.uint8)
+    weights += u >= _POISSON_THRESHOLDS[1]
+    weights += u >= _POISSON_THRESHOLDS[2]
+    tail = np.flatnonzero(u >= _POISSON_THRESHOLDS[3])
+    weights.ravel()[tail] += np.searchsorted(
+        _POISSON_THRESHOLDS[3:], u.ravel()[tail], side="right"
+    ).astype(np.uint8)
+    return weights
+
+
+class PoissonBootstrap:
+    """
+    Streaming Poisson bootstrap of the mean of one variant.
+
+    Every outcome gets an independent Poisson(1) weight per resample, so a
+    resample is just a weighted sum that can be accumulated chunk by chunk:
+    outcomes can be fed as they arrive (e.g. from iter_outcome_chunks) and
+    no resample is ever materialised. Memory is O(n_resamples).
+
+    Parameters:
+    n_resamples : int
+        Number of bootstrap resamples.
+    seed : int, SeedSequence or Generator, optional
+        Seed of the weight generator. Use different seeds per variant.
+    """
+
+    def __init__(self, n_resamples=DEFAULT_RESAMPLES, seed=None):
+        self.n_resamples = n_resamples
+        self._rng = np.random.default_rng(seed)
+        self.sums = np.zeros(n_resamples)
+        self.weights = np.zeros(n_resamples)
+        self.n = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        rows = max(1, _MAX_MATRIX // self.n_resamples)
+        for start in range(0, len(values), rows):
+            end = start + rows
+            chunk = values[start:end]
+            weights = _poisson_weights(self._rng, (len(chunk), self.n_resamples))
+            # Weighted sums and total weights in one matrix product
+            totals = np.vstack([chunk, np.ones(len(chunk))]) @ weights.astype(
+                np.float64
+            )
+            self.sums += totals[0]
+            self.weights += totals[1]
+        self.n += len(values)
+
+    @property
+    def means(self):
+        # Resampled means; a resample with zero total weight has no mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums / self.weights
+
+
+def _index_means(rng, values, n_resamples):
+    # Means of n_resamples classic (with-replacement) resamples, drawing
+    # whole matrices of indices at once
+    n = len(values)
+    means = np.empty(n_resamples)
+    rows = max(1, _MAX_MATRIX // n)
+    for start in range(0, n_resamples, rows):
+        end = min(start + rows, n_resamples)
+        indices = rng.integers(0, n, size=(end - start, n))
+        means[start:end] = values[indices].mean(axis=1)
+    return means
+
+
+def _index_block(seed, n_resamples, outcomes=None):
+    outcomes_1, outcomes_2 = outcomes if outcomes is not None else _worker_outcomes
+    rng_1, rng_2 = (np.random.default_rng(s) for s in seed.spawn(2))
+    return _index_means(rng_2, outcomes_2, n_resamples) - _index_means(
+        rng_1, outcomes_1, n_resamples
+    )
+
+
+def _poisson_block(seed, n_resamples, outcomes=None):
+    outcomes_1, outcomes_2 = outcomes if outcomes is not None else _worker_outcomes
+    seed_1, seed_2 = seed.spawn(2)
+    boot_1 = PoissonBootstrap(n_resamples, seed_1)
+    boot_2 = PoissonBootstrap(n_resamples, seed_2)
+    boot_1.update(outcomes_1)
+    boot_2.update(outcomes_2)
+    return boot_2.means - boot_1.means
+
+
+_BLOCK_FUNCTIONS = {"index": _index_block, "poisson": _poisson_block}
+
+
+def _init_worker(outcomes_1, outcomes_2):
+    # Ship the outcomes once per worker instead of once per block
+    global _worker_outcomes
+    _worker_outcomes = (outcomes_1, outcomes_2)
+
+
+def bootstrap_distribution(
+    outcomes_1,
+    outcomes_2,
+    n_resamples=DEFAULT_RESAMPLES,
+    seed=None,
+    method="index",
+    n_workers=None,
+):
+    """
+    Bootstrap distribution of the difference in means (B − A).
+
+    Parameters:
+    outcomes_1, outcomes_2 : list or array-like
+        Raw outcome values of variants A and B.
+    n_resamples : int
+        Number of bootstrap resamples.
+    seed : int, optional
+        Seed for reproducible results.
+    method : str
+        "index" resamples outcomes with replacement; "poisson" uses the
+        Poisson bootstrap, which weights outcomes instead of resampling.
+    n_workers : int, optional
+        Number of worker processes. Defaults to os.cpu_count() for large
+        problems and to 1 (in-process) otherwise.
+
+    Returns:
+    numpy.ndarray
+        n_resamples resampled differences in means.
+
+    Notes:
+    - Resamples are generated in blocks of BLOCK_SIZE with child seeds
+      spawned from one SeedSequence, so a given seed gives identical
+      results for any number of workers.
+    - The work is O(n x n_resamples) in either method; it is spread over
+      the workers of a ProcessPoolExecutor, each of which receives the
+      outcomes once.
+    """
+    if method not in _BLOCK_FUNCTIONS:
+        raise ValueError(f"Unknown bootstrap method: {method!r}")
+    block = _BLOCK_FUNCTIONS[method]
+    outcomes_1 = np.asarray(outcomes_1, dtype=np.float64)
+    outcomes_2 = np.asarray(outcomes_2, dtype=np.float64)
+
+    sizes = [BLOCK_SIZE] * (n_resamples // BLOCK_SIZE)
+    if n_resamples % BLOCK_SIZE:
+        sizes.append(n_resamples % BLOCK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if n_workers is None:
+        work = (len(outcomes_1) + len(outcomes_2)) * n_resamples
+        n_workers = (os.cpu_count() or 1) if work >= PARALLEL_THRESHOLD else 1
+
+    if n_workers == 1 or len(sizes) == 1:
+        outcomes = (outcomes_1, outcomes_2)
+        parts = [block(s, size, outcomes) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(outcomes_1, outcomes_2),
+        ) as executor:
+            parts = list(executor.map(block, seeds, sizes))
+
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def percentile_interval(differences, confidence_level):
+    """
+    Percentile confidence interval from a bootstrap distribution.
+
+    Parameters:
+    differences : numpy.ndarray
+        Resampled differences in means.
+    confidence_level : float
+        Desired confidence level (e.g., 0.95).
+
+    Returns:
+    tuple
+        (lower_bound, upper_bound); resamples without a defined mean
+        (possible with the Poisson bootstrap of tiny samples) are ignored.
+    """
+    alpha = 1 - confidence_level
+    lower, upper = np.nanquantile(differences, [alpha / 2, 1 - alpha / 2])
+    return (float(lower), float(upper))
+
+
+def bootstrap_confidence_interval(
+    outcomes_1, outcomes_2, confidence_level=0.95, **options
+):
+    """
+    Bootstrap confidence interval for the difference in means (B − A).
+
+    Parameters:
+    outcomes_1, outcomes_2 : list or array-like
+        Raw outcome values of variants A and B.
+    confidence_level : float
+        Desired confidence level (e.g., 0.95).
+    **options
+        n_resamples, seed, method and n_workers of bootstrap_distribution.
+
+    Returns:
+    tuple
+        (lower_bound, upper_bound) of the percentile interval.
+
+    Notes:
+    - Makes no normality assumption, unlike the Welch interval, so it is
+      the better choice for skewed or heavy-tailed outcomes such as revenue.
+    """
+    differences = bootstrap_distribution(outcomes_1, outcomes_2, **options)
+    return percentile_interval(differences, confidence_level)
@@ -1,22 +1,107 @@
 # venv\Scripts\activate
 
+import asyncio
+import inspect
 import random
 import time
-import uuid
+from typing import Dict
 
-from src.models import Model, ModelVariant, Outcome, Request
-from src.statistics import compute_statistics
-from src.storage import InMemoryStorage
+import numpy as np
+
+from src import ids, instrumentation
+from src.experiments import ExperimentRegistry
+from src.models import Model, ModelVariant, Outcome, ProportionSummary, Request
+from src.request_log import CODE_VARIANTS, FREE
+from src.routing import DEFAULT_SALT, get_bucket_table
+from src.statistics import compute_metric_statistics, compute_statistics
+from src.storage import InMemoryStorage, LateOutcomeError
 
 # Global in-memory storage instance
 storage = InMemoryStorage()
 
 # In-Memory state
-models = {}
+models: Dict[str, Model] = {}
+
+# Experiments created with create_experiment, each with its own storage
+registry = ExperimentRegistry()
+
+
+def set_storage(backend):
+    """
+    Replace the storage backend used by routing, recording and evidence.
+
+    Parameters:
+    backend : StorageBackend
+        Any storage implementation, e.g. InMemoryStorage or DatabaseStorage.
+
+    Behavior:
+    - Rebinds the module-level storage instance.
+    - Previously logged requests stay in the old backend and are not copied.
+    """
+    global storage
+    storage = backend
+
+
+def create_experiment(config, storage=None):
+    """
+    Start a new experiment with its own models and storage partition.
+
+    Parameters:
+    config : ExperimentConfig
+        Experiment definition; traffic_split and confidence_level become the
+        defaults for routing and evidence of this experiment.
+    storage : StorageBackend, optional
+        Storage partition for the experiment. Defaults to one created by the
+        registry's storage factory (a fresh InMemoryStorage).
+
+    Returns:
+    Experiment
+        The registered experiment.
+
+    Raises:
+    ValueError
+        If an experiment with the same id already exists.
+    """
+    return registry.create(config, storage)
+
+
+def drop_experiment(experiment_id):
+    """
+    Remove an experiment together with its models and storage partition.
+
+    Returns:
+    Experiment
+        The removed experiment, e.g. to close or archive its storage.
+
+    Raises:
+    ValueError
+        If the experiment does not exist.
+    """
+    return registry.drop(experiment_id)
+
+
+def _scope(experiment_id):
+    # (storage, models, config) of an experiment; None is the default scope
+    # made of the module-level storage and models
+    if experiment_id is None:
+        return storage, models, None
+    experiment = registry.get(experiment_id)
+    return experiment.storage, experiment.models, experiment.config
+
+
+def _routing_params(config, probability_split, salt):
+    # Fill in the split and salt from the experiment config when not given
+    if probability_split is None:
+        if config is None:
+            raise ValueError("probability_split is required outside an experiment.")
+        probability_split = config.traffic_split
+    if salt is None:
+        salt = config.experiment_id if config is not None else DEFAULT_SALT
+    return probability_split, salt
 
 
 # model registration function
-def register_models(model_a, model_b):
+def register_models(model_a, model_b, experiment_id=None):
     """
     Register two model variants for A/B testing.
 
@@ -25,96 +110,543 @@ def register_models(model_a, model_b):
         Function or callable object representing variant A.
     model_b : callable
         Function or callable object representing variant B.
+    experiment_id : str, optional
+        Experiment to register the models for. Defaults to the module-level
+        (single experiment) state.
 
     Behavior:
     - Stores the models in in-memory state under keys "A" and "B".
     - Overwrites any previously registered models.
     """
-    models["A"] = Model(model_id="A", callable=model_a)
-    models["B"] = Model(model_id="B", callable=model_b)
+    _, scoped_models, _ = _scope(experiment_id)
+    scoped_models["A"] = Model(model_id="A", callable=model_a)
+    scoped_models["B"] = Model(model_id="B", callable=model_b)
 
 
 # request routing function
-def route_request(X, probability_split):
+def route_request(
+    X,
+    probability_split=None,
+    unit_key=None,
+    salt=None,
+    experiment_id=None,
+    segments=None,
+    covariate=None,
+):
     """
     Route an incoming request to one of the registered model variants.
 
     Parameters:
     X : any
         Input data passed to the selected model.
-    probability_split : float
+    probability_split : float, optional
         Probability of routing the request to model A (between 0 and 1).
+        Required unless experiment_id is given, in which case it defaults to
+        the experiment's traffic_split.
+    unit_key : str, bytes or int, optional
+        Stable identifier of the randomisation unit (e.g. a user id).
+        When given, assignment is deterministic: the key and salt are hashed
+        into a fixed bucket space and looked up in a precomputed table.
+    salt : str, optional
+        Salt used for deterministic assignment. Defaults to the experiment id,
+        or to a fixed salt outside an experiment.
+    experiment_id : str, optional
+        Experiment to route for. Defaults to the module-level state.
+    segments : dict, optional
+        Segment dimensions of the request, e.g. {"country": "DE",
+        "platform": "ios"}. Outcomes are then also aggregated per segment
+        value for compile_segment_evidence.
+    covariate : float, optional
+        Pre-experiment value of the outcome metric for the unit (e.g. its
+        spend in the weeks before the experiment). Enables variance-reduced
+        evidence with compile_evidence(cuped=True).
 
     Returns:
     tuple
         (prediction, request_id) where prediction is the model output
-        and request_id uniquely identifies the routed request.
+        and request_id, a time-ordered integer (see src.ids), uniquely
+        identifies the routed request.
 
     Behavior:
-    - Randomly assigns the request to model A or B based on probability_split.
-    - Stores request metadata (input, assigned model, timestamp) in memory.
-    - Does not guarantee deterministic assignment across calls.
+    - Without unit_key, randomly assigns the request to model A or B based
+      on probability_split; assignment is not reproducible across calls.
+    - With unit_key, the same unit always gets the same variant for a given
+      split and salt, in any process, without consulting stored requests.
+    - Stores request metadata (input, assigned model, timestamp) in the
+      experiment's storage.
+    - With src.instrumentation enabled, records the latency of the call
+      (and, with stage timing, of each stage: id generation, assignment,
+      save_request, model call) and counts the request for its variant.
     """
-    # Generate a unique request ID and timestamp
-    request_id = str(uuid.uuid4())
+    scoped_storage, scoped_models, config = _scope(experiment_id)
+    probability_split, salt = _routing_params(config, probability_split, salt)
+    start = time.perf_counter_ns() if instrumentation.enabled else None
+    stamps = [start] if start is not None and instrumentation.stage_timing else None
+    request_id, variant = _log_request(
+        scoped_storage,
+        X,
+        probability_split,
+        unit_key,
+        salt,
+        segments,
+        covariate,
+        stamps,
+    )
+
+    # Get prediction
+    prediction = scoped_models[variant.value].callable(X)
+    if start is not None:
+        instrumentation.route_latency.finish(start, stamps, variant)
+
+    return prediction, request_id
+
+
+def _log_request(
+    scoped_storage,
+    X,
+    probability_split,
+    unit_key,
+    salt,
+    segments=None,
+    covariate=None,
+    stamps=None,
+):
+    # Assign a variant and log the request; shared by the sync and async
+    # paths. With per-stage timing, a stamp is appended after each stage.
+
+    # Generate a time-ordered request ID (see src.ids) and timestamp
+    request_id = ids.new_id()
     timestamp = time.time()
+    if stamps is not None:
+        stamps.append(time.perf_counter_ns())
 
     # Select model based on probability split
-    if random.random() < probability_split:
+    if unit_key is not None:
+        variant = get_bucket_table(probability_split, salt).assign(unit_key)
+    elif random.random() < probability_split:
         variant = ModelVariant.A
     else:
         variant = ModelVariant.B
+    if stamps is not None:
+        stamps.append(time.perf_counter_ns())
 
     # create a store request object
     request_object = Request(
-        request_id=request_id, selected_model=variant, input_data=X, timestamp=timestamp
+        request_id=request_id,
+        selected_model=variant,
+        input_data=X,
+        timestamp=timestamp,
+        segments=segments,
+        covariate=covariate,
     )
-    storage.save_request(request_object)
+    scoped_storage.save_request(request_object)
+    if stamps is not None:
+        stamps.append(time.perf_counter_ns())
 
-    # Get prediction
-    prediction = models[variant.value].callable(X)
+    return request_id, variant
+
+
+def _resolve_per_variant(value, variant):
+    if isinstance(value, dict):
+        return value.get(variant)
+    return value
+
+
+def register_models_async(
+    model_a, model_b, max_concurrency=None, timeout=None, experiment_id=None
+):
+    """
+    Register two model variants for use with route_request_async.
+
+    Parameters:
+    model_a : callable
+        Coroutine function (or plain callable) representing variant A.
+    model_b : callable
+        Coroutine function (or plain callable) representing variant B.
+    max_concurrency : int or dict, optional
+        Maximum number of in-flight predictions per variant. A dict keyed by
+        "A"/"B" sets separate limits; None means unbounded.
+    timeout : float or dict, optional
+        Per-prediction timeout in seconds, as a scalar or a dict keyed by
+        "A"/"B"; None means no timeout.
+    experiment_id : str, optional
+        Experiment to register the models for.
+
+    Behavior:
+    - Registers the models exactly like register_models, so the sync and
+      async paths share the same model registry and storage.
+    - Stores the limits in each Model's metadata.
+    """
+    register_models(model_a, model_b, experiment_id)
+    _, scoped_models, _ = _scope(experiment_id)
+    for key in ("A", "B"):
+        scoped_models[key].metadata["max_concurrency"] = _resolve_per_variant(
+            max_concurrency, key
+        )
+        scoped_models[key].metadata["timeout"] = _resolve_per_variant(timeout, key)
+
+
+def _get_semaphore(model):
+    # The (event loop, semaphore) pair lives in the model's metadata; the
+    # semaphore is recreated when the model is first used from another loop
+    limit = model.metadata.get("max_concurrency")
+    if limit is None:
+        return None
+    loop = asyncio.get_running_loop()
+    entry = model.metadata.get("semaphore")
+    if entry is None or entry[0] is not loop:
+        entry = model.metadata["semaphore"] = (loop, asyncio.Semaphore(limit))
+    return entry[1]
+
+
+async def _predict_async(model, X):
+    result = model.callable(X)
+    if inspect.isawaitable(result):
+        result = await asyncio.wait_for(result, model.metadata.get("timeout"))
+    return result
+
+
+# async request routing function
+async def route_request_async(
+    X,
+    probability_split=None,
+    unit_key=None,
+    salt=None,
+    experiment_id=None,
+    segments=None,
+    covariate=None,
+):
+    """
+    Async counterpart of route_request for I/O-bound model variants.
+
+    Parameters:
+    X : any
+        Input data passed to the selected model.
+    probability_split : float, optional
+        Probability of routing the request to model A, as in route_request.
+    unit_key : str, bytes or int, optional
+        Stable unit identifier for deterministic assignment.
+    salt : str, optional
+        Salt used for deterministic assignment, as in route_request.
+    experiment_id : str, optional
+        Experiment to route for.
+    segments : dict, optional
+        Segment dimensions of the request, as in route_request.
+    covariate : float, optional
+        Pre-experiment covariate of the request, as in route_request.
+
+    Returns:
+    tuple
+        (prediction, request_id), as in route_request.
+
+    Raises:
+    asyncio.TimeoutError
+        If the model does not answer within its registered timeout. The
+        request has already been logged at that point.
+
+    Behavior:
+    - Assignment and logging are identical to route_request.
+    - Coroutine model callables are awaited, so a single event loop can
+      keep thousands of predictions in flight; plain callables are called
+      inline and block the loop for their duration.
+    - At most max_concurrency predictions per variant run at once; further
+      requests wait for a free slot.
+    """
+    scoped_storage, scoped_models, config = _scope(experiment_id)
+    probability_split, salt = _routing_params(config, probability_split, salt)
+    start = time.perf_counter_ns() if instrumentation.enabled else None
+    stamps = [start] if start is not None and instrumentation.stage_timing else None
+    request_id, variant = _log_request(
+        scoped_storage,
+        X,
+        probability_split,
+        unit_key,
+        salt,
+        segments,
+        covariate,
+        stamps,
+    )
+
+    model = scoped_models[variant.value]
+    semaphore = _get_semaphore(model)
+    if semaphore is None:
+        prediction = await _predict_async(model, X)
+    else:
+        async with semaphore:
+            prediction = await _predict_async(model, X)
+    if start is not None:
+        instrumentation.route_latency.finish(start, stamps, variant)
 
     return prediction, request_id
 
 
+def _take(X_batch, indices):
+    # Select rows of a batch by position, preserving its container type
+    if isinstance(X_batch, np.ndarray):
+        return X_batch[indices]
+    return [X_batch[i] for i in indices.tolist()]
+
+
+# batch request routing function
+def route_requests(
+    X_batch,
+    probability_split=None,
+    unit_keys=None,
+    salt=None,
+    experiment_id=None,
+    segments=None,
+    covariates=None,
+):
+    """
+    Route a micro-batch of requests with one model call per variant.
+
+    Parameters:
+    X_batch : list or numpy.ndarray
+        Batch of inputs; row i is the input of the i-th request.
+    probability_split : float, optional
+        Probability of routing a request to model A, as in route_request.
+    unit_keys : sequence, optional
+        One stable unit identifier per row. When given, assignment is
+        deterministic, exactly as in route_request.
+    salt : str, optional
+        Salt used for deterministic assignment, as in route_request.
+    experiment_id : str, optional
+        Experiment to route for.
+    segments : sequence of dict, optional
+        Segment dimensions of each row, as in route_request.
+    covariates : sequence of float, optional
+        Pre-experiment covariate of each row, as in route_request.
+
+    Returns:
+    tuple
+        (predictions, request_ids) where predictions is a numpy array in
+        the same order as X_batch and request_ids is a list of ids.
+
+    Behavior:
+    - Assigns variants for the whole batch with NumPy.
+    - Splits the batch into an A sub-batch and a B sub-batch and calls each
+      registered model once with its sub-batch (of the same container type
+      as X_batch), so model callables must accept a batch of inputs.
+    - Scatters predictions back into input order.
+    - Logs all requests with a single storage call.
+    """
+    scoped_storage, scoped_models, config = _scope(experiment_id)
+    probability_split, salt = _routing_params(config, probability_split, salt)
+
+    n = len(X_batch)
+    timestamp = time.time()
+    request_ids = ids.new_ids(n)
+
+    # Select models for the whole batch
+    if unit_keys is not None:
+        table = get_bucket_table(probability_split, salt)
+        buckets = np.fromiter(
+            (table.bucket(key) for key in unit_keys), dtype=np.int64, count=n
+        )
+        is_a = buckets < table.cutoff
+    else:
+        is_a = np.random.random(n) < probability_split
+
+    variants = [ModelVariant.A if a else ModelVariant.B for a in is_a.tolist()]
+    if segments is None:
+        segments = [None] * n
+    if covariates is None:
+        covariates = [None] * n
+    scoped_storage.save_requests(
+        [
+            Request(
+                request_id=request_id,
+                selected_model=variant,
+                input_data=X,
+                timestamp=timestamp,
+                segments=row_segments,
+                covariate=covariate,
+            )
+            for request_id, variant, X, row_segments, covariate in zip(
+                request_ids, variants, X_batch, segments, covariates
+            )
+        ]
+    )
+    if instrumentation.enabled:
+        n_a = int(is_a.sum())
+        instrumentation.requests_routed.inc(ModelVariant.A.value, n_a)
+        instrumentation.requests_routed.inc(ModelVariant.B.value, n - n_a)
+
+    # One model call per non-empty sub-batch
+    outputs = []
+    for variant, indices in (
+        (ModelVariant.A, np.flatnonzero(is_a)),
+        (ModelVariant.B, np.flatnonzero(~is_a)),
+    ):
+        if len(indices):
+            sub_batch = _take(X_batch, indices)
+            outputs.append(
+                (indices, np.asarray(scoped_models[variant.value].callable(sub_batch)))
+            )
+
+    if not outputs:
+        return np.empty(0), request_ids
+
+    # Scatter back into input order
+    dtype = np.result_type(*(preds for _, preds in outputs))
+    predictions = np.empty((n,) + outputs[0][1].shape[1:], dtype=dtype)
+    for indices, preds in outputs:
+        predictions[indices] = preds
+
+    return predictions, request_ids
+
+
 # function to record the delayed outcome
-def record_delayed_outcome(request_id, outcome):
+def record_delayed_outcome(request_id, outcome, experiment_id=None, metrics=None):
     """
     Record the observed outcome for a previously routed request.
 
     Parameters:
-    request_id : str
+    request_id : int
         Unique identifier returned by route_request.
     outcome : float
         Observed outcome value associated with the request.
+    experiment_id : str, optional
+        Experiment the request was routed for.
+    metrics : dict, optional
+        Additional named outcome metrics of the request, e.g.
+        {"click": 1.0, "revenue": 4.2}. Metrics may be omitted for some
+        requests; they are reported by compile_metric_evidence.
 
     Raises:
+    LateOutcomeError
+        If the request was evicted because it had no outcome within the
+        storage's attribution window (a subclass of ValueError).
     ValueError
         If the request_id does not exist in the request log.
 
     Behavior:
     - Links the outcome to the original request via request_id.
     - Assumes a single outcome per request.
+    - With src.instrumentation enabled, records the latency of the call
+      (and, with stage timing, of the lookup and save_outcome stages) and
+      counts the outcome (or the orphan).
     """
-    request_object = storage.get_request(request_id)
+    scoped_storage, _, _ = _scope(experiment_id)
+    start = time.perf_counter_ns() if instrumentation.enabled else None
+    stamps = [start] if start is not None and instrumentation.stage_timing else None
+    request_object = scoped_storage.get_request(request_id)
 
     if request_object is None:
+        late = scoped_storage.is_late_outcome(request_id)
+        if start is not None:
+            instrumentation.orphan_outcomes.inc("late" if late else "unknown")
+        if late:
+            raise LateOutcomeError(
+                f"Request ID {request_id} is outside the attribution window."
+            )
         raise ValueError(f"Request ID {request_id} not found.")
+    if stamps is not None:
+        stamps.append(time.perf_counter_ns())
 
     outcome_object = Outcome(
-        request_id=request_id, outcome_value=outcome, timestamp=time.time()
+        request_id=request_id,
+        outcome_value=outcome,
+        timestamp=time.time(),
+        metrics=dict(metrics) if metrics else None,
     )
 
-    storage.save_outcome(outcome_object)
-    # outcomes[request_id] = outcome
+    scoped_storage.save_outcome(outcome_object)
+    if start is not None:
+        instrumentation.record_latency.finish(
+            start, stamps, request_object.selected_model
+        )
+
+
+# function to record delayed outcomes in bulk
+def record_delayed_outcomes(request_ids, outcomes, experiment_id=None):
+    """
+    Record observed outcomes for many previously routed requests at once.
+
+    Parameters:
+    request_ids : sequence of int
+        Identifiers returned by route_request / route_requests.
+    outcomes : sequence of float or numpy.ndarray
+        Observed outcome values, aligned with request_ids.
+    experiment_id : str, optional
+        Experiment the requests were routed for.
+
+    Returns:
+    dict
+        Counts of "recorded" outcomes, "late" outcomes (requests evicted
+        from the attribution window) and "unknown" request ids.
+
+    Behavior:
+    - Equivalent to calling record_delayed_outcome for every pair, except
+      that unattributable rows are counted instead of raising, so one bad
+      row does not abort a large batch.
+    - Uses a single timestamp for the batch; the storage backend looks ids
+      up and merges the per-variant aggregates in bulk.
+    """
+    if len(request_ids) != len(outcomes):
+        raise ValueError("request_ids and outcomes must have the same length.")
+
+    scoped_storage, _, _ = _scope(experiment_id)
+    missing = scoped_storage.save_outcomes(request_ids, outcomes, time.time())
+    late = sum(
+        1 for request_id in missing if scoped_storage.is_late_outcome(request_id)
+    )
+    if instrumentation.enabled:
+        # Counted per variant, as record_delayed_outcome does
+        codes = scoped_storage.get_variant_codes(request_ids)
+        counts = np.bincount(codes[codes != FREE], minlength=len(CODE_VARIANTS))
+        for variant, count in zip(CODE_VARIANTS, counts.tolist()):
+            instrumentation.outcomes_recorded.inc(variant.value, count)
+        instrumentation.orphan_outcomes.inc("late", late)
+        instrumentation.orphan_outcomes.inc("unknown", len(missing) - late)
+
+    return {
+        "recorded": len(request_ids) - len(missing),
+        "late": late,
+        "unknown": len(missing) - late,
+    }
 
 
 # function to compile all evidence
-def compile_evidence():
+def compile_evidence(
+    experiment_id=None,
+    sequential=False,
+    ci_method="welch",
+    start=None,
+    end=None,
+    cuped=False,
+):
     """
     Aggregate recorded outcomes and produce a human-readable summary of
     statistical evidence for the A/B experiment.
 
+    Parameters:
+    experiment_id : str, optional
+        Experiment to report on. Only that experiment's storage partition is
+        read, and its confidence_level is used for the interval.
+    sequential : bool
+        Also report an always-valid confidence sequence and p-value (mSPRT),
+        which stay valid however often evidence is polled and allow stopping
+        as soon as the p-value drops below 1 - confidence_level.
+    ci_method : str
+        "welch" (default), "bootstrap" or "poisson-bootstrap"; see
+        compute_statistics. Bootstrap intervals resample the raw outcomes,
+        so they cost O(outcomes x resamples) instead of O(1). For binary
+        metrics the bootstrap only replaces the Newcombe interval; rates,
+        Cohen's h and the z-test still come from the counters.
+    start, end : float, optional
+        Unix timestamps restricting the evidence to outcomes recorded in
+        [start, end), e.g. the last 24 hours. In-memory storage answers
+        from time-bucketed aggregates in O(buckets); boundaries are aligned
+        to its finest bucket. The buckets are off by default, so the
+        storage must be created with time_buckets. Not available with
+        bootstrap intervals.
+    cuped : bool
+        Adjust the outcomes for the pre-experiment covariate passed at
+        routing time (CUPED). The same effect is estimated with a narrower
+        interval; only requests routed with a covariate are included. Not
+        available with bootstrap intervals or time windows.
+
     Returns:
     dict or str
         A dictionary containing rounded summary statistics, confidence interval,
@@ -122,8 +654,15 @@ def compile_evidence():
         Returns a string message if there are fewer than the minimum required
         outcomes per variant.
 
+    Raises:
+    ValueError
+        If start or end is given and in-memory storage keeps no time
+        buckets, or for an option combination that is not available.
+
     Behavior:
-    - Groups recorded outcomes by model variant (A and B) using request metadata.
+    - Reads the per-variant running aggregates maintained by the storage
+      layer, so the cost does not grow with the number of outcomes (except
+      for bootstrap intervals).
     - Delegates all statistical computation to compute_statistics.
     - Transforms raw statistical outputs into a presentation-friendly format
       (rounding values and applying descriptive labels).
@@ -136,14 +675,58 @@ def compile_evidence():
     - Each request has at most one recorded outcome.
     - Requests and outcomes stores are consistent and in sync.
     - Outcomes are numeric and comparable across variants.
+    - For binary experiments (metric_type "binary"), means are conversion
+      rates and the effect size is Cohen's h.
     """
-    outcomes_A = storage.get_outcomes_by_variant(ModelVariant.A)
-    outcomes_B = storage.get_outcomes_by_variant(ModelVariant.B)
-
-    stats_result = compute_statistics(outcomes_A, outcomes_B)
+    scoped_storage, _, config = _scope(experiment_id)
+    confidence_level = config.confidence_level if config is not None else 0.95
+    windowed = start is not None or end is not None
+    if cuped:
+        if ci_method != "welch" or windowed:
+            raise ValueError(
+                "CUPED is only available for Welch intervals over all outcomes."
+            )
+        summaries = scoped_storage.get_covariate_summaries()
+        outcomes_A, outcomes_B = summaries[ModelVariant.A], summaries[ModelVariant.B]
+    elif ci_method == "welch":
+        if windowed:
+            summaries = scoped_storage.get_window_summaries(start, end)
+        else:
+            summaries = scoped_storage.get_variant_summaries()
+        outcomes_A, outcomes_B = summaries[ModelVariant.A], summaries[ModelVariant.B]
+    elif windowed:
+        raise ValueError("Bootstrap intervals are not available for time windows.")
+    else:
+        outcomes_A = scoped_storage.get_outcomes_by_variant(ModelVariant.A)
+        outcomes_B = scoped_storage.get_outcomes_by_variant(ModelVariant.B)
+
+    stats_result = compute_statistics(
+        outcomes_A,
+        outcomes_B,
+        confidence_level,
+        sequential=sequential,
+        ci_method=ci_method,
+    )
     if stats_result is None:
         return "Not enough data to compute statistics."
-
+    if ci_method != "welch":
+        summaries = scoped_storage.get_variant_summaries()
+        if isinstance(summaries[ModelVariant.A], ProportionSummary):
+            # Binary metric: counter-based results around the bootstrap
+            # interval
+            interval = stats_result["ci_lower"], stats_result["ci_upper"]
+            stats_result = compute_statistics(
+                summaries[ModelVariant.A],
+                summaries[ModelVariant.B],
+                confidence_level,
+                sequential=sequential,
+            )
+            stats_result["ci_lower"], stats_result["ci_upper"] = interval
+    return _format_evidence(stats_result, confidence_level, sequential)
+
+
+def _format_evidence(stats_result, confidence_level, sequential=False):
+    # Round and label a compute_statistics result
     mean_A = stats_result["mean_A"]
     mean_B = stats_result["mean_B"]
     delta = stats_result["delta"]
@@ -153,13 +736,164 @@ def compile_evidence():
     n_B = stats_result["n_B"]
     effect_size = stats_result["effect_size"]
 
+    # Plain floats and ints whichever path (NumPy or counters) produced them
     evidence = {
-        "Model A Mean Outcome": round(mean_A, 4),
-        "Model B Mean Outcome": round(mean_B, 4),
-        "Difference in Means (B - A)": round(delta, 4),
-        "95% Confidence Interval": (round(ci_lower, 4), round(ci_upper, 4)),
-        "Number of Outcomes for Model A": n_A,
-        "Number of Outcomes for Model B": n_B,
-        "Effect Size": round(effect_size, 4),
+        "Model A Mean Outcome": round(float(mean_A), 4),
+        "Model B Mean Outcome": round(float(mean_B), 4),
+        "Difference in Means (B - A)": round(float(delta), 4),
+        f"{confidence_level * 100:g}% Confidence Interval": (
+            round(float(ci_lower), 4),
+            round(float(ci_upper), 4),
+        ),
+        "Number of Outcomes for Model A": int(n_A),
+        "Number of Outcomes for Model B": int(n_B),
+        "Effect Size": round(float(effect_size), 4),
     }
+    if "p_value" in stats_result:
+        # Binary metric: rates, Newcombe interval and Cohen's h from counters
+        evidence["Two-Proportion z-test p-value"] = round(
+            float(stats_result["p_value"]), 4
+        )
+    if "variance_reduction" in stats_result:
+        evidence["CUPED Variance Reduction"] = round(
+            float(stats_result["variance_reduction"]), 4
+        )
+    if sequential:
+        evidence[f"Always-Valid {confidence_level * 100:g}% Confidence Sequence"] = (
+            round(float(stats_result["cs_lower"]), 4),
+            round(float(stats_result["cs_upper"]), 4),
+        )
+        evidence["Always-Valid p-value"] = round(
+            float(stats_result["always_valid_p_value"]), 4
+        )
+    return evidence
+
+
+# function to compile evidence for all named metrics
+def compile_metric_evidence(experiment_id=None):
+    """
+    Produce a summary of statistical evidence for every named outcome metric.
+
+    Parameters:
+    experiment_id : str, optional
+        Experiment to report on, as in compile_evidence.
+
+    Returns:
+    dict
+        Maps each metric name (as passed to record_delayed_outcome) to a
+        dictionary in the format of compile_evidence, or to a string message
+        if that metric has fewer than the minimum required outcomes per
+        variant.
+
+    Behavior:
+    - Reads the per-variant metric aggregates maintained by the storage
+      layer and compares all metrics with a single vectorised call to
+      compute_metric_statistics.
+    - Only rounds and labels the results, like compile_evidence.
+    """
+    scoped_storage, _, config = _scope(experiment_id)
+    confidence_level = config.confidence_level if config is not None else 0.95
+    summaries = scoped_storage.get_metric_summaries()
+
+    stats_result = compute_metric_statistics(
+        summaries[ModelVariant.A], summaries[ModelVariant.B], confidence_level
+    )
+
+    evidence = {}
+    for i, name in enumerate(stats_result["metrics"]):
+        if np.isnan(stats_result["delta"][i]):
+            evidence[name] = "Not enough data to compute statistics."
+            continue
+        evidence[name] = {
+            "Model A Mean Outcome": round(float(stats_result["mean_A"][i]), 4),
+            "Model B Mean Outcome": round(float(stats_result["mean_B"][i]), 4),
+            "Difference in Means (B - A)": round(float(stats_result["delta"][i]), 4),
+            f"{confidence_level * 100:g}% Confidence Interval": (
+                round(float(stats_result["ci_lower"][i]), 4),
+                round(float(stats_result["ci_upper"][i]), 4),
+            ),
+            "Number of Outcomes for Model A": int(stats_result["n_A"][i]),
+            "Number of Outcomes for Model B": int(stats_result["n_B"][i]),
+            "Effect Size": round(float(stats_result["effect_size"][i]), 4),
+        }
+    return evidence
+
+
+# function to compile evidence per time bucket
+def compile_evidence_trend(start, end, resolution=86400, experiment_id=None):
+    """
+    Produce evidence for consecutive time windows, e.g. a daily trend.
+
+    Parameters:
+    start, end : float
+        Unix timestamps delimiting the reported period [start, end).
+    resolution : float
+        Width of each window in seconds (default: one day).
+    experiment_id : str, optional
+        Experiment to report on, as in compile_evidence.
+
+    Returns:
+    list
+        One (window_start, evidence) pair per window, where evidence is
+        what compile_evidence(start=window_start, end=window_end) returns.
+
+    Raises:
+    ValueError
+        If in-memory storage keeps no time buckets.
+
+    Behavior:
+    - Each window only merges the storage's pre-aggregated time buckets,
+      so a trend costs O(windows x buckets per window). In-memory storage
+      must be created with time_buckets.
+    - Comparing early and late windows shows novelty or learning effects.
+    """
+    trend = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + resolution, end)
+        evidence = compile_evidence(
+            experiment_id=experiment_id, start=window_start, end=window_end
+        )
+        trend.append((window_start, evidence))
+        window_start = window_end
+    return trend
+
+
+# function to compile evidence per segment value
+def compile_segment_evidence(dimension, experiment_id=None):
+    """
+    Produce evidence broken down by the values of one segment dimension.
+
+    Parameters:
+    dimension : str
+        Segment dimension passed at routing time, e.g. "country".
+    experiment_id : str, optional
+        Experiment to report on, as in compile_evidence.
+
+    Returns:
+    dict
+        Maps each segment value to a dictionary in the format of
+        compile_evidence, or to a string message if that segment has fewer
+        than the minimum required outcomes per variant. Values beyond the
+        storage's cardinality cap are reported together as "__other__".
+
+    Behavior:
+    - Reads the per-(segment, variant) aggregates maintained by the storage
+      layer, so each segment costs one compute_statistics call on running
+      summaries, independent of the number of outcomes.
+    - Segments are not corrected for multiple comparisons; treat
+      per-segment results as exploratory.
+    """
+    scoped_storage, _, config = _scope(experiment_id)
+    confidence_level = config.confidence_level if config is not None else 0.95
+
+    evidence = {}
+    for value, summaries in scoped_storage.get_segment_summaries(dimension).items():
+        stats_result = compute_statistics(
+            summaries[ModelVariant.A], summaries[ModelVariant.B], confidence_level
+        )
+        if stats_result is None:
+            evidence[value] = "Not enough data to compute statistics."
+        else:
+            evidence[value] = _format_evidence(stats_result, confidence_level)
     return evidence
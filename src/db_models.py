@@ -1,4 +1,13 @@
-from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Index, String
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    String,
+)
 from sqlalchemy.sql import func
 
 from src.database import Base
@@ -11,8 +20,9 @@ class DBModel(Base):
 
     model_id = Column(String(255), primary_key=True)
     adapter_type = Column(String(50))  #'python callable', 'http_endpoint'
-    location = Column(String(50))  # path or URL
-    metadata = Column(JSON)
+    location = Column(String(2048))  # path or URL
+    # "metadata" is reserved on declarative classes, so map it under another name
+    model_metadata = Column("metadata", JSON)
     created_at = Column(DateTime, server_default=func.now())
 
 
@@ -32,11 +42,12 @@ class DBExperiments(Base):
 
 class DBRequest(Base):
     __tablename__ = "requests"
-    request_id = Column(String(255), primary_key=True)
+    # time-ordered ids from src.ids, so inserts append to the primary key index
+    request_id = Column(BigInteger, primary_key=True, autoincrement=False)
     experiment_id = Column(String(255), ForeignKey("experiments.experiment_id"))
     model_variant = Column(String(10))  # "A" or "B"
     timestamp = Column(DateTime)
-    metadata = Column(JSON)
+    request_metadata = Column("metadata", JSON)
 
     __table_args__ = (Index("idx_experiment_timestamp", "experiment_id", "timestamp"),)
 
@@ -44,8 +55,13 @@ class DBRequest(Base):
 class DBOutcome(Base):
     __tablename__ = "outcomes"
     request_id = Column(
-        String(255), ForeignKey("requests.request_id"), primary_key=True
+        BigInteger,
+        ForeignKey("requests.request_id"),
+        primary_key=True,
+        autoincrement=False,
     )
     value = Column(Float)
     timestamp = Column(DateTime)
+    # named outcome metrics, {name: value}; NULL when there are none
+    metrics = Column(JSON(none_as_null=True))
     __table_args__ = (Index("idx_request_id", "request_id"),)
@@ -0,0 +1,105 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from src.models import ExperimentConfig, Model
+from src.storage import InMemoryStorage, StorageBackend
+
+
+@dataclass
+class Experiment:
+    # Runtime state of one experiment: its config, models and own storage
+    config: ExperimentConfig
+    storage: StorageBackend
+    models: Dict[str, Model] = field(default_factory=dict)
+
+    @property
+    def experiment_id(self) -> str:
+        return self.config.experiment_id
+
+
+def config_from_db(db_experiment) -> ExperimentConfig:
+    """
+    Convert a row of the experiments table into an ExperimentConfig.
+
+    Parameters:
+    db_experiment : DBExperiments
+        Persisted experiment definition.
+
+    Returns:
+    ExperimentConfig
+        Equivalent runtime configuration (probability_split becomes
+        traffic_split).
+    """
+    return ExperimentConfig(
+        experiment_id=db_experiment.experiment_id,
+        model_a_id=db_experiment.model_a_id,
+        model_b_id=db_experiment.model_b_id,
+        traffic_split=db_experiment.probability_split,
+        confidence_level=db_experiment.confidence_level or 0.95,
+        metric_type=db_experiment.metric_type or "continuous",
+        status=db_experiment.status or "running",
+    )
+
+
+class ExperimentRegistry:
+    """
+    Registry of concurrently running experiments.
+
+    Every experiment owns a separate storage partition created by
+    storage_factory(experiment_id), so routing, outcome recording and
+    evidence for one experiment never touch another experiment's data,
+    and dropping an experiment is a single dict removal.
+
+    Parameters:
+    storage_factory : callable, optional
+        Called with the experiment id to create that experiment's storage.
+        Defaults to a fresh InMemoryStorage per experiment that aggregates
+        by the experiment's metric_type; for persistence use e.g.
+        lambda eid: DatabaseStorage(session_factory, experiment_id=eid),
+        which creates the experiment's row in the experiments table if it
+        does not exist yet (requests reference it by foreign key).
+    """
+
+    def __init__(
+        self, storage_factory: Optional[Callable[[str], StorageBackend]] = None
+    ):
+        self.storage_factory = storage_factory
+        self._experiments: Dict[str, Experiment] = {}
+
+    def create(
+        self, config: ExperimentConfig, storage: Optional[StorageBackend] = None
+    ) -> Experiment:
+        if config.experiment_id in self._experiments:
+            raise ValueError(f"Experiment {config.experiment_id} already exists.")
+        if storage is None:
+            storage = self._create_storage(config)
+        experiment = Experiment(config=config, storage=storage)
+        self._experiments[config.experiment_id] = experiment
+        return experiment
+
+    def _create_storage(self, config: ExperimentConfig) -> StorageBackend:
+        if self.storage_factory is not None:
+            return self.storage_factory(config.experiment_id)
+        return InMemoryStorage(metric_type=config.metric_type)
+
+    def get(self, experiment_id: str) -> Experiment:
+        try:
+            return self._experiments[experiment_id]
+        except KeyError:
+            raise ValueError(f"Experiment {experiment_id} not found.") from None
+
+    def drop(self, experiment_id: str) -> Experiment:
+        # O(1): the experiment's storage partition goes with it
+        try:
+            return self._experiments.pop(experiment_id)
+        except KeyError:
+            raise ValueError(f"Experiment {experiment_id} not found.") from None
+
+    def __contains__(self, experiment_id) -> bool:
+        return experiment_id in self._experiments
+
+    def __iter__(self):
+        return iter(self._experiments.values())
+
+    def __len__(self) -> int:
+        return len(self._experiments)
@@ -0,0 +1,158 @@
+# Compact, time-ordered request ids.
+#
+# A request id is a positive 63-bit integer laid out like a snowflake id:
+#
+#   | 41 bits: ms since EPOCH_MS | 10 bits: node id | 12 bits: sequence |
+#
+# Ids from one generator strictly increase, and ids from all nodes sort by
+# generation time (to the millisecond), so database index inserts are
+# append-only and requests can be range-partitioned or expired by id alone.
+# The node id (0-1023) keeps ids of concurrent processes apart; the default
+# generator reads it from the KRISIS_NODE_ID environment variable.
+# A forked child (e.g. a pre-fork server worker) inherits that node id and
+# the parent's sequence state, so the default generator is reseeded in every
+# child with a node id derived from its pid and distinct from the parent's.
+# Sibling workers get distinct node ids as long as their pids are less than
+# 1023 apart; servers that can do better call set_node_id from their
+# post-fork hook (e.g. with a worker index) before routing any request.
+
+import os
+import threading
+import time
+from typing import List
+
+# 2024-01-01T00:00:00Z; 41 bits of milliseconds last until 2093
+EPOCH_MS = 1_704_067_200_000
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = NODE_BITS + SEQUENCE_BITS
+
+
+class IdGenerator:
+    """
+    Thread-safe generator of time-ordered 63-bit request ids.
+
+    Parameters:
+    node_id : int
+        Id of this process among the processes writing to the same storage,
+        in [0, 1023].
+
+    Notes:
+    - Up to 4096 ids are generated per millisecond. A burst beyond that,
+      or a clock that steps backwards, borrows the following millisecond
+      instead of waiting, so ids never repeat or decrease; the clock
+      catches up with the borrowed time afterwards.
+    """
+
+    def __init__(self, node_id: int = 0):
+        self.reseed(node_id)
+
+    def reseed(self, node_id: int) -> None:
+        # Switch to another node id with fresh state and a fresh lock (the
+        # old one may be held by a thread that did not survive a fork)
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f"node_id must be in [0, {MAX_NODE}], got {node_id}.")
+        self.node_id = node_id
+        self._node_bits = node_id << SEQUENCE_BITS
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = MAX_SEQUENCE
+
+    def _advance(self) -> None:
+        # Move to the current (or, when exhausted, the next) millisecond;
+        # called with the lock held
+        now = time.time_ns() // 1_000_000 - EPOCH_MS
+        if now > self._last_ms:
+            self._last_ms = now
+            self._sequence = 0
+        elif self._sequence < MAX_SEQUENCE:
+            self._sequence += 1
+        else:
+            self._last_ms += 1
+            self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._advance()
+            return (self._last_ms << TIMESTAMP_SHIFT) | self._node_bits | self._sequence
+
+    def next_ids(self, n: int) -> List[int]:
+        """
+        Generate n consecutive ids at once.
+
+        Parameters:
+        n : int
+            Number of ids.
+
+        Returns:
+        list of int
+            Increasing ids, taken as whole runs of sequence numbers per
+            millisecond rather than one lock round trip per id.
+        """
+        ids: List[int] = []
+        with self._lock:
+            while len(ids) < n:
+                self._advance()
+                take = min(n - len(ids), MAX_SEQUENCE + 1 - self._sequence)
+                first = (
+                    (self._last_ms << TIMESTAMP_SHIFT)
+                    | self._node_bits
+                    | self._sequence
+                )
+                ids.extend(range(first, first + take))
+                self._sequence += take - 1
+        return ids
+
+
+def timestamp_of(request_id: int) -> float:
+    # Unix time (seconds, millisecond resolution) an id was generated at
+    return ((request_id >> TIMESTAMP_SHIFT) + EPOCH_MS) / 1000
+
+
+def node_of(request_id: int) -> int:
+    return (request_id >> SEQUENCE_BITS) & MAX_NODE
+
+
+def min_id_at(timestamp: float) -> int:
+    # Smallest id of the millisecond holding the Unix time timestamp: ids
+    # generated in earlier milliseconds are exactly those below it
+    ms = max(int(timestamp * 1000) - EPOCH_MS, 0)
+    return ms << TIMESTAMP_SHIFT
+
+
+def _default_node_id() -> int:
+    return int(os.environ.get("KRISIS_NODE_ID", "0"))
+
+
+_generator = IdGenerator(_default_node_id())
+new_id = _generator.next_id
+new_ids = _generator.next_ids
+
+
+def set_node_id(node_id: int) -> None:
+    """
+    Set the node id of the default generator (new_id and new_ids).
+
+    Parameters:
+    node_id : int
+        Id of this process among the processes writing to the same storage,
+        in [0, 1023], e.g. a worker index assigned by the server.
+    """
+    _generator.reseed(node_id)
+
+
+def _child_node_id(parent: int) -> int:
+    # A pid-derived node id in [0, 1023] other than the parent's
+    node_id = os.getpid() % MAX_NODE
+    return node_id + 1 if node_id >= parent else node_id
+
+
+def _after_fork() -> None:
+    _generator.reseed(_child_node_id(_generator.node_id))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
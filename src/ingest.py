@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from src.core import record_delayed_outcomes
+
+
+def _detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Cannot infer the outcome file format of {path}.")
+
+
+def _parse_id(value):
+    # Request ids from route_request are integers, but CSV cells (and ids
+    # quoted in JSON) are strings; other ids are kept as they are
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _iter_rows(path, file_format, id_field, value_field):
+    with open(path, newline="") as handle:
+        if file_format == "jsonl":
+            for line in handle:
+                if line.strip():
+                    row = json.loads(line)
+                    yield _parse_id(row[id_field]), row[value_field]
+        elif file_format == "csv":
+            reader = csv.reader(handle)
+            header = next(reader)
+            id_column = header.index(id_field)
+            value_column = header.index(value_field)
+            for row in reader:
+                if row:
+                    yield _parse_id(row[id_column]), row[value_column]
+        else:
+            raise ValueError(f"Unsupported outcome file format: {file_format}")
+
+
+def iter_outcome_chunks(
+    path,
+    chunk_size=100_000,
+    file_format=None,
+    id_field="request_id",
+    value_field="outcome",
+):
+    """
+    Stream (request_ids, outcomes) chunks from a JSONL or CSV outcome file.
+
+    Parameters:
+    path : str
+        File with one outcome per line/row.
+    chunk_size : int
+        Maximum number of outcomes per chunk; bounds memory use regardless
+        of the file size.
+    file_format : str, optional
+        "jsonl" or "csv"; inferred from the file extension when omitted.
+    id_field, value_field : str
+        Names of the request id and outcome value fields / columns.
+
+    Yields:
+    tuple
+        (request_ids, outcomes) with a list of ids and a float64 array.
+    """
+    file_format = file_format or _detect_format(path)
+    request_ids, values = [], []
+
+    for request_id, value in _iter_rows(path, file_format, id_field, value_field):
+        request_ids.append(request_id)
+        values.append(value)
+        if len(request_ids) == chunk_size:
+            yield request_ids, np.asarray(values, dtype=np.float64)
+            request_ids, values = [], []
+
+    if request_ids:
+        yield request_ids, np.asarray(values, dtype=np.float64)
+
+
+def load_outcomes(path, experiment_id=None, chunk_size=100_000, **options):
+    """
+    Ingest an outcome file in bounded-memory chunks.
+
+    Parameters:
+    path : str
+        JSONL or CSV file of delayed outcomes.
+    experiment_id : str, optional
+        Experiment the requests were routed for.
+    chunk_size : int
+        Number of outcomes recorded per record_delayed_outcomes call.
+    options :
+        Passed to iter_outcome_chunks (file_format, id_field, value_field).
+
+    Returns:
+    dict
+        Total "recorded", "late" and "unknown" counts over the whole file.
+    """
+    totals = {"recorded": 0, "late": 0, "unknown": 0}
+    for request_ids, values in iter_outcome_chunks(path, chunk_size, **options):
+        counts = record_delayed_outcomes(request_ids, values, experiment_id)
+        for key, count in counts.items():
+            totals[key] += count
+    return totals
@@ -0,0 +1,353 @@
+# Hot-path instrumentation of route_request and record_delayed_outcome.
+#
+# When enabled, routing and recording record the latency of the whole call
+# in fixed-bucket histograms (the "total" stage). With stages=True they also
+# record each stage: request id generation, variant assignment,
+# storage.save_request and the model call for routing; request lookup and
+# storage.save_outcome for recording. Per-stage timing takes a clock reading
+# per stage, so it is opt-in. Counters track routed requests and recorded
+# outcomes per variant, and orphaned outcomes.
+# Disabled by default: the hot paths then only test `enabled`.
+
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+enabled = False
+# Time every stage of a call, not only the whole call; see enable
+stage_timing = False
+
+# Upper bucket bounds in nanoseconds, 1-2.5-5 steps from 250ns to 10s;
+# a final overflow bucket catches everything slower
+BUCKET_BOUNDS_NS = np.array(
+    [step * 10**exponent for exponent in range(2, 10) for step in (2.5, 5, 10)],
+    dtype=np.int64,
+)
+
+# Records buffered before they are binned
+FLUSH_SIZE = 4096
+
+_clock = time.perf_counter_ns
+
+
+class Counter:
+    # Monotonic counters keyed by a label value (e.g. the variant)
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values: Dict[str, int] = {}
+
+    def inc(self, label: str, amount: int = 1) -> None:
+        self.values[label] = self.values.get(label, 0) + amount
+
+    def reset(self) -> None:
+        self.values = {}
+
+
+class StageHistograms:
+    """
+    Latency histograms of the consecutive stages of one instrumented call.
+
+    A call takes a perf_counter_ns stamp when it starts and passes it to
+    finish together with a label (the variant), which is counted in
+    counter; only the "total" histogram is updated. With per-stage timing,
+    the call also takes a stamp at every stage boundary: stage i lasts from
+    stamp i to stamp i + 1, and "total" covers the first to the last stamp.
+
+    Parameters:
+    stages : sequence of str
+        Names of the stages, one fewer than the stamps of a call.
+    counter : Counter
+        Counter incremented once per recorded call, by label.
+
+    Notes:
+    - Recording only appends to flat lists; every FLUSH_SIZE calls the
+      buffer is binned for all stages at once with NumPy, so the per-call
+      cost stays far below that of observing every stage in Python.
+    - Labels are kept as given (e.g. ModelVariant members) and converted to
+      their value when binned, which is cheaper than reading .value per
+      call.
+    - Appends take no lock. A record racing with a flush may be dropped or
+      counted under the wrong label, which is acceptable for monitoring
+      data.
+    """
+
+    # Flat stage stamps (len(stages) per call) and labels of the calls
+    # recorded since the last flush with per-stage timing, and total
+    # durations and labels of those recorded without
+    _stamps: List[int]
+    _labels: list
+    _durations: List[int]
+    _total_labels: list
+    # Histogram bucket counts and summed durations per stage
+    counts: np.ndarray
+    totals_ns: np.ndarray
+
+    def __init__(self, stages: Sequence[str], counter: Counter):
+        self.stages = tuple(stages) + ("total",)
+        self.counter = counter
+        # Distinct labels recorded so far
+        self._seen: list = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def finish(self, start: int, stamps: Optional[list], label) -> None:
+        # Record a call that started at perf_counter_ns() == start; stamps
+        # are its stage stamps, or None without per-stage timing
+        end = _clock()
+        if stamps is None:
+            self._durations.append(end - start)
+            labels = self._total_labels
+        else:
+            stamps.append(end)
+            self._stamps.extend(stamps)
+            labels = self._labels
+        labels.append(label)
+        if len(labels) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            flat, labels = self._stamps, self._labels
+            self._stamps, self._labels = [], []
+            totals, total_labels = self._durations, self._total_labels
+            self._durations, self._total_labels = [], []
+            width = len(self.stages)
+            n = min(len(flat) // width, len(labels))
+            if n:
+                stamps = np.fromiter(flat, dtype=np.int64, count=n * width)
+                stamps = stamps.reshape(n, width)
+                durations = np.empty((n, len(self.stages)), dtype=np.int64)
+                durations[:, :-1] = np.diff(stamps, axis=1)
+                durations[:, -1] = stamps[:, -1] - stamps[:, 0]
+                self._bin(durations)
+            m = min(len(totals), len(total_labels))
+            if m:
+                durations = np.zeros((m, len(self.stages)), dtype=np.int64)
+                durations[:, -1] = np.fromiter(totals, dtype=np.int64, count=m)
+                self._bin(durations, first_stage=len(self.stages) - 1)
+            del labels[n:]
+            del total_labels[m:]
+            self._count(labels)
+            self._count(total_labels)
+
+    def _count(self, labels: list) -> None:
+        # Count calls per label. Labels are matched against the labels seen
+        # before with list.count, which compares by identity first: hashing
+        # every enum member in a set would run Python code per call.
+        counted = 0
+        for label in self._seen:
+            calls = labels.count(label)
+            if calls:
+                self.counter.inc(getattr(label, "value", label), calls)
+                counted += calls
+        if counted < len(labels):
+            for label in set(labels).difference(self._seen):
+                self._seen.append(label)
+                self.counter.inc(getattr(label, "value", label), labels.count(label))
+
+    def _bin(self, durations: np.ndarray, first_stage: int = 0) -> None:
+        # Add per-stage durations (one row per call) to the histograms of
+        # the stages from first_stage on
+        stages = range(first_stage, len(self.stages))
+        for stage in stages:
+            buckets = np.searchsorted(
+                BUCKET_BOUNDS_NS, durations[:, stage], side="left"
+            )
+            self.counts[stage] += np.bincount(
+                buckets, minlength=len(BUCKET_BOUNDS_NS) + 1
+            )
+            self.totals_ns[stage] += durations[:, stage].sum()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stamps, self._labels = [], []
+            self._durations, self._total_labels = [], []
+            self.counts = np.zeros(
+                (len(self.stages), len(BUCKET_BOUNDS_NS) + 1), dtype=np.int64
+            )
+            self.totals_ns = np.zeros(len(self.stages), dtype=np.int64)
+
+    def cumulative(self, stage: int) -> List[Tuple[float, int]]:
+        # (upper bound in seconds, calls <= bound) of one stage, ending with
+        # the +inf bucket
+        bounds = np.append(BUCKET_BOUNDS_NS / 1e9, np.inf)
+        running = np.cumsum(self.counts[stage])
+        return [(float(b), int(c)) for b, c in zip(bounds, running)]
+
+    def quantile(self, stage: int, q: float) -> float:
+        # Upper bound (seconds) of the bucket holding the q-quantile of one
+        # stage; 0.0 without observations
+        running = np.cumsum(self.counts[stage])
+        if not running[-1]:
+            return 0.0
+        index = int(np.searchsorted(running, q * running[-1], side="left"))
+        if index == len(BUCKET_BOUNDS_NS):
+            return float("inf")
+        return float(BUCKET_BOUNDS_NS[index] / 1e9)
+
+
+requests_routed = Counter()
+# Outcomes recorded with record_delayed_outcomes are counted under "batch",
+# as the bulk path does not look their variant up
+outcomes_recorded = Counter()
+# Outcomes that could not be attributed, keyed by "unknown" or "late"
+orphan_outcomes = Counter()
+
+# Stamps of route_request / route_request_async: call start, after the id,
+# after assignment, after save_request, after the model (for async calls
+# the model stage includes waiting for a concurrency slot)
+route_latency = StageHistograms(
+    ("id", "assign", "save_request", "model"), requests_routed
+)
+# Stamps of record_delayed_outcome: call start, after the request lookup,
+# after save_outcome
+record_latency = StageHistograms(("lookup", "save_outcome"), outcomes_recorded)
+
+_HISTOGRAMS = (
+    (
+        "krisis_route_stage_seconds",
+        "Latency of the stages of route_request.",
+        route_latency,
+    ),
+    (
+        "krisis_record_stage_seconds",
+        "Latency of the stages of record_delayed_outcome.",
+        record_latency,
+    ),
+)
+_COUNTERS = (
+    (
+        "krisis_requests_routed_total",
+        "Requests routed, per variant.",
+        "variant",
+        requests_routed,
+    ),
+    (
+        "krisis_outcomes_recorded_total",
+        "Outcomes recorded, per variant.",
+        "variant",
+        outcomes_recorded,
+    ),
+    (
+        "krisis_orphan_outcomes_total",
+        "Outcomes for unknown or evicted requests.",
+        "reason",
+        orphan_outcomes,
+    ),
+)
+
+
+def enable(stages: bool = False) -> None:
+    """
+    Turn instrumentation on.
+
+    Parameters:
+    stages : bool
+        Also time every stage of route_request and record_delayed_outcome,
+        not only the whole call. This costs one clock reading per stage
+        (about 4 more per call), so leave it off in production unless the
+        stage breakdown is needed.
+    """
+    global enabled, stage_timing
+    stage_timing = stages
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    # Drop all recorded data
+    for _, _, histograms in _HISTOGRAMS:
+        histograms.reset()
+    for _, _, _, counter in _COUNTERS:
+        counter.reset()
+
+
+def _flush() -> None:
+    for _, _, histograms in _HISTOGRAMS:
+        histograms.flush()
+
+
+def snapshot() -> dict:
+    """
+    Current instrumentation data as plain Python values.
+
+    Returns:
+    dict
+        - enabled: whether instrumentation is on
+        - route, record: per stage (and "total"), the call count,
+          sum_seconds, p50_seconds and p99_seconds (bucket upper bounds)
+          and the cumulative buckets as (upper bound in seconds, count)
+          pairs
+        - requests_routed, outcomes_recorded: counts per variant
+        - orphan_outcomes: counts per reason ("unknown", "late")
+
+    Notes:
+    - Comparing the "model" stage with "total" separates the cost of the
+      model from the framework overhead of routing.
+    """
+    _flush()
+
+    def describe(histograms):
+        return {
+            stage: {
+                "count": int(histograms.counts[i].sum()),
+                "sum_seconds": float(histograms.totals_ns[i] / 1e9),
+                "p50_seconds": histograms.quantile(i, 0.5),
+                "p99_seconds": histograms.quantile(i, 0.99),
+                "buckets": histograms.cumulative(i),
+            }
+            for i, stage in enumerate(histograms.stages)
+        }
+
+    return {
+        "enabled": enabled,
+        "route": describe(route_latency),
+        "record": describe(record_latency),
+        "requests_routed": dict(requests_routed.values),
+        "outcomes_recorded": dict(outcomes_recorded.values),
+        "orphan_outcomes": dict(orphan_outcomes.values),
+    }
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def export_prometheus() -> str:
+    """
+    Instrumentation data in the Prometheus text exposition format.
+
+    Returns:
+    str
+        One histogram metric per instrumented call, with the stage as a
+        label and bounds in seconds, followed by the counters.
+    """
+    _flush()
+    lines = []
+    for name, help_text, histograms in _HISTOGRAMS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for i, stage in enumerate(histograms.stages):
+            for bound, running in histograms.cumulative(i):
+                lines.append(
+                    f'{name}_bucket{{stage="{stage}",le="{_format_bound(bound)}"}} '
+                    f"{running}"
+                )
+            total = float(histograms.totals_ns[i] / 1e9)
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total!r}')
+            lines.append(
+                f'{name}_count{{stage="{stage}"}} {int(histograms.counts[i].sum())}'
+            )
+    for name, help_text, label, counter in _COUNTERS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for value, count in sorted(counter.values.items()):
+            lines.append(f'{name}{{{label}="{value}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,10 @@
+import math
 from dataclasses import dataclass, field
-from typing import Dict, Any
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
 from enum import Enum
 
+import numpy as np
+
 
 class ModelVariant(Enum):
     A = "A"
@@ -17,17 +20,20 @@ class Model:
 
 @dataclass
 class Request:
-    request_id: str
+    request_id: int
     selected_model: ModelVariant
     input_data: Any
     timestamp: float
+    segments: Optional[Dict[str, Any]] = None  # e.g. {"country": "DE"}
+    covariate: Optional[float] = None  # pre-experiment metric, for CUPED
 
 
 @dataclass
 class Outcome:
-    request_id: str
+    request_id: int
     outcome_value: float
     timestamp: float
+    metrics: Optional[Dict[str, float]] = None  # additional named metrics
 
 
 @dataclass
@@ -39,3 +45,298 @@ class ExperimentConfig:
     confidence_level: float
     metric_type: str  # "binary" or "continuous"
     status: str
+
+
+@dataclass
+class OutcomeSummary:
+    # Running sufficient statistics for one variant (Welford's algorithm).
+    # m2 is the sum of squared deviations from the running mean.
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def update(self, value: float) -> None:
+        self.n += 1
+        d = value - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        # Inverse of update, used when a recorded outcome is overwritten
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        d = value - self.mean
+        self.n -= 1
+        self.mean -= d / self.n
+        self.m2 = max(self.m2 - d * (value - self.mean), 0.0)
+
+    def merge(self, other: "OutcomeSummary") -> None:
+        # Chan et al. parallel combination of two summaries
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+
+    @property
+    def variance(self) -> float:
+        # Sample variance (ddof=1)
+        if self.n < 2:
+            return 0.0
+        return self.m2 / (self.n - 1)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "OutcomeSummary":
+        summary = cls()
+        for value in values:
+            summary.update(value)
+        return summary
+
+    @classmethod
+    def from_sums(cls, n: int, total: float, total_sq: float) -> "OutcomeSummary":
+        # Build a summary from COUNT / SUM / SUM of squares
+        if n == 0:
+            return cls()
+        mean = total / n
+        return cls(n=n, mean=mean, m2=max(total_sq - total * mean, 0.0))
+
+
+@dataclass
+class ProportionSummary:
+    # Counters of a binary (0/1) outcome for one variant. Replaces
+    # OutcomeSummary for experiments with metric_type "binary": two integers
+    # are all the state a conversion experiment needs.
+    successes: int = 0
+    trials: int = 0
+
+    @staticmethod
+    def validate(value) -> None:
+        if value not in (0, 1):
+            raise ValueError(f"Binary outcomes must be 0 or 1, got {value!r}.")
+
+    def update(self, value: float) -> None:
+        self.validate(value)
+        self.successes += int(value)
+        self.trials += 1
+
+    def remove(self, value: float) -> None:
+        # Inverse of update, used when a recorded outcome is overwritten
+        self.successes -= int(value)
+        self.trials -= 1
+
+    def merge(self, other: "ProportionSummary") -> None:
+        self.successes += other.successes
+        self.trials += other.trials
+
+    @property
+    def n(self) -> int:
+        return self.trials
+
+    @property
+    def rate(self) -> float:
+        return self.successes / self.trials if self.trials else 0.0
+
+    @classmethod
+    def from_values(cls, values) -> "ProportionSummary":
+        values = np.asarray(values, dtype=np.float64)
+        if not np.isin(values, (0.0, 1.0)).all():
+            raise ValueError("Binary outcomes must be 0 or 1.")
+        return cls(successes=int(values.sum()), trials=len(values))
+
+
+# Per-variant running aggregate of an experiment's primary metric
+Summary = Union[OutcomeSummary, ProportionSummary]
+
+
+@dataclass
+class CovariateSummary:
+    # Running co-moments of a pre-experiment covariate x and the outcome y
+    # for one variant (bivariate Welford), all the state CUPED needs.
+    # c_xy is the sum of products of deviations from the running means.
+    n: int = 0
+    mean_x: float = 0.0
+    mean_y: float = 0.0
+    m2_x: float = 0.0
+    m2_y: float = 0.0
+    c_xy: float = 0.0
+
+    def update(self, x: float, y: float) -> None:
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def remove(self, x: float, y: float) -> None:
+        # Inverse of update, used when a recorded outcome is overwritten
+        if self.n <= 1:
+            self.n, self.mean_x, self.mean_y = 0, 0.0, 0.0
+            self.m2_x, self.m2_y, self.c_xy = 0.0, 0.0, 0.0
+            return
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.n -= 1
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.m2_x = max(self.m2_x - dx * (x - self.mean_x), 0.0)
+        self.m2_y = max(self.m2_y - dy * (y - self.mean_y), 0.0)
+        self.c_xy -= dx * (y - self.mean_y)
+
+    def merge(self, other: "CovariateSummary") -> None:
+        # Chan et al. combination, extended to the co-moment
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean_x, self.mean_y = other.n, other.mean_x, other.mean_y
+            self.m2_x, self.m2_y, self.c_xy = other.m2_x, other.m2_y, other.c_xy
+            return
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.m2_x += other.m2_x + dx * dx * weight
+        self.m2_y += other.m2_y + dy * dy * weight
+        self.c_xy += other.c_xy + dx * dy * weight
+        self.n = n
+
+    @classmethod
+    def from_values(cls, x, y) -> "CovariateSummary":
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if not len(x):
+            return cls()
+        dx = x - x.mean()
+        dy = y - y.mean()
+        return cls(
+            n=len(x),
+            mean_x=float(x.mean()),
+            mean_y=float(y.mean()),
+            m2_x=float(dx @ dx),
+            m2_y=float(dy @ dy),
+            c_xy=float(dx @ dy),
+        )
+
+    @classmethod
+    def from_sums(cls, n, sum_x, sum_y, sum_xx, sum_yy, sum_xy) -> "CovariateSummary":
+        # Build a summary from COUNT and the SUMs of x, y, x², y² and xy
+        if n == 0:
+            return cls()
+        mean_x, mean_y = sum_x / n, sum_y / n
+        return cls(
+            n=n,
+            mean_x=mean_x,
+            mean_y=mean_y,
+            m2_x=max(sum_xx - sum_x * mean_x, 0.0),
+            m2_y=max(sum_yy - sum_y * mean_y, 0.0),
+            c_xy=sum_xy - sum_x * mean_y,
+        )
+
+
+@dataclass
+class MetricSummary:
+    # Vectorised OutcomeSummary: one Welford accumulator per named metric,
+    # held as NumPy arrays in the order of names. Metrics missing from an
+    # observation (NaN) do not count towards their n.
+    names: Tuple[str, ...] = ()
+    n: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    mean: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    m2: np.ndarray = field(default_factory=lambda: np.zeros(0))
+
+    def __post_init__(self):
+        self.names = tuple(self.names)
+        if len(self.n) != len(self.names):
+            # Accumulators not given: start every metric empty
+            k = len(self.names)
+            self.n = np.zeros(k, dtype=np.int64)
+            self.mean = np.zeros(k)
+            self.m2 = np.zeros(k)
+
+    def vector(self, metrics: Dict[str, float]) -> np.ndarray:
+        # Lay out a {name: value} dict in this summary's metric order
+        return np.array([metrics.get(name, np.nan) for name in self.names], dtype=float)
+
+    def aligned(self, names: Sequence[str]) -> "MetricSummary":
+        # Copy laid out in the given order; metrics not tracked here are empty
+        index = {name: i for i, name in enumerate(self.names)}
+        positions = np.array([index.get(name, -1) for name in names], dtype=np.int64)
+        tracked = positions >= 0
+        aligned = MetricSummary(tuple(names))
+        aligned.n[tracked] = self.n[positions[tracked]]
+        aligned.mean[tracked] = self.mean[positions[tracked]]
+        aligned.m2[tracked] = self.m2[positions[tracked]]
+        return aligned
+
+    def update(self, values: np.ndarray) -> None:
+        present = ~np.isnan(values)
+        self.n += present
+        d = np.where(present, values - self.mean, 0.0)
+        self.mean += d / np.maximum(self.n, 1)
+        self.m2 += np.where(present, d * (values - self.mean), 0.0)
+
+    def remove(self, values: np.ndarray) -> None:
+        # Inverse of update, as in OutcomeSummary.remove
+        present = ~np.isnan(values) & (self.n > 0)
+        remaining = self.n - present
+        d = np.where(present, values - self.mean, 0.0)
+        mean = np.where(remaining > 0, self.mean - d / np.maximum(remaining, 1), 0.0)
+        m2 = np.maximum(self.m2 - np.where(present, d * (values - mean), 0.0), 0.0)
+        self.m2 = np.where(remaining > 0, m2, 0.0)
+        self.mean = mean
+        self.n = remaining
+
+    def merge(self, other: "MetricSummary") -> None:
+        # Chan et al. pairwise combination, metric by metric
+        if other.names != self.names:
+            names = self.names + tuple(
+                name for name in other.names if name not in self.names
+            )
+            merged = self.aligned(names)
+            merged.merge(other.aligned(names))
+            self.names, self.n, self.mean, self.m2 = (
+                names,
+                merged.n,
+                merged.mean,
+                merged.m2,
+            )
+            return
+        n = self.n + other.n
+        safe_n = np.maximum(n, 1)
+        d = other.mean - self.mean
+        self.mean = self.mean + d * other.n / safe_n
+        self.m2 = self.m2 + other.m2 + d * d * self.n * other.n / safe_n
+        self.n = n
+
+    def copy(self) -> "MetricSummary":
+        return MetricSummary(
+            self.names, self.n.copy(), self.mean.copy(), self.m2.copy()
+        )
+
+    @property
+    def variance(self) -> np.ndarray:
+        # Sample variance (ddof=1); 0 where fewer than two observations
+        return np.where(self.n > 1, self.m2 / np.maximum(self.n - 1, 1), 0.0)
+
+    @classmethod
+    def from_values(cls, names: Sequence[str], values) -> "MetricSummary":
+        # values: (observations x metrics) matrix, NaN for missing entries
+        values = np.asarray(values, dtype=float).reshape(-1, len(names))
+        present = ~np.isnan(values)
+        n = present.sum(axis=0)
+        mean = np.nansum(values, axis=0) / np.maximum(n, 1)
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        return cls(tuple(names), n.astype(np.int64), mean, m2)
@@ -0,0 +1,571 @@
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.models import ModelVariant, Outcome, Request
+
+# uint8 codes of the variant column; FREE marks an empty or deleted slot
+VARIANT_CODES = {variant: code for code, variant in enumerate(ModelVariant)}
+CODE_VARIANTS = tuple(ModelVariant)
+FREE = 255
+
+
+class ColumnarRequestLog(MutableMapping):
+    """
+    Array-backed request log used by InMemoryStorage(columnar=True).
+
+    Instead of one Request dataclass per routed request, every request gets
+    an integer ordinal and its fields are stored in preallocated NumPy
+    columns that grow in fixed-size chunks:
+
+    - variant           : uint8 (1 byte)
+    - timestamp         : float64 (8 bytes)
+    - outcome value     : float64 (8 bytes)
+    - outcome timestamp : float64 (8 bytes), NaN while there is no outcome
+    - input             : optional object column, disabled with store_input=False
+    - segments          : object column, allocated per chunk on first use
+    - covariate         : float64, NaN if none, allocated per chunk on first use
+    - outcome metrics   : object column, allocated per chunk on first use
+
+    The only per-request Python objects left are the request id and its
+    ordinal in the id index. Request objects are materialised on access, so
+    the log is a drop-in MutableMapping[request_id, Request] for storage code;
+    the outcomes view does the same for Outcome objects.
+
+    Deleted slots are tombstoned; a chunk whose slots are all deleted is
+    released, so memory follows the number of live requests.
+
+    A log restored from a snapshot (see from_columns) keeps the restored
+    requests in the snapshot's columns as its first chunks, without index
+    entries: their ids are looked up by binary search in the sorted id
+    column, so restoring does no per-request work beyond the requests that
+    carry segments or outcome metrics.
+    """
+
+    def __init__(self, chunk_size: int = 65_536, store_input: bool = True):
+        self.chunk_size = chunk_size
+        self.store_input = store_input
+        self._index: Dict[int, int] = {}
+        # One array (or list) per chunk and column. Entries are None once
+        # their chunk is released, and the optional columns (inputs,
+        # segments, covariates, metrics) until a chunk needs them; the
+        # accessors only index chunks they know to be live, which the
+        # element type cannot express, hence Any.
+        self._variants: List[Any] = []
+        self._timestamps: List[Any] = []
+        self._outcome_values: List[Any] = []
+        self._outcome_timestamps: List[Any] = []
+        self._inputs: List[Any] = []
+        self._segments: List[Any] = []
+        self._covariates: List[Any] = []
+        self._metrics: List[Any] = []
+        self._live: List[int] = []
+        self._size = 0
+        self._n_outcomes = 0
+        # Sorted ids of restored requests; request i of them has ordinal i
+        self._base_ids = np.empty(0, dtype=np.int64)
+        self._base_chunks = 0
+        self._base_live = 0
+        self.outcomes = ColumnarOutcomeView(self)
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: Dict[str, np.ndarray],
+        n_outcomes: int,
+        chunk_size: int = 65_536,
+        store_input: bool = True,
+        segments: Optional[Dict[int, dict]] = None,
+        metrics: Optional[Dict[int, dict]] = None,
+    ) -> "ColumnarRequestLog":
+        """
+        Build a log on top of existing columns, without copying them.
+
+        Parameters:
+        columns : dict of str to numpy.ndarray
+            Equal-length columns as returned by export_columns, sorted by
+            request_id; covariate may be omitted. Typically copy-on-write
+            memory maps of a snapshot file.
+        n_outcomes : int
+            Number of rows with an outcome (non-NaN outcome_timestamp).
+        chunk_size, store_input :
+            As for the constructor; apply to requests logged later.
+        segments, metrics : dict of int to dict, optional
+            Request segments and outcome metrics by row of the columns, for
+            the rows that have them (see export_objects).
+
+        Returns:
+        ColumnarRequestLog
+            A log whose first chunks are views of the columns. Requests
+            logged later start in a fresh chunk.
+        """
+        log = cls(chunk_size, store_input)
+        ids = columns["request_id"]
+        covariates = columns.get("covariate")
+        for start in range(0, len(ids), chunk_size):
+            end = min(start + chunk_size, len(ids))
+            log._variants.append(columns["variant"][start:end])
+            log._timestamps.append(columns["timestamp"][start:end])
+            log._outcome_values.append(columns["outcome_value"][start:end])
+            log._outcome_timestamps.append(columns["outcome_timestamp"][start:end])
+            log._inputs.append(None)
+            log._segments.append(None)
+            log._covariates.append(
+                covariates[start:end] if covariates is not None else None
+            )
+            log._metrics.append(None)
+            log._live.append(end - start)
+        log._base_ids = ids
+        log._base_chunks = len(log._variants)
+        log._base_live = len(ids)
+        log._size = log._base_chunks * chunk_size
+        log._n_outcomes = n_outcomes
+        for name, values in (("_segments", segments), ("_metrics", metrics)):
+            columns_of = getattr(log, name)
+            for row, value in (values or {}).items():
+                chunk, offset = divmod(row, chunk_size)
+                if columns_of[chunk] is None:
+                    columns_of[chunk] = [None] * chunk_size
+                columns_of[chunk][offset] = value
+        return log
+
+    def _logged_ids(self) -> np.ndarray:
+        # Ids of the requests logged after a restore, by ordinal minus the
+        # first such ordinal (0 for free slots)
+        first = self._base_chunks * self.chunk_size
+        logged_ids = np.zeros(self._size - first, dtype=np.int64)
+        n_logged = len(self._index)
+        logged_ids[
+            np.fromiter(self._index.values(), dtype=np.int64, count=n_logged) - first
+        ] = np.fromiter(self._index.keys(), dtype=np.int64, count=n_logged)
+        return logged_ids
+
+    def _chunk_ids(self, chunk: int, logged_ids: np.ndarray) -> np.ndarray:
+        # Request id of every slot of a chunk
+        start = chunk * self.chunk_size
+        end = start + self.chunk_size
+        if chunk < self._base_chunks:
+            return self._base_ids[start:end]
+        first = self._base_chunks * self.chunk_size
+        start, end = start - first, end - first
+        return logged_ids[start:end]
+
+    def export_objects(self) -> Dict[str, Dict[int, dict]]:
+        """
+        Copy out the request segments and outcome metrics of live requests.
+
+        Returns:
+        dict
+            "segments" and "metrics", each a dict from request id to the
+            value, only for the requests that have one.
+
+        Notes:
+        - Only chunks that hold segments or metrics are visited.
+        - Raises ValueError if a request id is not an integer.
+        """
+        exported: Dict[str, Dict[int, dict]] = {"segments": {}, "metrics": {}}
+        logged_ids = None
+        for name, columns in (("segments", self._segments), ("metrics", self._metrics)):
+            for chunk, values in enumerate(columns):
+                if values is None:
+                    continue
+                if logged_ids is None:
+                    logged_ids = self._logged_ids()
+                ids = self._chunk_ids(chunk, logged_ids).tolist()
+                variants = self._variants[chunk]
+                for offset, value in enumerate(values):
+                    if value is not None and variants[offset] != FREE:
+                        exported[name][ids[offset]] = value
+        return exported
+
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Copy the live requests out as columns sorted by request id.
+
+        Returns:
+        dict of str to numpy.ndarray
+            request_id (int64), variant (uint8 code), timestamp,
+            outcome_value, outcome_timestamp (NaN without an outcome) and
+            covariate (NaN without one), all aligned.
+
+        Notes:
+        - Raises ValueError if a request id is not an integer.
+        - Inputs, segments and outcome metrics are not exported.
+        """
+        logged_ids = self._logged_ids()
+
+        # One pass over the chunks, in ordinal order
+        names = (
+            "request_id",
+            "variant",
+            "timestamp",
+            "outcome_value",
+            "outcome_timestamp",
+            "covariate",
+        )
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+        for chunk, variants in enumerate(self._variants):
+            if variants is None:
+                continue
+            live = np.flatnonzero(variants != FREE)
+            parts["request_id"].append(self._chunk_ids(chunk, logged_ids)[live])
+            parts["variant"].append(variants[live])
+            parts["timestamp"].append(self._timestamps[chunk][live])
+            parts["outcome_value"].append(self._outcome_values[chunk][live])
+            parts["outcome_timestamp"].append(self._outcome_timestamps[chunk][live])
+            covariates = self._covariates[chunk]
+            parts["covariate"].append(
+                covariates[live]
+                if covariates is not None
+                else np.full(len(live), np.nan)
+            )
+        columns = {
+            name: np.concatenate(parts[name])
+            if parts[name]
+            else np.empty(0, dtype=np.uint8 if name == "variant" else np.float64)
+            for name in names
+        }
+        columns["request_id"] = columns["request_id"].astype(np.int64, copy=False)
+
+        # Time-ordered ids are usually sorted already
+        ids = columns["request_id"]
+        if len(ids) > 1 and (ids[1:] < ids[:-1]).any():
+            order = np.argsort(ids, kind="stable")
+            columns = {name: column[order] for name, column in columns.items()}
+        return columns
+
+    def _grow(self) -> None:
+        self._variants.append(np.full(self.chunk_size, FREE, dtype=np.uint8))
+        self._timestamps.append(np.zeros(self.chunk_size, dtype=np.float64))
+        self._outcome_values.append(np.zeros(self.chunk_size, dtype=np.float64))
+        self._outcome_timestamps.append(np.full(self.chunk_size, np.nan))
+        self._inputs.append([None] * self.chunk_size if self.store_input else None)
+        self._segments.append(None)
+        self._covariates.append(None)
+        self._metrics.append(None)
+        self._live.append(0)
+
+    def _lookup(self, request_id) -> Optional[int]:
+        # Ordinal of a live request, None for unknown ids
+        ordinal = self._index.get(request_id)
+        if ordinal is None and self._base_chunks:
+            return self._base_ordinal(request_id)
+        return ordinal
+
+    def _base_ordinal(self, request_id) -> Optional[int]:
+        if not isinstance(request_id, (int, np.integer)):
+            return None
+        if not -(2**63) <= request_id < 2**63:
+            return None
+        position = int(np.searchsorted(self._base_ids, request_id))
+        if position == len(self._base_ids) or self._base_ids[position] != request_id:
+            return None
+        chunk, offset = divmod(position, self.chunk_size)
+        variants = self._variants[chunk]
+        if variants is None or variants[offset] == FREE:
+            return None
+        return position
+
+    def _base_ordinals(self, request_ids) -> np.ndarray:
+        # Vectorised _base_ordinal, -1 for ids that are not live base rows
+        try:
+            keys = np.asarray(request_ids, dtype=np.int64)
+        except (TypeError, ValueError, OverflowError):
+            return np.fromiter(
+                (
+                    -1 if ordinal is None else ordinal
+                    for ordinal in map(self._base_ordinal, request_ids)
+                ),
+                dtype=np.int64,
+                count=len(request_ids),
+            )
+        base = self._base_ids
+        positions = np.minimum(np.searchsorted(base, keys), len(base) - 1)
+        found = base[positions] == keys
+        chunks, offsets = np.divmod(positions, self.chunk_size)
+        for chunk in np.unique(chunks[found]).tolist():
+            in_chunk = found & (chunks == chunk)
+            variants = self._variants[chunk]
+            if variants is None:
+                found[in_chunk] = False
+            else:
+                found[in_chunk] = variants[offsets[in_chunk]] != FREE
+        return np.where(found, positions, -1)
+
+    def _locate(self, request_id):
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            raise KeyError(request_id)
+        return divmod(ordinal, self.chunk_size)
+
+    # -- mapping interface --------------------------------------------------
+
+    def __setitem__(self, request_id, request: Request) -> None:
+        ordinal = self._lookup(request_id)
+        if ordinal is not None:
+            chunk, offset = divmod(ordinal, self.chunk_size)
+        else:
+            ordinal = self._size
+            chunk, offset = divmod(ordinal, self.chunk_size)
+            if chunk == len(self._variants):
+                self._grow()
+            self._index[request_id] = ordinal
+            self._live[chunk] += 1
+            self._size += 1
+
+        self._variants[chunk][offset] = VARIANT_CODES[request.selected_model]
+        self._timestamps[chunk][offset] = request.timestamp
+        if self.store_input and self._inputs[chunk] is not None:
+            self._inputs[chunk][offset] = request.input_data
+        if request.segments is not None and self._segments[chunk] is None:
+            self._segments[chunk] = [None] * self.chunk_size
+        if self._segments[chunk] is not None:
+            self._segments[chunk][offset] = request.segments
+        if request.covariate is not None and self._covariates[chunk] is None:
+            self._covariates[chunk] = np.full(self.chunk_size, np.nan)
+        if self._covariates[chunk] is not None:
+            self._covariates[chunk][offset] = (
+                np.nan if request.covariate is None else request.covariate
+            )
+
+    def __getitem__(self, request_id) -> Request:
+        chunk, offset = self._locate(request_id)
+        inputs = self._inputs[chunk]
+        return Request(
+            request_id=request_id,
+            selected_model=CODE_VARIANTS[self._variants[chunk][offset]],
+            input_data=inputs[offset] if inputs is not None else None,
+            timestamp=float(self._timestamps[chunk][offset]),
+            segments=self._segments_at(chunk, offset),
+            covariate=self._covariate_at(chunk, offset),
+        )
+
+    def _segments_at(self, chunk, offset):
+        segments = self._segments[chunk]
+        return segments[offset] if segments is not None else None
+
+    def _covariate_at(self, chunk, offset):
+        covariates = self._covariates[chunk]
+        if covariates is None or np.isnan(covariates[offset]):
+            return None
+        return float(covariates[offset])
+
+    def __delitem__(self, request_id) -> None:
+        chunk, offset = self._locate(request_id)
+        if self._index.pop(request_id, None) is None:
+            self._base_live -= 1
+        self._variants[chunk][offset] = FREE
+        if not np.isnan(self._outcome_timestamps[chunk][offset]):
+            self._outcome_timestamps[chunk][offset] = np.nan
+            self._n_outcomes -= 1
+        if self._inputs[chunk] is not None:
+            self._inputs[chunk][offset] = None
+        if self._segments[chunk] is not None:
+            self._segments[chunk][offset] = None
+        if self._covariates[chunk] is not None:
+            self._covariates[chunk][offset] = np.nan
+        if self._metrics[chunk] is not None:
+            self._metrics[chunk][offset] = None
+        self._live[chunk] -= 1
+
+        # Release fully deleted chunks, except the one still being filled
+        if self._live[chunk] == 0 and chunk < len(self._variants) - 1:
+            self._variants[chunk] = None
+            self._timestamps[chunk] = None
+            self._outcome_values[chunk] = None
+            self._outcome_timestamps[chunk] = None
+            self._inputs[chunk] = None
+            self._segments[chunk] = None
+            self._covariates[chunk] = None
+            self._metrics[chunk] = None
+
+    def __contains__(self, request_id) -> bool:
+        return self._lookup(request_id) is not None
+
+    def __iter__(self):
+        for chunk in range(self._base_chunks):
+            variants = self._variants[chunk]
+            if variants is not None:
+                start = chunk * self.chunk_size
+                live = np.flatnonzero(variants != FREE) + start
+                yield from self._base_ids[live].tolist()
+        yield from self._index
+
+    def __len__(self) -> int:
+        return len(self._index) + self._base_live
+
+    # -- column access --------------------------------------------------------
+
+    def get_variant(self, request_id) -> Optional[ModelVariant]:
+        # Variant lookup without materialising a Request
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            return None
+        chunk, offset = divmod(ordinal, self.chunk_size)
+        return CODE_VARIANTS[self._variants[chunk][offset]]
+
+    def get_segments(self, request_id) -> Optional[dict]:
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            return None
+        return self._segments_at(*divmod(ordinal, self.chunk_size))
+
+    def get_covariate(self, request_id) -> Optional[float]:
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            return None
+        return self._covariate_at(*divmod(ordinal, self.chunk_size))
+
+    def covariates_at(self, ordinals) -> np.ndarray:
+        # Covariate per ordinal, NaN where a request has none
+        out = np.full(len(ordinals), np.nan)
+        chunks, offsets = np.divmod(ordinals, self.chunk_size)
+        for chunk in np.unique(chunks).tolist():
+            if self._covariates[chunk] is not None:
+                in_chunk = chunks == chunk
+                out[in_chunk] = self._covariates[chunk][offsets[in_chunk]]
+        return out
+
+    def ordinals(self, request_ids) -> np.ndarray:
+        # Ordinal per id, -1 for unknown ids; the only per-id Python work
+        index_get = self._index.get
+        ordinals = np.fromiter(
+            (index_get(request_id, -1) for request_id in request_ids),
+            dtype=np.int64,
+            count=len(request_ids),
+        )
+        if self._base_chunks:
+            missing = np.flatnonzero(ordinals < 0)
+            if len(missing):
+                ordinals[missing] = self._base_ordinals(
+                    [request_ids[i] for i in missing.tolist()]
+                )
+        return ordinals
+
+    def _gather(self, columns, ordinals, dtype) -> np.ndarray:
+        # Read a column at known (>= 0) ordinals, vectorised per chunk
+        out = np.empty(len(ordinals), dtype=dtype)
+        chunks, offsets = np.divmod(ordinals, self.chunk_size)
+        for chunk in np.unique(chunks).tolist():
+            in_chunk = chunks == chunk
+            out[in_chunk] = columns[chunk][offsets[in_chunk]]
+        return out
+
+    def _scatter(self, columns, ordinals, values) -> None:
+        chunks, offsets = np.divmod(ordinals, self.chunk_size)
+        for chunk in np.unique(chunks).tolist():
+            in_chunk = chunks == chunk
+            columns[chunk][offsets[in_chunk]] = values[in_chunk]
+
+    def variant_codes(self, request_ids) -> np.ndarray:
+        # uint8 variant code per id, FREE for unknown ids
+        ordinals = self.ordinals(request_ids)
+        codes = np.full(len(ordinals), FREE, dtype=np.uint8)
+        known = ordinals >= 0
+        codes[known] = self._gather(self._variants, ordinals[known], np.uint8)
+        return codes
+
+    def variant_codes_at(self, ordinals) -> np.ndarray:
+        return self._gather(self._variants, ordinals, np.uint8)
+
+    # -- outcome columns ------------------------------------------------------
+
+    def get_outcome(self, request_id) -> Optional[Outcome]:
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            return None
+        chunk, offset = divmod(ordinal, self.chunk_size)
+        timestamp = self._outcome_timestamps[chunk][offset]
+        if np.isnan(timestamp):
+            return None
+        metrics = self._metrics[chunk]
+        return Outcome(
+            request_id=request_id,
+            outcome_value=float(self._outcome_values[chunk][offset]),
+            timestamp=float(timestamp),
+            metrics=metrics[offset] if metrics is not None else None,
+        )
+
+    def has_outcome(self, request_id) -> bool:
+        ordinal = self._lookup(request_id)
+        if ordinal is None:
+            return False
+        chunk, offset = divmod(ordinal, self.chunk_size)
+        return not np.isnan(self._outcome_timestamps[chunk][offset])
+
+    def set_outcome(self, request_id, value, timestamp, metrics=None) -> None:
+        chunk, offset = self._locate(request_id)
+        if np.isnan(self._outcome_timestamps[chunk][offset]):
+            self._n_outcomes += 1
+        self._outcome_values[chunk][offset] = value
+        self._outcome_timestamps[chunk][offset] = timestamp
+        if metrics is not None and self._metrics[chunk] is None:
+            self._metrics[chunk] = [None] * self.chunk_size
+        if self._metrics[chunk] is not None:
+            self._metrics[chunk][offset] = metrics
+
+    def outcome_timestamps_at(self, ordinals) -> np.ndarray:
+        return self._gather(self._outcome_timestamps, ordinals, np.float64)
+
+    def set_outcomes_at(self, ordinals, values, timestamp) -> None:
+        # Bulk write of outcomes for slots that did not have one yet
+        self._scatter(self._outcome_values, ordinals, values)
+        self._scatter(
+            self._outcome_timestamps, ordinals, np.full(len(ordinals), timestamp)
+        )
+        self._n_outcomes += len(ordinals)
+
+    def outcome_values_for(self, variant: ModelVariant) -> np.ndarray:
+        # All outcome values of one variant, without materialising Outcomes
+        code = VARIANT_CODES[variant]
+        parts = [
+            values[(variants == code) & ~np.isnan(timestamps)]
+            for variants, values, timestamps in zip(
+                self._variants, self._outcome_values, self._outcome_timestamps
+            )
+            if variants is not None
+        ]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def nbytes(self) -> int:
+        # Bytes held by the NumPy columns (excludes the id index and inputs)
+        return sum(
+            column.nbytes
+            for columns in (
+                self._variants,
+                self._timestamps,
+                self._outcome_values,
+                self._outcome_timestamps,
+            )
+            for column in columns
+            if column is not None
+        )
+
+
+class ColumnarOutcomeView(Mapping):
+    # Read-only Mapping[request_id, Outcome] over the log's outcome columns
+
+    def __init__(self, log: ColumnarRequestLog):
+        self._log = log
+
+    def __getitem__(self, request_id) -> Outcome:
+        outcome = self._log.get_outcome(request_id)
+        if outcome is None:
+            raise KeyError(request_id)
+        return outcome
+
+    def get(self, request_id, default=None):
+        outcome = self._log.get_outcome(request_id)
+        return default if outcome is None else outcome
+
+    def __contains__(self, request_id) -> bool:
+        return self._log.has_outcome(request_id)
+
+    def __iter__(self):
+        return (
+            request_id for request_id in self._log if self._log.has_outcome(request_id)
+        )
+
+    def __len__(self) -> int:
+        return self._log._n_outcomes
@@ -0,0 +1,120 @@
+import zlib
+from functools import lru_cache
+
+from src.models import ModelVariant
+
+# Size of the bucket space units are hashed into. 10,000 buckets gives a
+# split resolution of 0.01%.
+NUM_BUCKETS = 10_000
+
+# Salt used when the caller does not provide an experiment-specific one
+DEFAULT_SALT = "krisis"
+
+# Odd 32-bit constant (golden ratio) used to scramble the CRC before the
+# bucket is taken from the high bits
+_MIX = 0x9E3779B1
+
+
+def _encode_unit_key(unit_key):
+    if isinstance(unit_key, bytes):
+        return unit_key
+    if isinstance(unit_key, str):
+        return unit_key.encode("utf-8")
+    return str(unit_key).encode("utf-8")
+
+
+def hash_to_bucket(unit_key, salt=DEFAULT_SALT, num_buckets=NUM_BUCKETS):
+    """
+    Map a unit key to a bucket in [0, num_buckets).
+
+    Parameters:
+    unit_key : str, bytes or int
+        Stable identifier of the randomisation unit (user, session, ...).
+    salt : str
+        Experiment salt. Different salts give independent assignments.
+    num_buckets : int
+        Size of the bucket space.
+
+    Returns:
+    int
+        Bucket index.
+
+    Notes:
+    - CRC32 seeded with the salt's CRC, followed by a multiplicative mix
+      and a high-bits range reduction. Not cryptographic, but stable
+      across processes, machines and Python versions (unlike hash()).
+    """
+    seed = zlib.crc32(salt.encode("utf-8"))
+    h = (zlib.crc32(_encode_unit_key(unit_key), seed) * _MIX) & 0xFFFFFFFF
+    return (h * num_buckets) >> 32
+
+
+class BucketTable:
+    """
+    Precomputed bucket -> variant assignment for one probability split.
+
+    Buckets [0, cutoff) are assigned to variant A and [cutoff, num_buckets)
+    to variant B, where cutoff = round(probability_split * num_buckets).
+    Because the boundary only ever slides, ramping the split from p to p'
+    moves exactly the buckets between the two cutoffs and nothing else.
+
+    Tables are immutable and hold no per-unit state, so any process that
+    knows (probability_split, salt) computes the same assignment.
+    """
+
+    def __init__(self, probability_split, salt=DEFAULT_SALT, num_buckets=NUM_BUCKETS):
+        if not 0.0 <= probability_split <= 1.0:
+            raise ValueError("probability_split must be between 0 and 1.")
+
+        self.probability_split = probability_split
+        self.salt = salt
+        self.num_buckets = num_buckets
+        self.cutoff = round(probability_split * num_buckets)
+        self.variants = tuple(
+            ModelVariant.A if bucket < self.cutoff else ModelVariant.B
+            for bucket in range(num_buckets)
+        )
+        self._seed = zlib.crc32(salt.encode("utf-8"))
+
+    def bucket(self, unit_key):
+        # Inlined copy of hash_to_bucket with the salt CRC precomputed
+        h = (zlib.crc32(_encode_unit_key(unit_key), self._seed) * _MIX) & 0xFFFFFFFF
+        return (h * self.num_buckets) >> 32
+
+    def assign(self, unit_key):
+        return self.variants[self.bucket(unit_key)]
+
+    def moved_buckets(self, other):
+        # Buckets whose variant differs between this table and another one
+        low, high = sorted((self.cutoff, other.cutoff))
+        return range(low, high)
+
+
+@lru_cache(maxsize=256)
+def get_bucket_table(probability_split, salt=DEFAULT_SALT, num_buckets=NUM_BUCKETS):
+    """
+    Return the (cached) BucketTable for a split and salt.
+
+    Tables are built once per distinct (probability_split, salt, num_buckets)
+    and reused, so per-request routing only hashes the unit key.
+    """
+    return BucketTable(probability_split, salt, num_buckets)
+
+
+def assign_variant(unit_key, probability_split, salt=DEFAULT_SALT):
+    """
+    Deterministically assign a unit to a model variant.
+
+    Parameters:
+    unit_key : str, bytes or int
+        Stable identifier of the randomisation unit.
+    probability_split : float
+        Probability of routing to model A (between 0 and 1).
+    salt : str
+        Experiment salt.
+
+    Returns:
+    ModelVariant
+        The same variant for the same inputs, in any process.
+    """
+    return get_bucket_table(probability_split, salt).assign(unit_key)
@@ -0,0 +1,292 @@
+# Per-variant summaries shared by the worker processes of one server.
+#
+# Under a pre-fork server every worker has its own storage, so evidence
+# compiled in one worker only covers the traffic it served. A
+# SharedSummaries segment (multiprocessing.shared_memory) gives every
+# worker a slot for its per-variant summaries:
+#
+#   header : MAGIC, slots (uint32), metric type code (uint32)
+#   slot   : sequence number (uint64), owner pid (int64), then the summary
+#            fields of every variant (float64), padded to SLOT_ALIGNMENT
+#
+# A worker only ever writes its own slot, without locks: it makes the
+# sequence number odd, writes the fields and makes it even again (a
+# seqlock). Readers merge all slots, retrying a slot whose sequence number
+# was odd or changed while they read it. Recording an outcome therefore
+# costs a few memory writes, and no IPC.
+
+import multiprocessing
+import multiprocessing.synchronize
+import operator
+import os
+import struct
+import sys
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+from src.models import ModelVariant, OutcomeSummary, ProportionSummary
+
+MAGIC = b"KRISSHM\x00"
+SLOT_ALIGNMENT = 64
+
+# Read attempts per slot before a torn read is accepted (only possible for
+# a worker that died in the middle of an update)
+READ_RETRIES = 10_000
+
+_HEADER = struct.Struct("<8sII")
+_SLOT_HEADER = struct.Struct("<Qq")
+_SEQUENCE = struct.Struct("<Q")
+_OWNER = struct.Struct("<q")
+
+_METRIC_CODES = {"continuous": 0, "binary": 1}
+_SUMMARY_TYPES = {0: OutcomeSummary, 1: ProportionSummary}
+_FIELDS = {
+    OutcomeSummary: ("n", "mean", "m2"),
+    ProportionSummary: ("successes", "trials"),
+}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedSummaries:
+    """
+    Per-variant outcome summaries in shared memory, one slot per worker.
+
+    Parameters:
+    slots : int
+        Maximum number of workers writing at the same time.
+    metric_type : str
+        "continuous" (OutcomeSummary) or "binary" (ProportionSummary), as
+        for the storage whose summaries are published.
+    name : str, optional
+        Name of the shared memory segment; generated if omitted.
+
+    Notes:
+    - Create it in the parent process before forking the workers, pass it
+      to their storage (InMemoryStorage(shared=...)) and unlink() it on
+      shutdown. Each worker claims a slot on its first write after the
+      fork. The parent should not record outcomes itself: its summaries
+      would be copied into every worker and counted again.
+    - A slot whose owner process has exited is taken over by the next
+      worker that needs one, which carries its summaries forward, so
+      evidence keeps the outcomes recorded by restarted workers.
+    - Only the per-variant summaries are shared. Requests, outcomes and
+      the other aggregates stay in each worker, so an outcome must be
+      recorded by the worker that routed its request.
+    - The seqlock relies on stores becoming visible in program order, as
+      on x86-64.
+    """
+
+    # Guards slot claims; None in handles opened with attach
+    _claim_lock: Optional[multiprocessing.synchronize.Lock]
+
+    def __init__(
+        self,
+        slots: int = 64,
+        metric_type: str = "continuous",
+        name: Optional[str] = None,
+    ):
+        if metric_type not in _METRIC_CODES:
+            raise ValueError(f"Unknown metric_type: {metric_type!r}")
+        self._layout(slots, _METRIC_CODES[metric_type])
+        self._memory = shared_memory.SharedMemory(
+            name=name, create=True, size=self._first_slot + slots * self._stride
+        )
+        self._memory.buf[: self._first_slot] = bytes(self._first_slot)
+        _HEADER.pack_into(self._memory.buf, 0, MAGIC, slots, self._code)
+        self._claim_lock = multiprocessing.Lock()
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedSummaries":
+        """
+        Open an existing segment from a process that did not inherit it.
+
+        Parameters:
+        name : str
+            The segment's name attribute.
+
+        Returns:
+        SharedSummaries
+            A handle for reading (read) or for publishing to an explicitly
+            given slot (claim(slot)).
+        """
+        shared = cls.__new__(cls)
+        if sys.version_info >= (3, 13):
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Before Python 3.13 the resource tracker would unlink the
+            # segment when this process exits. It registered the private
+            # _name (with its leading slash), not the public name.
+            from multiprocessing import resource_tracker
+
+            memory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(getattr(memory, "_name"), "shared_memory")
+        magic, slots, code = _HEADER.unpack_from(memory.buf, 0)
+        if magic != MAGIC:
+            memory.close()
+            raise ValueError(f"{name} is not a krisis shared summary segment.")
+        shared._layout(slots, code)
+        shared._memory = memory
+        shared._claim_lock = None
+        return shared
+
+    def _layout(self, slots: int, code: int) -> None:
+        self.slots = slots
+        self._code = code
+        self.summary_type = _SUMMARY_TYPES[code]
+        fields = _FIELDS[self.summary_type]
+        self._get_fields = operator.attrgetter(*fields)
+        self._width = len(fields)
+        self._values = struct.Struct(f"<{len(ModelVariant) * self._width}d")
+        size = _SLOT_HEADER.size + self._values.size
+        self._stride = -(-size // SLOT_ALIGNMENT) * SLOT_ALIGNMENT
+        self._first_slot = SLOT_ALIGNMENT
+        self._pid: Optional[int] = None
+        self._slot: Optional[int] = None
+        self._sequence = 0
+        self._inherited: Optional[Dict[ModelVariant, object]] = None
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def _offset(self, slot: int) -> int:
+        return self._first_slot + slot * self._stride
+
+    # -- writing ------------------------------------------------------------
+
+    def claim(self, slot: Optional[int] = None) -> int:
+        """
+        Take a slot for this process.
+
+        Parameters:
+        slot : int, optional
+            Slot to take, which no live process may own. By default the
+            first slot that is unused or whose owner has exited; this needs
+            the lock inherited from the process that created the segment.
+
+        Returns:
+        int
+            The slot now owned by this process.
+        """
+        if slot is None:
+            if self._claim_lock is None:
+                raise ValueError("Pass a slot when claiming from an attached segment.")
+            with self._claim_lock:
+                slot = self._free_slot()
+                self._take(slot)
+        else:
+            self._take(slot)
+        return slot
+
+    def _free_slot(self) -> int:
+        buf = self._memory.buf
+        for slot in range(self.slots):
+            (owner,) = _OWNER.unpack_from(buf, self._offset(slot) + _SEQUENCE.size)
+            if owner == 0 or not _alive(owner):
+                return slot
+        raise RuntimeError(f"All {self.slots} shared summary slots are in use.")
+
+    def _take(self, slot: int) -> None:
+        buf = self._memory.buf
+        offset = self._offset(slot)
+        sequence, owner = _SLOT_HEADER.unpack_from(buf, offset)
+        # Carry the summaries of a previous owner forward; an odd sequence
+        # number means it died mid-update and is reset to even
+        self._inherited = self._summaries(slot) if owner else None
+        self._sequence = sequence + (sequence & 1)
+        self._pid = os.getpid()
+        self._slot = slot
+        _SLOT_HEADER.pack_into(buf, offset, self._sequence, self._pid)
+
+    def publish(self, summaries: Dict[ModelVariant, object]) -> None:
+        # Overwrite this worker's slot with its current summaries; claims a
+        # slot first after a fork
+        slot = self._slot
+        if self._pid != os.getpid() or slot is None:
+            slot = self.claim()
+        if self._inherited is not None:
+            merged = {}
+            for variant, summary in summaries.items():
+                merged[variant] = self.summary_type()
+                merged[variant].merge(self._inherited[variant])
+                merged[variant].merge(summary)
+            summaries = merged
+        values: List[float] = []
+        for variant in ModelVariant:
+            values.extend(self._get_fields(summaries[variant]))
+
+        buf = self._memory.buf
+        offset = self._offset(slot)
+        sequence = self._sequence
+        _SEQUENCE.pack_into(buf, offset, sequence + 1)
+        self._values.pack_into(buf, offset + _SLOT_HEADER.size, *values)
+        _SEQUENCE.pack_into(buf, offset, sequence + 2)
+        self._sequence = sequence + 2
+
+    # -- reading ------------------------------------------------------------
+
+    def _summaries(self, slot: int) -> Dict[ModelVariant, object]:
+        # Consistent read of one slot
+        buf = self._memory.buf
+        offset = self._offset(slot)
+        for _ in range(READ_RETRIES):
+            (before,) = _SEQUENCE.unpack_from(buf, offset)
+            if before & 1:
+                continue
+            values = self._values.unpack_from(buf, offset + _SLOT_HEADER.size)
+            (after,) = _SEQUENCE.unpack_from(buf, offset)
+            if before == after:
+                break
+        else:
+            values = self._values.unpack_from(buf, offset + _SLOT_HEADER.size)
+        summaries = {}
+        for i, variant in enumerate(ModelVariant):
+            start = i * self._width
+            end = start + self._width
+            summaries[variant] = self._summary(values[start:end])
+        return summaries
+
+    def _summary(self, fields):
+        if self.summary_type is OutcomeSummary:
+            n, mean, m2 = fields
+            return OutcomeSummary(n=int(n), mean=mean, m2=m2)
+        successes, trials = fields
+        return ProportionSummary(successes=int(successes), trials=int(trials))
+
+    def read(self) -> Dict[ModelVariant, object]:
+        """
+        Merge the summaries of every slot.
+
+        Returns:
+        dict
+            ModelVariant -> OutcomeSummary (or ProportionSummary) over the
+            outcomes recorded by all workers.
+        """
+        merged = {variant: self.summary_type() for variant in ModelVariant}
+        buf = self._memory.buf
+        for slot in range(self.slots):
+            (owner,) = _OWNER.unpack_from(buf, self._offset(slot) + _SEQUENCE.size)
+            if not owner:
+                continue
+            for variant, summary in self._summaries(slot).items():
+                merged[variant].merge(summary)
+        return merged
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def close(self) -> None:
+        # Detach this process from the segment
+        self._memory.close()
+
+    def unlink(self) -> None:
+        # Destroy the segment; call once, from the process that created it
+        self._memory.unlink()
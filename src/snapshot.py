@@ -0,0 +1,321 @@
+# Snapshot and restore of InMemoryStorage state.
+#
+# A snapshot file holds the logged requests and outcomes as NumPy columns
+# plus the storage's running aggregates:
+#
+#   prefix   : MAGIC, format version (uint32), header offset and length
+#              (uint64 each)
+#   columns  : one contiguous array per column, each aligned to
+#              COLUMN_ALIGNMENT bytes, rows sorted by request id
+#   aggregates: pickled summaries, time buckets, segment cube, eviction
+#              tombstones, ... and the segments and outcome metrics of the
+#              rows that have them, keyed by row
+#   header   : JSON describing the columns (dtype, offset, length), the
+#              aggregates blob and the storage configuration
+#
+# Restoring memory-maps the columns copy-on-write, so it costs O(columns)
+# plus the (sparse) segments and metrics, regardless of the number of
+# requests: pages are read lazily on first access and writes after the
+# restore never touch the file.
+
+import json
+import os
+import pickle
+import struct
+from collections import deque
+from typing import Any, Dict
+
+import numpy as np
+
+from src.request_log import VARIANT_CODES, ColumnarRequestLog
+from src.storage import InMemoryStorage
+
+MAGIC = b"KRISNAP\x00"
+FORMAT_VERSION = 1
+COLUMN_ALIGNMENT = 64
+
+_PREFIX = struct.Struct("<8sIQQ")
+
+_COLUMN_DTYPES = {
+    "request_id": np.int64,
+    "variant": np.uint8,
+    "timestamp": np.float64,
+    "outcome_value": np.float64,
+    "outcome_timestamp": np.float64,
+    "covariate": np.float64,
+}
+
+# InMemoryStorage attributes saved in the aggregates blob
+_AGGREGATES = (
+    "summaries",
+    "time_buckets",
+    "segment_cap",
+    "segment_cube",
+    "covariate_summaries",
+    "metric_summaries",
+    "metrics",
+    "_has_segments",
+    "_has_covariates",
+    "_evicted",
+    "_tombstones",
+)
+
+
+def _dict_objects(storage: InMemoryStorage) -> Dict[str, Dict[int, dict]]:
+    # Segments and outcome metrics of a dict-backed storage, in the layout
+    # of export_objects
+    return {
+        "segments": {
+            request_id: request.segments
+            for request_id, request in storage.requests.items()
+            if request.segments
+        },
+        "metrics": {
+            request_id: outcome.metrics
+            for request_id, outcome in storage.outcomes.items()
+            if outcome.metrics and request_id in storage.requests
+        },
+    }
+
+
+def _rows_of(objects: Dict[int, dict], ids: np.ndarray) -> Dict[int, dict]:
+    # Re-key values by row of the sorted id column
+    keys = np.fromiter(objects.keys(), dtype=np.int64, count=len(objects))
+    rows = np.searchsorted(ids, keys).tolist()
+    return dict(zip(rows, objects.values()))
+
+
+def _track_restored(storage: InMemoryStorage, columns) -> None:
+    # Rebuild the attribution window's expiry buckets from the restored
+    # requests without an outcome (only those can be evicted)
+    pending = np.flatnonzero(np.isnan(columns["outcome_timestamp"]))
+    if not len(pending):
+        return
+    buckets = np.floor(columns["timestamp"][pending] / storage._bucket_width)
+    order = np.argsort(buckets, kind="stable")
+    buckets, pending = buckets[order], columns["request_id"][pending[order]]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    bounds = np.r_[starts, len(buckets)].tolist()
+    storage._expiry = deque(
+        (int(buckets[start]), pending[start:end].tolist())
+        for start, end in zip(bounds, bounds[1:])
+    )
+
+
+def _dict_columns(storage: InMemoryStorage) -> Dict[str, np.ndarray]:
+    # Columns of a dict-backed storage, in the layout of export_columns
+    requests = storage.requests
+    n = len(requests)
+    ids = np.fromiter(requests.keys(), dtype=np.int64, count=n)
+    order = np.argsort(ids, kind="stable")
+    rows = list(requests.values())
+    outcomes = [storage.outcomes.get(request.request_id) for request in rows]
+    columns: Dict[str, np.ndarray] = {
+        "request_id": ids,
+        "variant": np.fromiter(
+            (VARIANT_CODES[request.selected_model] for request in rows),
+            dtype=np.uint8,
+            count=n,
+        ),
+        "timestamp": np.fromiter(
+            (request.timestamp for request in rows), dtype=np.float64, count=n
+        ),
+        "outcome_value": np.fromiter(
+            (0.0 if outcome is None else outcome.outcome_value for outcome in outcomes),
+            dtype=np.float64,
+            count=n,
+        ),
+        "outcome_timestamp": np.fromiter(
+            (np.nan if outcome is None else outcome.timestamp for outcome in outcomes),
+            dtype=np.float64,
+            count=n,
+        ),
+        "covariate": np.fromiter(
+            (
+                np.nan if request.covariate is None else request.covariate
+                for request in rows
+            ),
+            dtype=np.float64,
+            count=n,
+        ),
+    }
+    return {name: column[order] for name, column in columns.items()}
+
+
+def _align(handle) -> int:
+    position = handle.tell()
+    padding = -position % COLUMN_ALIGNMENT
+    handle.write(b"\x00" * padding)
+    return position + padding
+
+
+def save_snapshot(storage: InMemoryStorage, path: str) -> None:
+    """
+    Write the state of an InMemoryStorage to a snapshot file.
+
+    Parameters:
+    storage : InMemoryStorage
+        Dict-backed or columnar storage whose request ids are integers (as
+        generated by route_request).
+    path : str
+        Destination file. It is replaced atomically, so a crash while
+        saving leaves the previous snapshot intact.
+
+    Notes:
+    - Persists every logged request (id, variant, timestamp, covariate),
+      its outcome value and timestamp, and all running aggregates, so
+      evidence compiled after a restore matches evidence compiled before.
+    - Request segments and outcome metrics are saved for the requests
+      that have them; request inputs are not saved.
+    - Not safe against concurrent writes to the storage.
+    """
+    if not isinstance(storage, InMemoryStorage):
+        raise TypeError("Snapshots are only supported for InMemoryStorage.")
+    try:
+        if storage._log is not None:
+            columns = storage._log.export_columns()
+            objects = storage._log.export_objects()
+        else:
+            columns = _dict_columns(storage)
+            objects = _dict_objects(storage)
+        objects = {
+            name: _rows_of(values, columns["request_id"])
+            for name, values in objects.items()
+        }
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError("Snapshots require integer request ids.") from e
+    if np.isnan(columns["covariate"]).all():
+        # Storages without covariates restore without the column
+        del columns["covariate"]
+
+    header: Dict[str, Any] = {
+        "count": len(columns["request_id"]),
+        "n_outcomes": int((~np.isnan(columns["outcome_timestamp"])).sum()),
+        "columns": {},
+        "config": {
+            "metric_type": storage.metric_type,
+            "attribution_window": storage.attribution_window,
+            "store_input": (
+                storage._log.store_input
+                if storage._log is not None
+                else not storage._strip_input
+            ),
+            "chunk_size": (
+                storage._log.chunk_size if storage._log is not None else 65_536
+            ),
+        },
+    }
+    aggregates = pickle.dumps(
+        {
+            "aggregates": {name: getattr(storage, name) for name in _AGGREGATES},
+            "objects": objects,
+        },
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        for name, column in columns.items():
+            offset = _align(handle)
+            column = np.ascontiguousarray(column, dtype=_COLUMN_DTYPES[name])
+            handle.write(column.tobytes())
+            header["columns"][name] = {
+                "dtype": column.dtype.str,
+                "offset": offset,
+                "length": len(column),
+            }
+        header["aggregates"] = {"offset": handle.tell(), "length": len(aggregates)}
+        handle.write(aggregates)
+
+        encoded = json.dumps(header).encode()
+        header_offset = handle.tell()
+        handle.write(encoded)
+        handle.seek(0)
+        handle.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, header_offset, len(encoded)))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str) -> InMemoryStorage:
+    """
+    Restore an InMemoryStorage from a snapshot file.
+
+    Parameters:
+    path : str
+        File written by save_snapshot.
+
+    Returns:
+    InMemoryStorage
+        A columnar storage with the saved requests, outcomes, aggregates
+        and configuration, usable immediately.
+
+    Notes:
+    - The columns are memory-mapped copy-on-write rather than read: the
+      restore does no per-request work, pages load on first access, and
+      the storage can be written to as usual without modifying the file.
+      The file must stay in place while the storage is in use.
+    - Restored requests are found by binary search in the sorted id
+      column; requests logged after the restore use the columnar index.
+    - With an attribution window, restored requests without an outcome
+      are put back in the eviction buckets and expire as usual, and
+      outcomes for requests evicted before the snapshot are still
+      reported as late.
+    - Only restore snapshots from a trusted source: the aggregates are
+      stored with pickle.
+    """
+    with open(path, "rb") as handle:
+        magic, version, header_offset, header_length = _PREFIX.unpack(
+            handle.read(_PREFIX.size)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a krisis snapshot.")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format version {version}, "
+                f"expected {FORMAT_VERSION}."
+            )
+        handle.seek(header_offset)
+        header = json.loads(handle.read(header_length))
+        blob = header["aggregates"]
+        handle.seek(blob["offset"])
+        saved = pickle.loads(handle.read(blob["length"]))
+
+    columns: Dict[str, np.ndarray] = {}
+    for name, spec in header["columns"].items():
+        if spec["length"]:
+            columns[name] = np.memmap(
+                path,
+                dtype=np.dtype(spec["dtype"]),
+                mode="c",
+                offset=spec["offset"],
+                shape=(spec["length"],),
+            )
+        else:
+            columns[name] = np.empty(0, dtype=np.dtype(spec["dtype"]))
+
+    config = header["config"]
+    storage = InMemoryStorage(
+        columnar=True,
+        store_input=config["store_input"],
+        chunk_size=config["chunk_size"],
+        attribution_window=config["attribution_window"],
+        metric_type=config["metric_type"],
+        time_buckets=None,
+    )
+    storage._log = ColumnarRequestLog.from_columns(
+        columns,
+        header["n_outcomes"],
+        chunk_size=config["chunk_size"],
+        store_input=config["store_input"],
+        segments=saved["objects"]["segments"],
+        metrics=saved["objects"]["metrics"],
+    )
+    storage.requests = storage._log
+    storage.outcomes = storage._log.outcomes
+    for name, value in saved["aggregates"].items():
+        setattr(storage, name, value)
+    if storage.attribution_window is not None:
+        _track_restored(storage, columns)
+    return storage
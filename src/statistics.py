@@ -2,6 +2,18 @@ import numpy as np
 from scipy import stats
 import math
 
+from src.bootstrap import DEFAULT_RESAMPLES, bootstrap_confidence_interval
+from src.models import (
+    CovariateSummary,
+    MetricSummary,
+    OutcomeSummary,
+    ProportionSummary,
+)
+
+# Interval methods of compute_statistics; the bootstrap ones map to the
+# resampling method of src.bootstrap
+CI_METHODS = {"welch": None, "bootstrap": "index", "poisson-bootstrap": "poisson"}
+
 
 def check_minimum_sample_size(n_A, n_B, min_size):
     """
@@ -53,6 +65,49 @@ def calculate_descriptive_statistics(outcomes):
     return (mean, var, std, n)
 
 
+def calculate_summary_statistics(summary):
+    """
+    Compute descriptive statistics from running sufficient statistics.
+
+    Parameters:
+    summary : OutcomeSummary
+        Count, mean and sum of squared deviations (M2) for one variant.
+
+    Returns:
+    tuple
+        (mean, variance, standard deviation, sample size)
+
+    Notes:
+    - Equivalent to calculate_descriptive_statistics on the raw outcomes,
+      but O(1) regardless of how many outcomes were summarised.
+    """
+    var = summary.variance
+    return (summary.mean, var, math.sqrt(var), summary.n)
+
+
+def describe_outcomes(outcomes):
+    """
+    Dispatch to the appropriate descriptive statistics function.
+
+    Parameters:
+    outcomes : OutcomeSummary or list or array-like
+        Either precomputed sufficient statistics or raw outcome values.
+
+    Returns:
+    tuple
+        (mean, variance, standard deviation, sample size)
+    """
+    if isinstance(outcomes, OutcomeSummary):
+        return calculate_summary_statistics(outcomes)
+    return calculate_descriptive_statistics(outcomes)
+
+
+def _sample_size(outcomes):
+    if isinstance(outcomes, (OutcomeSummary, ProportionSummary)):
+        return outcomes.n
+    return len(outcomes)
+
+
 def calculate_welch_test(mean_A, mean_B, var_A, var_B, n_A, n_B):
     """
 
@@ -155,15 +210,243 @@ def calculate_effect_size(mean_A, mean_B, std_A, std_B, n_A, n_B):
     return (mean_B - mean_A) / pooled_std
 
 
-def compute_statistics(outcomes_1, outcomes_2):
+def calculate_proportion_test(successes_A, trials_A, successes_B, trials_B):
+    """
+    Two-proportion z-test of equal success rates.
+
+    Parameters:
+    successes_A, successes_B : int
+        Number of successes (outcome 1) for variants A and B.
+    trials_A, trials_B : int
+        Number of outcomes for variants A and B.
+
+    Returns:
+    tuple
+        (delta, standard_error, z, p_value) where delta = p_B − p_A and
+        standard_error is the unpooled standard error of delta.
+
+    Notes:
+    - The z statistic uses the pooled proportion, as the test assumes
+      equal rates; p_value is two-sided.
+    - If all outcomes are equal (pooled proportion 0 or 1), returns
+      z = 0 and p_value = 1.
+    """
+    p_A = successes_A / trials_A
+    p_B = successes_B / trials_B
+    delta = p_B - p_A
+    se = math.sqrt(p_A * (1 - p_A) / trials_A + p_B * (1 - p_B) / trials_B)
+
+    pooled = (successes_A + successes_B) / (trials_A + trials_B)
+    pooled_se = math.sqrt(pooled * (1 - pooled) * (1 / trials_A + 1 / trials_B))
+    if pooled_se == 0:
+        return (delta, se, 0.0, 1.0)
+
+    z = delta / pooled_se
+    p_value = 2 * stats.norm.sf(abs(z))
+
+    return (delta, se, z, p_value)
+
+
+def calculate_wilson_interval(successes, trials, confidence_level):
+    """
+    Wilson score interval for a single proportion.
+
+    Parameters:
+    successes : int
+        Number of successes.
+    trials : int
+        Number of trials.
+    confidence_level : float
+        Desired confidence level (e.g., 0.95).
+
+    Returns:
+    tuple
+        (lower_bound, upper_bound), always within [0, 1].
+
+    Notes:
+    - Unlike the normal (Wald) interval, it stays well-behaved for rates
+      close to 0 or 1 and for small samples.
+    """
+    z = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+    p = successes / trials
+    denominator = 1 + z**2 / trials
+    centre = (p + z**2 / (2 * trials)) / denominator
+    half_width = (
+        z * math.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denominator
+    )
+    return (max(centre - half_width, 0.0), min(centre + half_width, 1.0))
+
+
+def calculate_newcombe_interval(
+    successes_A, trials_A, successes_B, trials_B, confidence_level
+):
+    """
+    Newcombe hybrid score interval for the difference of two proportions.
+
+    Parameters:
+    successes_A, successes_B : int
+        Number of successes for variants A and B.
+    trials_A, trials_B : int
+        Number of trials for variants A and B.
+    confidence_level : float
+        Desired confidence level (e.g., 0.95).
+
+    Returns:
+    tuple
+        (lower_bound, upper_bound) for p_B − p_A.
+
+    Notes:
+    - Combines the Wilson intervals of both variants (Newcombe, 1998,
+      method 10); coverage stays close to nominal where the Wald interval
+      for a difference does not.
+    """
+    p_A = successes_A / trials_A
+    p_B = successes_B / trials_B
+    lower_A, upper_A = calculate_wilson_interval(
+        successes_A, trials_A, confidence_level
+    )
+    lower_B, upper_B = calculate_wilson_interval(
+        successes_B, trials_B, confidence_level
+    )
+
+    delta = p_B - p_A
+    lower = delta - math.sqrt((p_B - lower_B) ** 2 + (upper_A - p_A) ** 2)
+    upper = delta + math.sqrt((upper_B - p_B) ** 2 + (p_A - lower_A) ** 2)
+
+    return (lower, upper)
+
+
+def calculate_proportion_effect_size(p_A, p_B):
+    """
+    Compute Cohen's h, the effect size for a difference of proportions.
+
+    Parameters:
+    p_A, p_B : float
+        Success rates of variants A and B.
+
+    Returns:
+    float
+        2 * asin(sqrt(p_B)) − 2 * asin(sqrt(p_A)).
+    """
+    return 2 * math.asin(math.sqrt(p_B)) - 2 * math.asin(math.sqrt(p_A))
+
+
+# Default mixing variance of the mSPRT, relative to the pooled outcome
+# variance: the mixture is tuned for effects of about 0.1 standard deviations
+DEFAULT_MIXTURE_SCALE = 0.01
+
+
+def calculate_cuped_theta(summary_A, summary_B):
+    """
+    Compute the CUPED adjustment coefficient from covariate co-moments.
+
+    Parameters:
+    summary_A : CovariateSummary
+        Covariate/outcome co-moments of variant A.
+    summary_B : CovariateSummary
+        Covariate/outcome co-moments of variant B.
+
+    Returns:
+    float
+        theta, the pooled within-variant regression slope of the outcome on
+        the covariate; 0 if the covariate does not vary.
+
+    Notes:
+    - Pooling within variants keeps the treatment effect out of theta; the
+      same theta must be used for both variants for the adjusted delta to
+      stay unbiased.
+    """
+    m2_x = summary_A.m2_x + summary_B.m2_x
+    if m2_x <= 0:
+        return 0.0
+    return (summary_A.c_xy + summary_B.c_xy) / m2_x
+
+
+def calculate_sequential_test(delta, se, alpha, mixture_variance):
+    """
+    Compute an always-valid (anytime) test of delta = 0 using the normal
+    mixture sequential probability ratio test (mSPRT).
+
+    Parameters:
+    delta : float
+        Difference in means (mean_B − mean_A).
+    se : float
+        Standard error of the difference.
+    alpha : float
+        Significance level (e.g. 0.05).
+    mixture_variance : float
+        Variance tau^2 of the normal prior mixed over the true effect. It
+        should be on the scale of the squared effects one hopes to detect.
+
+    Returns:
+    tuple
+        (cs_lower, cs_upper, likelihood_ratio, p_value) where (cs_lower,
+        cs_upper) is a 1 − alpha confidence sequence for the effect and
+        p_value = min(1, 1 / likelihood_ratio) is an always-valid p-value.
+
+    Notes:
+    - With V = se^2, the mixture likelihood ratio is
+      sqrt(V / (V + tau^2)) * exp(tau^2 delta^2 / (2 V (V + tau^2))).
+      It is a nonnegative martingale under the null, so by Ville's inequality
+      P(LR ever exceeds 1/alpha) <= alpha: the results stay valid no matter
+      how often they are checked or when the experiment is stopped.
+    - Only needs (delta, se), i.e. the running sufficient statistics, so
+      every evaluation is O(1).
+    - If the standard error is zero, returns a degenerate sequence.
+    """
+    var = se**2
+    if var == 0:
+        p_value = 0.0 if delta != 0 else 1.0
+        return (delta, delta, math.inf if delta != 0 else 1.0, p_value)
+
+    tau2 = mixture_variance
+    log_lr = 0.5 * math.log(var / (var + tau2)) + tau2 * delta**2 / (
+        2 * var * (var + tau2)
+    )
+    likelihood_ratio = math.exp(min(log_lr, 700.0))
+    p_value = min(1.0, math.exp(-log_lr))
+
+    radius = math.sqrt(
+        var * (var + tau2) / tau2 * (math.log((var + tau2) / var) - 2 * math.log(alpha))
+    )
+
+    return (delta - radius, delta + radius, likelihood_ratio, p_value)
+
+
+def compute_statistics(
+    outcomes_1,
+    outcomes_2,
+    confidence_level=0.95,
+    sequential=False,
+    mixture_variance=None,
+    ci_method="welch",
+    n_resamples=DEFAULT_RESAMPLES,
+    seed=None,
+):
     """
     Compute statistical evidence comparing two model variants.
 
     Parameters:
-    outcomes_1 : list or array-like
-        Numeric outcome values for variant A.
-    outcomes_2 : list or array-like
-        Numeric outcome values for variant B.
+    outcomes_1 : list or array-like or OutcomeSummary
+        Numeric outcome values (or their running summary) for variant A.
+    outcomes_2 : list or array-like or OutcomeSummary
+        Numeric outcome values (or their running summary) for variant B.
+    confidence_level : float
+        Confidence level of the two-sided interval (default 0.95).
+    sequential : bool
+        Also compute always-valid results (mSPRT confidence sequence and
+        p-value) that may be monitored continuously.
+    mixture_variance : float, optional
+        Mixing variance of the mSPRT. Defaults to DEFAULT_MIXTURE_SCALE
+        times the pooled outcome variance.
+    ci_method : str
+        "welch" (default) for the Welch t interval, "bootstrap" for a
+        percentile bootstrap interval or "poisson-bootstrap" for the
+        Poisson bootstrap variant. Bootstrap intervals need raw outcomes.
+    n_resamples : int
+        Number of bootstrap resamples (bootstrap methods only).
+    seed : int, optional
+        Seed of the bootstrap, for reproducible intervals.
 
     Returns:
     dict or None
@@ -173,34 +456,273 @@ def compute_statistics(outcomes_1, outcomes_2):
         - confidence interval bounds
         - sample sizes
         - effect size (Cohen's d)
+        - with sequential=True: cs_lower, cs_upper, likelihood_ratio and
+          always_valid_p_value
 
         Returns None if minimum sample size requirements are not met.
 
+    Raises:
+    ValueError
+        If ci_method is unknown, or a bootstrap is requested for summaries.
+
     Workflow:
     - Validates minimum sample size.
     - Computes descriptive statistics for both variants.
     - Computes Welch inference (delta, standard error, degrees of freedom).
-    - Constructs a two-sided 95% confidence interval.
+    - Constructs a two-sided confidence interval (95% by default), from the
+      Welch t distribution or by bootstrap.
     - Computes effect size (Cohen's d).
 
     Notes:
     - This function acts as the orchestration layer between descriptive,
       inferential, and interpretive statistics.
     - Returned values are unrounded and intended for downstream consumption.
+    - Passing OutcomeSummary objects makes the cost independent of the
+      number of recorded outcomes.
+    - Passing MetricSummary objects compares all named metrics at once and
+      returns the arrays of compute_metric_statistics.
+    - Passing ProportionSummary objects (binary metrics) returns the
+      counter-based results of compute_proportion_statistics.
+    - Passing CovariateSummary objects returns the variance-reduced results
+      of compute_cuped_statistics.
     """
-    if not check_minimum_sample_size(len(outcomes_1), len(outcomes_2), 2):
+    if isinstance(outcomes_1, MetricSummary):
+        return compute_metric_statistics(outcomes_1, outcomes_2, confidence_level)
+    if isinstance(outcomes_1, CovariateSummary) and ci_method == "welch":
+        return compute_cuped_statistics(
+            outcomes_1, outcomes_2, confidence_level, sequential, mixture_variance
+        )
+    if isinstance(outcomes_1, ProportionSummary) and ci_method == "welch":
+        return compute_proportion_statistics(
+            outcomes_1, outcomes_2, confidence_level, sequential, mixture_variance
+        )
+
+    if ci_method not in CI_METHODS:
+        raise ValueError(f"Unknown ci_method: {ci_method!r}")
+    summary_types = (OutcomeSummary, ProportionSummary, CovariateSummary)
+    if ci_method != "welch" and (
+        isinstance(outcomes_1, summary_types) or isinstance(outcomes_2, summary_types)
+    ):
+        raise ValueError("Bootstrap intervals require raw outcome values.")
+
+    if not check_minimum_sample_size(
+        _sample_size(outcomes_1), _sample_size(outcomes_2), 2
+    ):
         return None
 
-    mean_A, var_A, std_A, n_A = calculate_descriptive_statistics(outcomes_1)
-    mean_B, var_B, std_B, n_B = calculate_descriptive_statistics(outcomes_2)
+    mean_A, var_A, std_A, n_A = describe_outcomes(outcomes_1)
+    mean_B, var_B, std_B, n_B = describe_outcomes(outcomes_2)
 
     delta, se, df = calculate_welch_test(mean_A, mean_B, var_A, var_B, n_A, n_B)
 
-    ci_lower, ci_upper = calculate_confidence_interval(delta, se, df, 0.95)
+    if ci_method == "welch":
+        ci_lower, ci_upper = calculate_confidence_interval(
+            delta, se, df, confidence_level
+        )
+    else:
+        ci_lower, ci_upper = bootstrap_confidence_interval(
+            outcomes_1,
+            outcomes_2,
+            confidence_level,
+            n_resamples=n_resamples,
+            seed=seed,
+            method=CI_METHODS[ci_method],
+        )
 
     effect_size = calculate_effect_size(mean_A, mean_B, std_A, std_B, n_A, n_B)
 
+    result = {
+        "mean_A": mean_A,
+        "mean_B": mean_B,
+        "delta": delta,
+        "ci_lower": ci_lower,
+        "ci_upper": ci_upper,
+        "n_A": n_A,
+        "n_B": n_B,
+        "effect_size": effect_size,
+    }
+
+    if sequential:
+        pooled_var = ((n_A - 1) * var_A + (n_B - 1) * var_B) / (n_A + n_B - 2)
+        result.update(
+            _sequential_results(
+                delta, se, pooled_var, confidence_level, mixture_variance, result
+            )
+        )
+
+    return result
+
+
+def _sequential_results(
+    delta, se, pooled_var, confidence_level, mixture_variance, result
+):
+    # Always-valid additions to a compute_statistics result
+    if mixture_variance is None:
+        mixture_variance = DEFAULT_MIXTURE_SCALE * pooled_var
+    if mixture_variance > 0:
+        cs_lower, cs_upper, likelihood_ratio, p_value = calculate_sequential_test(
+            delta, se, 1 - confidence_level, mixture_variance
+        )
+    else:
+        # Constant outcomes: no uncertainty left to mix over
+        cs_lower, cs_upper = result["ci_lower"], result["ci_upper"]
+        likelihood_ratio = math.inf if delta != 0 else 1.0
+        p_value = 0.0 if delta != 0 else 1.0
     return {
+        "cs_lower": cs_lower,
+        "cs_upper": cs_upper,
+        "likelihood_ratio": likelihood_ratio,
+        "always_valid_p_value": p_value,
+    }
+
+
+def compute_proportion_statistics(
+    summary_1,
+    summary_2,
+    confidence_level=0.95,
+    sequential=False,
+    mixture_variance=None,
+):
+    """
+    Compute statistical evidence for a binary (conversion) metric from
+    success/trial counters.
+
+    Parameters:
+    summary_1 : ProportionSummary
+        Success and trial counts for variant A.
+    summary_2 : ProportionSummary
+        Success and trial counts for variant B.
+    confidence_level : float
+        Confidence level of the two-sided interval (default 0.95).
+    sequential : bool
+        Also compute always-valid results, as in compute_statistics.
+    mixture_variance : float, optional
+        Mixing variance of the mSPRT, as in compute_statistics.
+
+    Returns:
+    dict or None
+        The keys of compute_statistics, where:
+        - mean_A, mean_B are the success rates
+        - the interval is the Newcombe hybrid score interval
+        - effect_size is Cohen's h
+        plus z and p_value of the two-proportion z-test.
+
+        Returns None if minimum sample size requirements are not met.
+
+    Notes:
+    - Everything derives from four integers, so the cost is O(1) and no
+      outcome values need to be kept.
+    """
+    n_A, n_B = summary_1.trials, summary_2.trials
+    if not check_minimum_sample_size(n_A, n_B, 2):
+        return None
+
+    s_A, s_B = summary_1.successes, summary_2.successes
+    p_A, p_B = s_A / n_A, s_B / n_B
+
+    delta, se, z, p_value = calculate_proportion_test(s_A, n_A, s_B, n_B)
+    ci_lower, ci_upper = calculate_newcombe_interval(
+        s_A, n_A, s_B, n_B, confidence_level
+    )
+
+    result = {
+        "mean_A": p_A,
+        "mean_B": p_B,
+        "delta": delta,
+        "ci_lower": ci_lower,
+        "ci_upper": ci_upper,
+        "n_A": n_A,
+        "n_B": n_B,
+        "effect_size": calculate_proportion_effect_size(p_A, p_B),
+        "z": z,
+        "p_value": p_value,
+    }
+
+    if sequential:
+        pooled = (s_A + s_B) / (n_A + n_B)
+        result.update(
+            _sequential_results(
+                delta,
+                se,
+                pooled * (1 - pooled),
+                confidence_level,
+                mixture_variance,
+                result,
+            )
+        )
+
+    return result
+
+
+def compute_cuped_statistics(
+    summary_1,
+    summary_2,
+    confidence_level=0.95,
+    sequential=False,
+    mixture_variance=None,
+):
+    """
+    Compute CUPED (covariate-adjusted) statistical evidence from running
+    covariate/outcome co-moments.
+
+    Parameters:
+    summary_1 : CovariateSummary
+        Covariate/outcome co-moments for variant A.
+    summary_2 : CovariateSummary
+        Covariate/outcome co-moments for variant B.
+    confidence_level : float
+        Confidence level of the two-sided interval (default 0.95).
+    sequential : bool
+        Also compute always-valid results, as in compute_statistics.
+    mixture_variance : float, optional
+        Mixing variance of the mSPRT, as in compute_statistics.
+
+    Returns:
+    dict or None
+        The keys of compute_statistics, computed on the adjusted outcomes
+        y − theta (x − mean x), plus:
+        - theta, the adjustment coefficient
+        - variance_reduction, the fraction of the squared standard error
+          of the delta removed by the adjustment
+
+        Returns None if minimum sample size requirements are not met.
+
+    Workflow:
+    - Computes theta from the pooled within-variant co-moments.
+    - Derives the adjusted means and variances of both variants from the
+      co-moments; no outcome is revisited.
+    - Runs the same Welch inference and effect size as compute_statistics.
+
+    Notes:
+    - The adjusted delta estimates the same effect as the raw delta, since
+      the covariate is measured before assignment and so has the same
+      expectation in both variants. Its variance shrinks by the squared
+      correlation between covariate and outcome.
+    - The cost is O(1), like compute_statistics on OutcomeSummary objects.
+    """
+    n_A, n_B = summary_1.n, summary_2.n
+    if not check_minimum_sample_size(n_A, n_B, 2):
+        return None
+
+    theta = calculate_cuped_theta(summary_1, summary_2)
+    mean_x = (n_A * summary_1.mean_x + n_B * summary_2.mean_x) / (n_A + n_B)
+
+    def adjusted(summary):
+        mean = summary.mean_y - theta * (summary.mean_x - mean_x)
+        m2 = summary.m2_y - 2 * theta * summary.c_xy + theta**2 * summary.m2_x
+        return mean, max(m2, 0.0) / (summary.n - 1), summary.m2_y / (summary.n - 1)
+
+    mean_A, var_A, raw_var_A = adjusted(summary_1)
+    mean_B, var_B, raw_var_B = adjusted(summary_2)
+
+    delta, se, df = calculate_welch_test(mean_A, mean_B, var_A, var_B, n_A, n_B)
+    ci_lower, ci_upper = calculate_confidence_interval(delta, se, df, confidence_level)
+    effect_size = calculate_effect_size(
+        mean_A, mean_B, math.sqrt(var_A), math.sqrt(var_B), n_A, n_B
+    )
+
+    raw_se2 = raw_var_A / n_A + raw_var_B / n_B
+    result = {
         "mean_A": mean_A,
         "mean_B": mean_B,
         "delta": delta,
@@ -209,4 +731,92 @@ def compute_statistics(outcomes_1, outcomes_2):
         "n_A": n_A,
         "n_B": n_B,
         "effect_size": effect_size,
+        "theta": theta,
+        "variance_reduction": 1 - se**2 / raw_se2 if raw_se2 > 0 else 0.0,
+    }
+
+    if sequential:
+        pooled_var = ((n_A - 1) * var_A + (n_B - 1) * var_B) / (n_A + n_B - 2)
+        result.update(
+            _sequential_results(
+                delta, se, pooled_var, confidence_level, mixture_variance, result
+            )
+        )
+
+    return result
+
+
+def compute_metric_statistics(summary_1, summary_2, confidence_level=0.95):
+    """
+    Compute statistical evidence for many named metrics in one pass.
+
+    Parameters:
+    summary_1 : MetricSummary
+        Running per-metric summaries for variant A.
+    summary_2 : MetricSummary
+        Running per-metric summaries for variant B.
+    confidence_level : float
+        Confidence level of the two-sided intervals (default 0.95).
+
+    Returns:
+    dict
+        - metrics: tuple of metric names, the order of every array below
+        - mean_A, mean_B, delta, se, df, ci_lower, ci_upper, effect_size:
+          float arrays, one entry per metric
+        - n_A, n_B: integer arrays of sample sizes
+
+    Notes:
+    - Vectorised counterpart of compute_statistics: Welch standard errors
+      and degrees of freedom, the t critical values (a single vectorised
+      stats.t.ppf call), the intervals and Cohen's d are computed for all
+      metrics as NumPy array operations.
+    - Metrics with fewer than 2 observations in either variant get NaN
+      results instead of the None of compute_statistics.
+    - As in the scalar functions, a zero standard error gives a degenerate
+      interval (NaN degrees of freedom) and a zero pooled variance gives an
+      effect size of 0.
+    - Summaries tracking different metrics are aligned by name first.
+    """
+    names = summary_1.names + tuple(
+        name for name in summary_2.names if name not in summary_1.names
+    )
+    summary_A = summary_1.aligned(names)
+    summary_B = summary_2.aligned(names)
+
+    n_A, n_B = summary_A.n, summary_B.n
+    mean_A, mean_B = summary_A.mean, summary_B.mean
+    var_A, var_B = summary_A.variance, summary_B.variance
+    valid = (n_A >= 2) & (n_B >= 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = mean_B - mean_A
+
+        # Welch standard error and Welch–Satterthwaite degrees of freedom
+        se_A2 = var_A / n_A
+        se_B2 = var_B / n_B
+        se = np.sqrt(se_A2 + se_B2)
+        df = (se_A2 + se_B2) ** 2 / (se_A2**2 / (n_A - 1) + se_B2**2 / (n_B - 1))
+
+        alpha = 1 - confidence_level
+        t_crit = stats.t.ppf(1 - alpha / 2, df)
+        margin = np.where(se > 0, t_crit * se, 0.0)
+
+        pooled_var = ((n_A - 1) * var_A + (n_B - 1) * var_B) / (n_A + n_B - 2)
+        effect_size = np.where(pooled_var > 0, delta / np.sqrt(pooled_var), 0.0)
+
+    def masked(values):
+        return np.where(valid, values, np.nan)
+
+    return {
+        "metrics": names,
+        "mean_A": masked(mean_A),
+        "mean_B": masked(mean_B),
+        "delta": masked(delta),
+        "se": masked(se),
+        "df": masked(df),
+        "ci_lower": masked(delta - margin),
+        "ci_upper": masked(delta + margin),
+        "n_A": n_A,
+        "n_B": n_B,
+        "effect_size": masked(effect_size),
     }
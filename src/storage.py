@@ -1,6 +1,54 @@
+import copy
+import logging
+import math
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
-from src.models import Request, Outcome, ModelVariant
+from collections import deque
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, MutableMapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src import ids
+from src.aggregates import (
+    DEFAULT_MAX_SEGMENT_VALUES,
+    SegmentCap,
+    SegmentCube,
+    TimeBucketedSummaries,
+)
+from src.db_models import DBExperiments, DBOutcome, DBRequest
+from src.models import (
+    CovariateSummary,
+    MetricSummary,
+    ModelVariant,
+    Outcome,
+    OutcomeSummary,
+    ProportionSummary,
+    Request,
+    Summary,
+)
+from src.request_log import CODE_VARIANTS, FREE, VARIANT_CODES, ColumnarRequestLog
+
+logger = logging.getLogger(__name__)
+
+
+class LateOutcomeError(ValueError):
+    # Outcome arrived for a request evicted from the attribution window
+    pass
+
+
+# Running aggregate kept per variant for each ExperimentConfig.metric_type
+SUMMARY_TYPES = {"continuous": OutcomeSummary, "binary": ProportionSummary}
+
+
+def _summary_type(metric_type: str):
+    try:
+        return SUMMARY_TYPES[metric_type]
+    except KeyError:
+        raise ValueError(f"Unknown metric_type: {metric_type!r}") from None
 
 
 class StorageBackend(ABC):
@@ -14,48 +62,1364 @@ class StorageBackend(ABC):
     def save_outcome(self, outcome: Outcome) -> None:
         pass
 
+    def save_requests(self, requests: List[Request]) -> None:
+        # Batch variant of save_request; backends should override when they
+        # can store a batch more cheaply than one call per request
+        for request in requests:
+            self.save_request(request)
+
+    def save_outcomes(
+        self, request_ids: Sequence[int], values: Sequence[float], timestamp: float
+    ) -> List[int]:
+        # Bulk variant of save_outcome. Returns the ids that could not be
+        # attributed to a logged request (their values are not stored).
+        unknown = []
+        for request_id, value in zip(request_ids, values):
+            if self.get_request(request_id) is None:
+                unknown.append(request_id)
+            else:
+                self.save_outcome(Outcome(request_id, float(value), timestamp))
+        return unknown
+
     @abstractmethod
-    def get_request(self, request_id: str) -> Optional[Request]:
+    def get_request(self, request_id: int) -> Optional[Request]:
         pass
 
+    def get_variant_codes(self, request_ids: Sequence[int]) -> np.ndarray:
+        # Variant code (VARIANT_CODES) of every request id, FREE for ids
+        # that were not saved. Backends should override this with a bulk
+        # lookup.
+        return np.fromiter(
+            (
+                VARIANT_CODES[request.selected_model] if request is not None else FREE
+                for request in map(self.get_request, request_ids)
+            ),
+            dtype=np.uint8,
+            count=len(request_ids),
+        )
+
     @abstractmethod
-    def get_all_outcomes(self) -> Dict[str, Outcome]:
+    def get_all_outcomes(self) -> Mapping[int, Outcome]:
         pass
 
     @abstractmethod
     def get_outcomes_by_variant(self, variant: ModelVariant) -> List[float]:
         pass
 
+    @abstractmethod
+    def get_variant_summary(self, variant: ModelVariant) -> Summary:
+        # A ProportionSummary instead for binary metrics
+        pass
+
+    def get_variant_summaries(self) -> Dict[ModelVariant, Summary]:
+        # Backends that can answer for all variants at once should override this
+        return {variant: self.get_variant_summary(variant) for variant in ModelVariant}
+
+    def get_metric_summaries(self) -> Dict[ModelVariant, MetricSummary]:
+        # Per-variant aggregates of the named metrics attached to outcomes.
+        # Backends that do not keep outcome metrics report none.
+        return {variant: MetricSummary() for variant in ModelVariant}
+
+    def get_window_summaries(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Dict[ModelVariant, Summary]:
+        # Per-variant aggregates of the outcomes with timestamps in
+        # [start, end). This fallback scans every outcome; backends should
+        # answer from pre-aggregated buckets or push the filter down.
+        summaries = self.get_variant_summaries()
+        summaries = {variant: type(s)() for variant, s in summaries.items()}
+        for request_id, outcome in self.get_all_outcomes().items():
+            if start is not None and outcome.timestamp < start:
+                continue
+            if end is not None and outcome.timestamp >= end:
+                continue
+            request = self.get_request(request_id)
+            if request is not None:
+                summaries[request.selected_model].update(outcome.outcome_value)
+        return summaries
+
+    def get_segment_summaries(
+        self, dimension: str
+    ) -> Dict[object, Dict[ModelVariant, Summary]]:
+        # Per-variant aggregates for every value of one segment dimension.
+        # This fallback scans every outcome; backends should keep a cube or
+        # push the grouping down.
+        summary_type = type(self.get_variant_summary(ModelVariant.A))
+        segments: Dict[object, Dict[ModelVariant, Summary]] = {}
+        for request_id, outcome in self.get_all_outcomes().items():
+            request = self.get_request(request_id)
+            if request is None or not request.segments:
+                continue
+            if dimension not in request.segments:
+                continue
+            cell = segments.get(request.segments[dimension])
+            if cell is None:
+                cell = segments[request.segments[dimension]] = {
+                    variant: summary_type() for variant in ModelVariant
+                }
+            cell[request.selected_model].update(outcome.outcome_value)
+        return segments
+
+    def get_covariate_summaries(self) -> Dict[ModelVariant, CovariateSummary]:
+        # Per-variant covariate/outcome co-moments (CUPED) of the requests
+        # routed with a covariate. This fallback scans every outcome.
+        summaries = {variant: CovariateSummary() for variant in ModelVariant}
+        for request_id, outcome in self.get_all_outcomes().items():
+            request = self.get_request(request_id)
+            if request is not None and request.covariate is not None:
+                summaries[request.selected_model].update(
+                    request.covariate, outcome.outcome_value
+                )
+        return summaries
+
+    def is_late_outcome(self, request_id: int) -> bool:
+        # Called when an outcome arrives for an unknown request id. Backends
+        # that evict requests return True (and count it) for evicted ids.
+        return False
+
 
 class InMemoryStorage(StorageBackend):
-    def __init__(self):
-        self.requests: Dict[str, Request] = {}
-        self.outcomes: Dict[str, Outcome] = {}
+    # columnar=True keeps requests in a chunked ColumnarRequestLog instead
+    # of a dict of Request objects; store_input=False drops input payloads.
+    #
+    # attribution_window (seconds) bounds memory: requests older than the
+    # window that have no outcome are evicted. Request ids are kept in
+    # time-ordered buckets (a deque of bucket_width-wide lists), so each
+    # save_request only inspects the oldest bucket: amortised O(1). Evicted
+    # ids are remembered for one more window so that late outcomes can be
+    # told apart from unknown ids.
+    #
+    # metric_type="binary" keeps success/trial counters (ProportionSummary)
+    # per variant instead of Welford aggregates and rejects outcomes other
+    # than 0 and 1.
+    #
+    # time_buckets are the bucket widths (seconds) of the per-variant
+    # aggregates kept by outcome timestamp for windowed evidence, e.g.
+    # DEFAULT_RESOLUTIONS. They are off by default (None): each outcome
+    # then updates one bucket per resolution, and the finest level grows
+    # with the time span of the outcomes.
+    #
+    # Request segments feed a SegmentCube of per-(dimension, value, variant)
+    # aggregates; at most max_segment_values values are kept per dimension,
+    # later ones are saved as OTHER_SEGMENT.
+    #
+    # Requests routed with a covariate also feed per-variant covariate/outcome
+    # co-moments (CovariateSummary) for CUPED.
+    #
+    # wal, a src.wal.WriteAheadLog, makes writes durable: every write is
+    # appended to it (after validation, before it is applied), so the state
+    # can be rebuilt by replaying the log; see src.wal.open_storage.
+    #
+    # shared, a src.shared.SharedSummaries, makes the per-variant summaries
+    # cover every worker process: outcome writes publish this process's
+    # summaries to its slot, and variant summaries are read merged over all
+    # slots. Other aggregates stay local to the process.
+
+    # Number of expiry buckets per attribution window
+    EVICTION_BUCKETS = 64
+
+    def __init__(
+        self,
+        columnar: bool = False,
+        store_input: bool = True,
+        chunk_size: int = 65_536,
+        attribution_window: Optional[float] = None,
+        metric_type: str = "continuous",
+        time_buckets: Optional[Sequence[int]] = None,
+        max_segment_values: int = DEFAULT_MAX_SEGMENT_VALUES,
+        wal=None,
+        shared=None,
+    ):
+        self.wal = wal
+        self.shared = shared
+        self.requests: MutableMapping[int, Request]
+        # Read-only here: the columnar log's view, or the dict-backed
+        # storage's _outcome_dict, which is what the write paths update
+        self.outcomes: Mapping[int, Outcome]
+        if columnar:
+            # Outcomes live in the log's outcome columns, next to the request
+            self._log: Optional[ColumnarRequestLog] = ColumnarRequestLog(
+                chunk_size, store_input
+            )
+            self.requests = self._log
+            self.outcomes = self._log.outcomes
+        else:
+            self._log = None
+            self.requests = {}
+            self._outcome_dict: Dict[int, Outcome] = {}
+            self.outcomes = self._outcome_dict
+        # The columnar log drops inputs itself; dicts need a stripped copy
+        self._strip_input = not store_input and not columnar
+        # Per-variant running aggregates, kept in sync by save_outcome
+        self.metric_type = metric_type
+        self._summary_type = _summary_type(metric_type)
+        if shared is not None and shared.summary_type is not self._summary_type:
+            raise ValueError("shared was created for a different metric_type.")
+        self.summaries: Dict[ModelVariant, Summary] = {
+            variant: self._summary_type() for variant in ModelVariant
+        }
+        self.time_buckets: Optional[TimeBucketedSummaries] = None
+        if time_buckets:
+            self.time_buckets = TimeBucketedSummaries(self._summary_type, time_buckets)
+        self.segment_cap = SegmentCap(max_segment_values)
+        self.segment_cube = SegmentCube(self._summary_type)
+        self._has_segments = False
+        self.covariate_summaries: Dict[ModelVariant, CovariateSummary] = {
+            variant: CovariateSummary() for variant in ModelVariant
+        }
+        self._has_covariates = False
+        # Same for the named outcome metrics; every variant tracks the same
+        # metric names, in order of first appearance
+        self.metric_summaries: Dict[ModelVariant, MetricSummary] = {
+            variant: MetricSummary() for variant in ModelVariant
+        }
+        # Bumped whenever the covariate or metric aggregates change, so that
+        # readers holding copies can tell whether they are stale
+        self._covariate_version = 0
+        self._metric_version = 0
+
+        self.attribution_window = attribution_window
+        self.metrics: Dict[str, int] = {"evicted_requests": 0, "late_outcomes": 0}
+        if attribution_window is not None:
+            self._bucket_width = attribution_window / self.EVICTION_BUCKETS
+        # (bucket number, request ids) of live requests, oldest first
+        self._expiry: deque = deque()
+        # Evicted ids -> eviction bucket, expired after one more window
+        self._evicted: Dict[int, int] = {}
+        self._tombstones: deque = deque()
+
+    def _prepare(self, request) -> Request:
+        if self._strip_input and request.input_data is not None:
+            request = replace(request, input_data=None)
+        if request.covariate is not None:
+            self._has_covariates = True
+        if request.segments:
+            self._has_segments = True
+            segments = self.segment_cap.apply(request.segments)
+            if segments is not request.segments:
+                request = replace(request, segments=segments)
+        return request
 
     def save_request(self, request) -> None:
+        if self.wal is not None:
+            self.wal.log_request(request)
+        request = self._prepare(request)
         self.requests[request.request_id] = request
+        if self.attribution_window is not None:
+            self._track(request)
+            self._evict(request.timestamp)
+
+    def save_requests(self, requests) -> None:
+        if self.wal is not None:
+            self.wal.log_requests(requests)
+        if self._strip_input or any(
+            request.segments or request.covariate is not None for request in requests
+        ):
+            requests = [self._prepare(request) for request in requests]
+        self.requests.update((request.request_id, request) for request in requests)
+        if self.attribution_window is not None and requests:
+            for request in requests:
+                self._track(request)
+            self._evict(requests[-1].timestamp)
+
+    # -- attribution window -------------------------------------------------
+
+    def _track(self, request) -> None:
+        bucket = math.floor(request.timestamp / self._bucket_width)
+        # Out-of-order timestamps join the newest bucket and expire with it
+        if not self._expiry or self._expiry[-1][0] < bucket:
+            self._expiry.append((bucket, []))
+        self._expiry[-1][1].append(request.request_id)
+
+    def _evict(self, now: float) -> None:
+        # Drop unresolved requests whose bucket ended before now - window
+        window = self.attribution_window
+        if window is None:
+            return
+        horizon = math.floor((now - window) / self._bucket_width)
+        while self._expiry and self._expiry[0][0] < horizon:
+            bucket, request_ids = self._expiry.popleft()
+            evicted = []
+            for request_id in request_ids:
+                if request_id not in self.outcomes and request_id in self.requests:
+                    del self.requests[request_id]
+                    self._evicted[request_id] = bucket
+                    evicted.append(request_id)
+            if evicted:
+                self._tombstones.append((bucket, evicted))
+                self.metrics["evicted_requests"] += len(evicted)
+
+        # Forget tombstones once they are a full window older than the horizon
+        tombstone_horizon = horizon - self.EVICTION_BUCKETS
+        while self._tombstones and self._tombstones[0][0] < tombstone_horizon:
+            _, request_ids = self._tombstones.popleft()
+            for request_id in request_ids:
+                self._evicted.pop(request_id, None)
+
+    def is_late_outcome(self, request_id) -> bool:
+        if request_id in self._evicted:
+            self.metrics["late_outcomes"] += 1
+            return True
+        return False
+
+    def _get_segments(self, request_id) -> Optional[dict]:
+        if not self._has_segments:
+            return None
+        if self._log is not None:
+            return self._log.get_segments(request_id)
+        request = self.requests.get(request_id)
+        return request.segments if request is not None else None
+
+    def _get_covariate(self, request_id) -> Optional[float]:
+        if not self._has_covariates:
+            return None
+        if self._log is not None:
+            return self._log.get_covariate(request_id)
+        request = self.requests.get(request_id)
+        return request.covariate if request is not None else None
+
+    def _get_variant(self, request_id) -> Optional[ModelVariant]:
+        if self._log is not None:
+            return self._log.get_variant(request_id)
+        request = self.requests.get(request_id)
+        return request.selected_model if request is not None else None
 
     def save_outcome(self, outcome) -> None:
-        self.outcomes[outcome.request_id] = outcome
+        if self._summary_type is ProportionSummary:
+            ProportionSummary.validate(outcome.outcome_value)
+        if self.wal is not None:
+            self.wal.log_outcome(outcome)
+        self._apply_outcome(outcome)
+        if self.shared is not None:
+            self.shared.publish(self.summaries)
+
+    def _apply_outcome(self, outcome) -> None:
+        variant = self._get_variant(outcome.request_id)
+        if variant is not None:
+            summary = self.summaries[variant]
+            segments = self._get_segments(outcome.request_id)
+            covariate = self._get_covariate(outcome.request_id)
+            previous = self.outcomes.get(outcome.request_id)
+            if previous is not None:
+                summary.remove(previous.outcome_value)
+                if covariate is not None:
+                    self.covariate_summaries[variant].remove(
+                        covariate, previous.outcome_value
+                    )
+                    self._covariate_version += 1
+                if segments:
+                    self.segment_cube.remove(variant, segments, previous.outcome_value)
+                if self.time_buckets is not None:
+                    self.time_buckets.remove(
+                        variant, previous.timestamp, previous.outcome_value
+                    )
+                if previous.metrics:
+                    metric_summary = self.metric_summaries[variant]
+                    metric_summary.remove(metric_summary.vector(previous.metrics))
+                    self._metric_version += 1
+            summary.update(outcome.outcome_value)
+            if self.time_buckets is not None:
+                self.time_buckets.add(variant, outcome.timestamp, outcome.outcome_value)
+            if segments:
+                self.segment_cube.add(variant, segments, outcome.outcome_value)
+            if covariate is not None:
+                self.covariate_summaries[variant].update(
+                    covariate, outcome.outcome_value
+                )
+                self._covariate_version += 1
+            if outcome.metrics:
+                self._update_metrics(variant, outcome.metrics)
+        if self._log is None:
+            self._outcome_dict[outcome.request_id] = outcome
+        elif variant is not None:
+            # The columnar log only has slots for logged requests
+            self._log.set_outcome(
+                outcome.request_id,
+                outcome.outcome_value,
+                outcome.timestamp,
+                outcome.metrics,
+            )
+
+    def _update_metrics(self, variant, metrics) -> None:
+        names = self.metric_summaries[variant].names
+        if any(name not in names for name in metrics):
+            names += tuple(name for name in metrics if name not in names)
+            for other in ModelVariant:
+                self.metric_summaries[other] = self.metric_summaries[other].aligned(
+                    names
+                )
+        metric_summary = self.metric_summaries[variant]
+        metric_summary.update(metric_summary.vector(metrics))
+        self._metric_version += 1
+
+    def _merge_bulk(self, codes, values, timestamp) -> None:
+        # Fold a batch of new outcomes into the per-variant aggregates
+        for code, variant in enumerate(ModelVariant):
+            selected = values[codes == code]
+            if not len(selected):
+                continue
+            summary = self.summaries[variant]
+            batch: Summary
+            if isinstance(summary, ProportionSummary):
+                batch = ProportionSummary.from_values(selected)
+                summary.merge(batch)
+            else:
+                mean = float(selected.mean())
+                m2 = float(((selected - mean) ** 2).sum())
+                batch = OutcomeSummary(n=len(selected), mean=mean, m2=m2)
+                summary.merge(batch)
+            if self.time_buckets is not None:
+                self.time_buckets.merge(variant, timestamp, batch)
+
+    def _merge_segments(self, request_ids, rows, codes, values) -> None:
+        # Segment cells of a bulk batch; a row-by-row pass, skipped entirely
+        # until a request with segments has been saved
+        if not self._has_segments:
+            return
+        for row, code in zip(rows.tolist(), codes.tolist()):
+            segments = self._get_segments(request_ids[row])
+            if segments:
+                self.segment_cube.add(CODE_VARIANTS[code], segments, values[row])
+
+    def _merge_covariates(self, covariates, codes, values) -> None:
+        # Co-moments of a bulk batch; covariates are aligned with codes and
+        # values, NaN for requests routed without one
+        present = ~np.isnan(covariates)
+        for code, variant in enumerate(ModelVariant):
+            selected = present & (codes == code)
+            if selected.any():
+                self.covariate_summaries[variant].merge(
+                    CovariateSummary.from_values(covariates[selected], values[selected])
+                )
+                self._covariate_version += 1
+
+    def _variant_codes(self, request_ids) -> np.ndarray:
+        get = self.requests.get
+        return np.fromiter(
+            (
+                VARIANT_CODES[request.selected_model] if request is not None else FREE
+                for request in map(get, request_ids)
+            ),
+            dtype=np.uint8,
+            count=len(request_ids),
+        )
+
+    def get_variant_codes(self, request_ids) -> np.ndarray:
+        if self._log is None:
+            return self._variant_codes(request_ids)
+        ordinals = self._log.ordinals(request_ids)
+        codes = np.full(len(ordinals), FREE, dtype=np.uint8)
+        known = ordinals >= 0
+        codes[known] = self._log.variant_codes_at(ordinals[known])
+        return codes
+
+    def save_outcomes(self, request_ids, values, timestamp) -> List[int]:
+        # Overwrites (and repeated ids) must back out the previous value, so
+        # they take the row-by-row path; new outcomes are merged in bulk
+        request_ids = list(request_ids)
+        values = np.asarray(values, dtype=np.float64)
+        if self._summary_type is ProportionSummary:
+            # Reject the whole batch before anything is written
+            ProportionSummary.from_values(values)
+        if self.wal is not None:
+            self.wal.log_outcomes(request_ids, values, timestamp)
+        has_repeats = len(set(request_ids)) != len(request_ids)
+
+        if self._log is not None:
+            ordinals = self._log.ordinals(request_ids)
+            known_rows = np.flatnonzero(ordinals >= 0)
+            known_ordinals = ordinals[known_rows]
+            codes = self._log.variant_codes_at(known_ordinals)
+            if has_repeats:
+                replaced = np.ones(len(known_rows), dtype=bool)
+            else:
+                previous = self._log.outcome_timestamps_at(known_ordinals)
+                replaced = ~np.isnan(previous)
+
+            fresh = ~replaced
+            self._merge_bulk(codes[fresh], values[known_rows[fresh]], timestamp)
+            self._merge_segments(request_ids, known_rows[fresh], codes[fresh], values)
+            if self._has_covariates:
+                self._merge_covariates(
+                    self._log.covariates_at(known_ordinals[fresh]),
+                    codes[fresh],
+                    values[known_rows[fresh]],
+                )
+            self._log.set_outcomes_at(
+                known_ordinals[fresh], values[known_rows[fresh]], timestamp
+            )
+            unknown_rows = np.flatnonzero(ordinals < 0)
+        else:
+            all_codes = self._variant_codes(request_ids)
+            known_rows = np.flatnonzero(all_codes != FREE)
+            unknown_rows = np.flatnonzero(all_codes == FREE)
+            codes = all_codes[known_rows]
+            outcomes = self._outcome_dict
+            if has_repeats:
+                replaced = np.ones(len(known_rows), dtype=bool)
+            else:
+                replaced = np.fromiter(
+                    (request_ids[i] in outcomes for i in known_rows.tolist()),
+                    dtype=bool,
+                    count=len(known_rows),
+                )
+
+            fresh_rows = known_rows[~replaced]
+            self._merge_bulk(codes[~replaced], values[fresh_rows], timestamp)
+            self._merge_segments(request_ids, fresh_rows, codes[~replaced], values)
+            if self._has_covariates:
+                covariates = np.array(
+                    [self.requests[request_ids[i]].covariate for i in fresh_rows],
+                    dtype=np.float64,
+                )
+                self._merge_covariates(covariates, codes[~replaced], values[fresh_rows])
+            outcomes.update(
+                (request_ids[i], Outcome(request_ids[i], value, timestamp))
+                for i, value in zip(fresh_rows.tolist(), values[fresh_rows].tolist())
+            )
+
+        for i in known_rows[replaced].tolist():
+            self._apply_outcome(Outcome(request_ids[i], float(values[i]), timestamp))
+
+        if self.shared is not None:
+            self.shared.publish(self.summaries)
+        return [request_ids[i] for i in unknown_rows.tolist()]
 
     def get_request(self, request_id) -> Optional[Request]:
         if request_id in self.requests:
             return self.requests[request_id]
         return None
 
-    def get_all_outcomes(self) -> Dict[str, Outcome]:
+    def get_all_outcomes(self) -> Mapping[int, Outcome]:
         return self.outcomes
 
     def get_outcomes_by_variant(self, variant: ModelVariant) -> List[float]:
+        if self._log is not None:
+            return self._log.outcome_values_for(variant).tolist()
         res = []
         for request_id, outcome in self.outcomes.items():
-            try:
-                if self.requests[request_id].selected_model == variant:
-                    res.append(outcome.outcome_value)
-            except KeyError:
-                continue
+            if self._get_variant(request_id) == variant:
+                res.append(outcome.outcome_value)
+        return res
+
+    def get_variant_summary(self, variant: ModelVariant) -> Summary:
+        if self.shared is not None:
+            return self.shared.read()[variant]
+        return copy.copy(self.summaries[variant])
+
+    def get_variant_summaries(self) -> Dict[ModelVariant, Summary]:
+        if self.shared is not None:
+            return self.shared.read()
+        return super().get_variant_summaries()
+
+    def get_metric_summaries(self) -> Dict[ModelVariant, MetricSummary]:
+        return {
+            variant: summary.copy()
+            for variant, summary in self.metric_summaries.items()
+        }
+
+    def get_window_summaries(self, start=None, end=None):
+        if self.time_buckets is None:
+            raise ValueError(
+                "Windowed summaries need time buckets; create the storage with "
+                "time_buckets, e.g. src.aggregates.DEFAULT_RESOLUTIONS."
+            )
+        return self.time_buckets.window(start, end)
+
+    def get_segment_summaries(self, dimension):
+        return self.segment_cube.slice(dimension)
+
+    def get_covariate_summaries(self) -> Dict[ModelVariant, CovariateSummary]:
+        return {
+            variant: copy.copy(summary)
+            for variant, summary in self.covariate_summaries.items()
+        }
+
+
+_FIBONACCI = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+class _Shard:
+    # One stripe of ConcurrentInMemoryStorage: a private InMemoryStorage,
+    # the lock that guards it, and an immutable snapshot of its aggregates.
+    # The metric and covariate snapshots carry the store version they were
+    # taken at, so writes that leave them alone do not copy them again.
+    __slots__ = (
+        "lock",
+        "store",
+        "snapshot",
+        "metric_snapshot",
+        "covariate_snapshot",
+        "_metric_version",
+        "_covariate_version",
+    )
+
+    def __init__(self, **storage_options):
+        self.lock = threading.Lock()
+        self.store = InMemoryStorage(**storage_options)
+        self.snapshot = self._take_snapshot()
+        self.metric_snapshot = self.store.get_metric_summaries()
+        self.covariate_snapshot = self.store.get_covariate_summaries()
+        self._metric_version = self.store._metric_version
+        self._covariate_version = self.store._covariate_version
+
+    def _take_snapshot(self):
+        return tuple(copy.copy(summary) for summary in self.store.summaries.values())
+
+    def publish(self) -> None:
+        # Called with the lock held after every write
+        store = self.store
+        self.snapshot = self._take_snapshot()
+        if store._metric_version != self._metric_version:
+            self.metric_snapshot = store.get_metric_summaries()
+            self._metric_version = store._metric_version
+        if store._covariate_version != self._covariate_version:
+            self.covariate_snapshot = store.get_covariate_summaries()
+            self._covariate_version = store._covariate_version
+
+
+class ConcurrentInMemoryStorage(StorageBackend):
+    # Thread-safe in-memory backend for threaded servers.
+    # Requests and outcomes are striped across num_shards InMemoryStorage
+    # shards by request id, each with its own lock, so writers only contend
+    # when they hit the same shard. Ids are mixed with a Fibonacci hash
+    # before picking a shard: snowflake ids (src.ids) keep their mostly-zero
+    # sequence in the low bits, so masking them directly would send nearly
+    # every request to shard 0. After every outcome a shard publishes
+    # immutable copies of the aggregates the write changed; evidence merges
+    # those copies without taking any lock (a reference assignment is
+    # atomic). Batches are split per shard, so each shard lock is taken once
+    # per batch.
+    # Extra keyword arguments (columnar, attribution_window, ...) configure
+    # the InMemoryStorage of every shard. All shards share one SegmentCap, so
+    # every shard maps a segment value to the same cell.
+    # shared (src.shared.SharedSummaries) is not supported: it holds one
+    # slot per process, and each shard would overwrite it with only its own
+    # summaries.
+
+    def __init__(self, num_shards: int = 32, **storage_options):
+        if num_shards < 1 or num_shards & (num_shards - 1):
+            raise ValueError("num_shards must be a power of two.")
+        if storage_options.get("shared") is not None:
+            raise ValueError(
+                "ConcurrentInMemoryStorage does not support shared summaries; "
+                "use InMemoryStorage(shared=...) in each worker process."
+            )
+        self._shards = [_Shard(**storage_options) for _ in range(num_shards)]
+        self._shift = 64 - (num_shards.bit_length() - 1)
+        self._summary_type = self._shards[0].store._summary_type
+        segment_cap = self._shards[0].store.segment_cap
+        for shard in self._shards[1:]:
+            shard.store.segment_cap = segment_cap
+
+    def _index(self, request_id) -> int:
+        # Top bits of the id times 2**64 / golden ratio
+        return ((hash(request_id) * _FIBONACCI) & _MASK64) >> self._shift
+
+    def _shard(self, request_id) -> _Shard:
+        return self._shards[self._index(request_id)]
+
+    def save_request(self, request) -> None:
+        shard = self._shard(request.request_id)
+        with shard.lock:
+            shard.store.save_request(request)
+
+    def save_requests(self, requests) -> None:
+        # Split the batch per shard, then take each shard lock once
+        groups: Dict[int, List[Request]] = {}
+        shard_of = self._index
+        for request in requests:
+            groups.setdefault(shard_of(request.request_id), []).append(request)
+
+        for index, shard_requests in groups.items():
+            shard = self._shards[index]
+            with shard.lock:
+                shard.store.save_requests(shard_requests)
+
+    def save_outcome(self, outcome) -> None:
+        shard = self._shard(outcome.request_id)
+        with shard.lock:
+            shard.store.save_outcome(outcome)
+            shard.publish()
+
+    def save_outcomes(self, request_ids, values, timestamp) -> List[int]:
+        # Split the batch per shard, then take each shard lock once
+        if self._summary_type is ProportionSummary:
+            # Reject the whole batch before any shard is written
+            ProportionSummary.from_values(values)
+        groups: Dict[int, tuple] = {}
+        shard_of = self._index
+        for request_id, value in zip(request_ids, values):
+            ids, vals = groups.setdefault(shard_of(request_id), ([], []))
+            ids.append(request_id)
+            vals.append(value)
+
+        unknown: List[int] = []
+        for index, (ids, vals) in groups.items():
+            shard = self._shards[index]
+            with shard.lock:
+                unknown.extend(shard.store.save_outcomes(ids, vals, timestamp))
+                shard.publish()
+        return unknown
+
+    def get_request(self, request_id) -> Optional[Request]:
+        shard = self._shard(request_id)
+        with shard.lock:
+            return shard.store.get_request(request_id)
+
+    def get_variant_codes(self, request_ids) -> np.ndarray:
+        request_ids = list(request_ids)
+        groups: Dict[int, List[int]] = {}
+        shard_of = self._index
+        for row, request_id in enumerate(request_ids):
+            groups.setdefault(shard_of(request_id), []).append(row)
+
+        codes = np.empty(len(request_ids), dtype=np.uint8)
+        for index, rows in groups.items():
+            shard = self._shards[index]
+            with shard.lock:
+                codes[rows] = shard.store.get_variant_codes(
+                    [request_ids[row] for row in rows]
+                )
+        return codes
+
+    def is_late_outcome(self, request_id) -> bool:
+        shard = self._shard(request_id)
+        with shard.lock:
+            return shard.store.is_late_outcome(request_id)
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard in self._shards:
+            for name, value in shard.store.metrics.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def get_all_outcomes(self) -> Dict[int, Outcome]:
+        outcomes: Dict[int, Outcome] = {}
+        for shard in self._shards:
+            with shard.lock:
+                outcomes.update(shard.store.outcomes)
+        return outcomes
+
+    def get_outcomes_by_variant(self, variant: ModelVariant) -> List[float]:
+        res: List[float] = []
+        for shard in self._shards:
+            with shard.lock:
+                res.extend(shard.store.get_outcomes_by_variant(variant))
         return res
 
+    def get_variant_summary(self, variant: ModelVariant) -> Summary:
+        return self.get_variant_summaries()[variant]
+
+    def get_variant_summaries(self) -> Dict[ModelVariant, Summary]:
+        # Snapshots are never mutated once published, so merging them into
+        # fresh summaries needs no lock
+        summaries = {variant: self._summary_type() for variant in ModelVariant}
+        for shard in self._shards:
+            for variant, summary in zip(ModelVariant, shard.snapshot):
+                summaries[variant].merge(summary)
+        return summaries
+
+    def get_window_summaries(self, start=None, end=None):
+        summaries = {variant: self._summary_type() for variant in ModelVariant}
+        for shard in self._shards:
+            with shard.lock:
+                shard_summaries = shard.store.get_window_summaries(start, end)
+            for variant, summary in shard_summaries.items():
+                summaries[variant].merge(summary)
+        return summaries
+
+    def get_segment_summaries(self, dimension):
+        segments: Dict[object, Dict[ModelVariant, Summary]] = {}
+        for shard in self._shards:
+            with shard.lock:
+                shard_segments = shard.store.get_segment_summaries(dimension)
+            for value, cell in shard_segments.items():
+                if value not in segments:
+                    segments[value] = cell
+                    continue
+                for variant, summary in cell.items():
+                    segments[value][variant].merge(summary)
+        return segments
+
+    def get_metric_summaries(self) -> Dict[ModelVariant, MetricSummary]:
+        summaries = {variant: MetricSummary() for variant in ModelVariant}
+        for shard in self._shards:
+            for variant, summary in shard.metric_snapshot.items():
+                summaries[variant].merge(summary)
+        return summaries
+
+    def get_covariate_summaries(self) -> Dict[ModelVariant, CovariateSummary]:
+        summaries = {variant: CovariateSummary() for variant in ModelVariant}
+        for shard in self._shards:
+            for variant, summary in shard.covariate_snapshot.items():
+                summaries[variant].merge(summary)
+        return summaries
+
+
+def _request_metadata(request: Request) -> Optional[dict]:
+    # JSON metadata column of a request row; None when there is nothing to keep
+    metadata: Dict[str, Any] = {}
+    if request.segments:
+        metadata["segments"] = request.segments
+    if request.covariate is not None:
+        metadata["covariate"] = request.covariate
+    return metadata or None
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    # DB columns are naive DateTime; store UTC
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _from_datetime(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
 
 class DatabaseStorage(StorageBackend):
-    pass  # Placeholder for future
+    # Write-behind backend on top of the requests/outcomes tables.
+    # save_request/save_outcome only append to an in-memory buffer; a
+    # background thread flushes the buffer as bulk INSERTs once it holds
+    # batch_size rows or every flush_interval seconds, whichever comes first.
+    # Reads flush first, so they always see every write made before them.
+    # Request input_data is not persisted; segments and covariates are
+    # stored in the request metadata and aggregated by the database. Outcome
+    # metrics are stored as JSON with the outcome and aggregated on read.
+    # metric_type="binary" reports success/trial counters (ProportionSummary)
+    # computed by the same grouped query.
+    # A batch the database rejects (duplicate key, foreign key, bad value) is
+    # written again in bisected batches, so one bad row cannot hold back the
+    # others; rows still rejected on their own are retried on later flushes
+    # and moved to dead_letters after max_row_attempts.
+    # requests.experiment_id references the experiments table, so a storage
+    # for an experiment_id without a row there creates a bare one.
+
+    # Keeps IN (...) lists below SQLite's bound-parameter limit
+    _IN_CHUNK = 500
+    # Errors caused by the rows written rather than by the database
+    _ROW_ERRORS = (IntegrityError, DataError)
+
+    def __init__(
+        self,
+        session_factory,
+        experiment_id: Optional[str] = None,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        metric_type: str = "continuous",
+        max_row_attempts: int = 3,
+    ):
+        self.session_factory = session_factory
+        self.experiment_id = experiment_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_row_attempts = max_row_attempts
+        self.metric_type = metric_type
+        self._summary_type = _summary_type(metric_type)
+
+        self._lock = threading.Lock()  # guards the buffers below
+        # Serialises all database work of this backend: SQLite engines from
+        # get_engine share a single connection across threads
+        self._db_lock = threading.Lock()
+        self._pending_requests: Dict[int, Request] = {}
+        self._pending_outcomes: Dict[int, Outcome] = {}
+        # Rows taken by a flush that has not committed yet
+        self._inflight_requests: Dict[int, Request] = {}
+        # Flushes that rejected each row so far, and rows given up on
+        self._request_attempts: Dict[int, int] = {}
+        self._outcome_attempts: Dict[int, int] = {}
+        self.dead_letters: List[object] = []
+        if experiment_id is not None:
+            self._ensure_experiment()
+
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._run_flusher, name="krisis-db-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def _ensure_experiment(self) -> None:
+        try:
+            with self.session_factory() as session, session.begin():
+                if session.get(DBExperiments, self.experiment_id) is None:
+                    session.add(
+                        DBExperiments(
+                            experiment_id=self.experiment_id,
+                            metric_type=self.metric_type,
+                        )
+                    )
+        except IntegrityError:
+            # Created concurrently by another process
+            pass
+
+    # -- write path -------------------------------------------------------
+
+    def save_request(self, request) -> None:
+        with self._lock:
+            self._pending_requests[request.request_id] = request
+            full = self._buffered() >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def save_requests(self, requests) -> None:
+        with self._lock:
+            for request in requests:
+                self._pending_requests[request.request_id] = request
+            full = self._buffered() >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def save_outcome(self, outcome) -> None:
+        if self._summary_type is ProportionSummary:
+            ProportionSummary.validate(outcome.outcome_value)
+        with self._lock:
+            self._pending_outcomes[outcome.request_id] = outcome
+            full = self._buffered() >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def save_outcomes(self, request_ids, values, timestamp) -> List[int]:
+        # Only outcomes of requests that are buffered, being flushed or
+        # persisted for this experiment are buffered; the other ids are
+        # returned, and their outcomes are not written
+        request_ids = list(request_ids)
+        if self._summary_type is ProportionSummary:
+            ProportionSummary.from_values(values)
+        known = self._request_variants(request_ids)
+        unknown = []
+        with self._lock:
+            for request_id, value in zip(request_ids, values):
+                if request_id in known:
+                    self._pending_outcomes[request_id] = Outcome(
+                        request_id, float(value), timestamp
+                    )
+                else:
+                    unknown.append(request_id)
+            full = self._buffered() >= self.batch_size
+        if full:
+            self._wake.set()
+        return unknown
+
+    def _request_variants(self, request_ids: List[int]) -> Dict[int, ModelVariant]:
+        # Variants of the requests among request_ids this storage has saved
+        known: Dict[int, ModelVariant] = {}
+        with self._lock:
+            for request_id in request_ids:
+                request = self._pending_requests.get(request_id)
+                if request is None:
+                    request = self._inflight_requests.get(request_id)
+                if request is not None:
+                    known[request_id] = request.selected_model
+        # A request leaving the buffer is found in the database: flushes
+        # hold _db_lock until they commit
+        rest = list(set(request_ids) - known.keys())
+        for start in range(0, len(rest), self._IN_CHUNK):
+            end = start + self._IN_CHUNK
+            query = select(DBRequest.request_id, DBRequest.model_variant).where(
+                DBRequest.request_id.in_(rest[start:end]),
+                DBRequest.experiment_id == self.experiment_id,
+            )
+            with self._db_lock, self.session_factory() as session:
+                for request_id, model_variant in session.execute(query):
+                    known[request_id] = ModelVariant(model_variant)
+        return known
+
+    def get_variant_codes(self, request_ids) -> np.ndarray:
+        request_ids = list(request_ids)
+        known = self._request_variants(request_ids)
+        return np.fromiter(
+            (
+                VARIANT_CODES[known[request_id]] if request_id in known else FREE
+                for request_id in request_ids
+            ),
+            dtype=np.uint8,
+            count=len(request_ids),
+        )
+
+    def _buffered(self) -> int:
+        return len(self._pending_requests) + len(self._pending_outcomes)
+
+    def _run_flusher(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Rows were re-queued by flush(); try again on the next tick
+                logger.exception("Flushing buffered rows to the database failed")
+
+    def flush(self) -> None:
+        # Write every buffered row in a single transaction
+        with self._db_lock:
+            with self._lock:
+                requests, self._pending_requests = self._pending_requests, {}
+                outcomes, self._pending_outcomes = self._pending_outcomes, {}
+                self._inflight_requests = requests
+            if not requests and not outcomes:
+                return
+
+            try:
+                try:
+                    self._write(list(requests.values()), list(outcomes.values()))
+                    requests, outcomes = {}, {}
+                except self._ROW_ERRORS:
+                    # Requests first, so outcomes of accepted requests can
+                    # be written
+                    self._bisect(requests, lambda rows: self._write(rows, []))
+                    self._bisect(outcomes, lambda rows: self._write([], rows))
+            except Exception:
+                self._requeue(requests, outcomes)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight_requests = {}
+            self._reject(requests, outcomes)
+
+    def _write(self, requests: List[Request], outcomes: List[Outcome]) -> None:
+        with self.session_factory() as session, session.begin():
+            if requests:
+                session.execute(
+                    insert(DBRequest), [self._request_row(r) for r in requests]
+                )
+            if outcomes:
+                self._write_outcomes(session, outcomes)
+
+    def _bisect(self, rows: Dict[int, Any], write) -> None:
+        # Write rows in halving batches, removing every committed batch from
+        # rows; what is left was rejected as a single row
+        batches = [list(rows)]
+        while batches:
+            batch = batches.pop()
+            try:
+                write([rows[key] for key in batch])
+            except self._ROW_ERRORS:
+                if len(batch) > 1:
+                    half = len(batch) // 2
+                    batches.append(batch[half:])
+                    batches.append(batch[:half])
+                continue
+            for key in batch:
+                del rows[key]
+
+    def _requeue(self, requests, outcomes) -> None:
+        with self._lock:
+            # Newer writes made during the flush take precedence
+            for request_id, request in requests.items():
+                self._pending_requests.setdefault(request_id, request)
+            for request_id, outcome in outcomes.items():
+                self._pending_outcomes.setdefault(request_id, outcome)
+
+    def _reject(self, requests, outcomes) -> None:
+        # Rows rejected on their own are retried by the following flushes,
+        # up to max_row_attempts flushes in a row, then given up on
+        retry = []
+        dropped: List[object] = []
+        for rows, attempts in (
+            (requests, self._request_attempts),
+            (outcomes, self._outcome_attempts),
+        ):
+            kept = {}
+            counts = {}
+            for request_id, row in rows.items():
+                count = attempts.get(request_id, 0) + 1
+                if count < self.max_row_attempts:
+                    kept[request_id] = row
+                    counts[request_id] = count
+                else:
+                    dropped.append(row)
+            attempts.clear()
+            attempts.update(counts)
+            retry.append(kept)
+        self._requeue(*retry)
+        if dropped:
+            with self._lock:
+                self.dead_letters.extend(dropped)
+            logger.error(
+                "The database rejected %d rows on %d flushes; moved to dead_letters",
+                len(dropped),
+                self.max_row_attempts,
+            )
+
+    def _write_outcomes(self, session, outcomes: List[Outcome]) -> None:
+        # Outcomes overwrite earlier ones for the same request, as in memory
+        request_ids = [o.request_id for o in outcomes]
+        for start in range(0, len(request_ids), self._IN_CHUNK):
+            end = start + self._IN_CHUNK
+            chunk = request_ids[start:end]
+            session.execute(delete(DBOutcome).where(DBOutcome.request_id.in_(chunk)))
+        session.execute(
+            insert(DBOutcome),
+            [
+                {
+                    "request_id": o.request_id,
+                    "value": o.outcome_value,
+                    "timestamp": _to_datetime(o.timestamp),
+                    "metrics": o.metrics or None,
+                }
+                for o in outcomes
+            ],
+        )
+
+    def _request_row(self, request: Request) -> dict:
+        return {
+            "request_id": request.request_id,
+            "experiment_id": self.experiment_id,
+            "model_variant": request.selected_model.value,
+            "timestamp": _to_datetime(request.timestamp),
+            "request_metadata": _request_metadata(request),
+        }
+
+    def close(self) -> None:
+        # Stop the background flusher and write out anything still buffered
+        self._closed.set()
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -- retention --------------------------------------------------------
+
+    def expire_requests(self, before: float) -> int:
+        """
+        Delete the requests routed before a point in time, with their outcomes.
+
+        Parameters:
+        before : float
+            Unix timestamp; requests whose id was generated in an earlier
+            millisecond are deleted.
+
+        Returns:
+        int
+            Number of requests deleted.
+
+        Notes:
+        - Requests are selected by id range alone (request_id <
+          ids.min_id_at(before)), a range scan of the primary key index.
+          This relies on the time-ordered ids of src.ids; requests saved
+          with ids from elsewhere are not expired.
+        """
+        self.flush()
+        bound = ids.min_id_at(before)
+        expired = select(DBRequest.request_id).where(
+            DBRequest.request_id < bound,
+            DBRequest.experiment_id == self.experiment_id,
+        )
+        with self._db_lock, self.session_factory() as session, session.begin():
+            session.execute(
+                delete(DBOutcome).where(
+                    DBOutcome.request_id < bound, DBOutcome.request_id.in_(expired)
+                )
+            )
+            result = session.execute(
+                delete(DBRequest).where(
+                    DBRequest.request_id < bound,
+                    DBRequest.experiment_id == self.experiment_id,
+                )
+            )
+        return result.rowcount
+
+    # -- read path --------------------------------------------------------
+
+    def get_request(self, request_id) -> Optional[Request]:
+        with self._lock:
+            request = self._pending_requests.get(request_id)
+            if request is None:
+                request = self._inflight_requests.get(request_id)
+        if request is not None:
+            return request
+
+        with self._db_lock, self.session_factory() as session:
+            row = session.get(DBRequest, request_id)
+        if row is None or row.experiment_id != self.experiment_id:
+            return None
+        return Request(
+            request_id=row.request_id,
+            selected_model=ModelVariant(row.model_variant),
+            input_data=None,
+            timestamp=_from_datetime(row.timestamp),
+            segments=(row.request_metadata or {}).get("segments"),
+            covariate=(row.request_metadata or {}).get("covariate"),
+        )
+
+    def get_all_outcomes(self) -> Dict[int, Outcome]:
+        self.flush()
+        query = (
+            select(
+                DBOutcome.request_id,
+                DBOutcome.value,
+                DBOutcome.timestamp,
+                DBOutcome.metrics,
+            )
+            .join(DBRequest, DBOutcome.request_id == DBRequest.request_id)
+            .where(DBRequest.experiment_id == self.experiment_id)
+        )
+        with self._db_lock, self.session_factory() as session:
+            rows = session.execute(query).all()
+        return {
+            request_id: Outcome(
+                request_id=request_id,
+                outcome_value=value,
+                timestamp=_from_datetime(timestamp),
+                metrics=metrics,
+            )
+            for request_id, value, timestamp, metrics in rows
+        }
+
+    def get_metric_summaries(self) -> Dict[ModelVariant, MetricSummary]:
+        # Metrics are JSON, which databases cannot aggregate portably, so
+        # only the outcomes that have metrics are read and summarised here
+        self.flush()
+        query = (
+            select(DBRequest.model_variant, DBOutcome.metrics)
+            .select_from(DBRequest)
+            .join(DBOutcome, DBOutcome.request_id == DBRequest.request_id)
+            .where(
+                DBRequest.experiment_id == self.experiment_id,
+                DBOutcome.metrics.isnot(None),
+            )
+        )
+        with self._db_lock, self.session_factory() as session:
+            rows = session.execute(query).all()
+
+        # Every variant tracks the same names, in order of first appearance
+        names: Dict[str, None] = {}
+        for _, metrics in rows:
+            names.update(dict.fromkeys(metrics))
+        summaries = {variant: MetricSummary(tuple(names)) for variant in ModelVariant}
+        for model_variant, metrics in rows:
+            summary = summaries[ModelVariant(model_variant)]
+            summary.update(summary.vector(metrics))
+        return summaries
+
+    def get_outcomes_by_variant(self, variant: ModelVariant) -> List[float]:
+        self.flush()
+        query = (
+            select(DBOutcome.value)
+            .join(DBRequest, DBOutcome.request_id == DBRequest.request_id)
+            .where(
+                DBRequest.experiment_id == self.experiment_id,
+                DBRequest.model_variant == variant.value,
+            )
+        )
+        with self._db_lock, self.session_factory() as session:
+            return list(session.execute(query).scalars())
+
+    def get_variant_summary(self, variant: ModelVariant) -> Summary:
+        return self.get_variant_summaries()[variant]
+
+    def get_variant_summaries(self) -> Dict[ModelVariant, Summary]:
+        return self.get_window_summaries()
+
+    def get_segment_summaries(self, dimension):
+        # Grouped like get_window_summaries, additionally by the segment
+        # value, which is extracted from the request's JSON metadata (and
+        # therefore comes back as a string)
+        self.flush()
+        segment = DBRequest.request_metadata["segments"][dimension].as_string()
+        query = (
+            select(
+                segment,
+                DBRequest.model_variant,
+                func.count(DBOutcome.value),
+                func.sum(DBOutcome.value),
+                func.sum(DBOutcome.value * DBOutcome.value),
+            )
+            .select_from(DBRequest)
+            .join(DBOutcome, DBOutcome.request_id == DBRequest.request_id)
+            .where(DBRequest.experiment_id == self.experiment_id, segment.isnot(None))
+            .group_by(segment, DBRequest.model_variant)
+        )
+        with self._db_lock, self.session_factory() as session:
+            rows = session.execute(query).all()
+
+        segments: Dict[object, Dict[ModelVariant, Summary]] = {}
+        for value, model_variant, n, total, total_sq in rows:
+            cell = segments.get(value)
+            if cell is None:
+                cell = segments[value] = {
+                    variant: self._summary_type() for variant in ModelVariant
+                }
+            cell[ModelVariant(model_variant)] = self._summary_from_sums(
+                n, total, total_sq
+            )
+        return segments
+
+    def get_covariate_summaries(self) -> Dict[ModelVariant, CovariateSummary]:
+        # CUPED co-moments from one grouped query of COUNT and the SUMs of
+        # x, y, x², y² and xy per variant
+        self.flush()
+        x = DBRequest.request_metadata["covariate"].as_float()
+        y = DBOutcome.value
+        query = (
+            select(
+                DBRequest.model_variant,
+                func.count(y),
+                func.sum(x),
+                func.sum(y),
+                func.sum(x * x),
+                func.sum(y * y),
+                func.sum(x * y),
+            )
+            .select_from(DBRequest)
+            .join(DBOutcome, DBOutcome.request_id == DBRequest.request_id)
+            .where(DBRequest.experiment_id == self.experiment_id, x.isnot(None))
+            .group_by(DBRequest.model_variant)
+        )
+        with self._db_lock, self.session_factory() as session:
+            rows = session.execute(query).all()
+
+        summaries = {variant: CovariateSummary() for variant in ModelVariant}
+        for model_variant, n, *sums in rows:
+            summaries[ModelVariant(model_variant)] = CovariateSummary.from_sums(
+                n, *(total or 0.0 for total in sums)
+            )
+        return summaries
+
+    def _summary_from_sums(self, n, total, total_sq):
+        if self._summary_type is ProportionSummary:
+            return ProportionSummary(successes=round(total or 0), trials=n)
+        return OutcomeSummary.from_sums(n, total or 0.0, total_sq or 0.0)
+
+    def get_window_summaries(self, start=None, end=None):
+        # One grouped query: COUNT / SUM / SUM of squares per variant are
+        # computed by the database, so no outcome rows are transferred.
+        # Filtering on experiment_id first lets idx_experiment_timestamp
+        # drive the scan of the requests table; time windows filter on the
+        # outcome timestamp.
+        self.flush()
+        query = (
+            select(
+                DBRequest.model_variant,
+                func.count(DBOutcome.value),
+                func.sum(DBOutcome.value),
+                func.sum(DBOutcome.value * DBOutcome.value),
+            )
+            .select_from(DBRequest)
+            .join(DBOutcome, DBOutcome.request_id == DBRequest.request_id)
+            .where(DBRequest.experiment_id == self.experiment_id)
+            .group_by(DBRequest.model_variant)
+        )
+        if start is not None:
+            query = query.where(DBOutcome.timestamp >= _to_datetime(start))
+        if end is not None:
+            query = query.where(DBOutcome.timestamp < _to_datetime(end))
+        with self._db_lock, self.session_factory() as session:
+            rows = session.execute(query).all()
+
+        summaries = {variant: self._summary_type() for variant in ModelVariant}
+        for model_variant, n, total, total_sq in rows:
+            summaries[ModelVariant(model_variant)] = self._summary_from_sums(
+                n, total, total_sq
+            )
+        return summaries
@@ -0,0 +1,421 @@
+# Write-ahead log of InMemoryStorage writes.
+#
+# Every save_request(s) / save_outcome(s) of a storage opened with
+# open_storage is encoded as a compact binary record:
+#
+#   header : record type (uint8), payload length (uint32)
+#   payload: request  -> id (int64), variant code (uint8), timestamp and
+#                        covariate (float64, NaN for none) [, JSON segments]
+#            outcome  -> id (int64), value and timestamp (float64)
+#                        [, JSON metrics]
+#            outcomes -> timestamp (float64), count (uint32), then the ids
+#                        (int64) and values (float64) as packed arrays
+#
+# Writers only append records to an in-memory buffer. A background thread
+# group commits: every sync_interval seconds, or as soon as sync_batch
+# records are pending, it writes the buffer to the current segment as one
+# block (length and CRC-32 (uint32 each), then the records) and fsyncs, so
+# many writes share one write and one fsync. A failed commit keeps its
+# records buffered, in order, and cuts the segment back to its last
+# committed block before the next attempt, so a retry never leaves a torn
+# block in front of good ones. Segments rotate at
+# segment_bytes; checkpoint compacts the log into a snapshot (src.snapshot)
+# and deletes the segments it covers. On startup the newest snapshot is
+# restored and the segments written after it are replayed.
+
+import glob
+import json
+import logging
+import math
+import os
+import struct
+import threading
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+from src.models import Outcome, Request
+from src.request_log import CODE_VARIANTS, VARIANT_CODES
+from src.snapshot import load_snapshot, save_snapshot
+from src.storage import InMemoryStorage
+
+logger = logging.getLogger(__name__)
+
+REQUEST, OUTCOME, OUTCOMES = 1, 2, 3
+
+_BLOCK = struct.Struct("<II")
+_RECORD = struct.Struct("<BI")
+_REQUEST = struct.Struct("<qBdd")
+_OUTCOME = struct.Struct("<qdd")
+_OUTCOMES = struct.Struct("<dI")
+# Header and payload in one pack call, for records without JSON extras
+_REQUEST_RECORD = struct.Struct("<BIqBdd")
+_OUTCOME_RECORD = struct.Struct("<BIqdd")
+
+# File names of segments and snapshots, and the glob patterns matching them
+_SEGMENT, _SEGMENTS = "wal-{:010d}.log", "wal-*.log"
+_SNAPSHOT, _SNAPSHOTS = "snapshot-{:010d}.snap", "snapshot-*.snap"
+
+
+def _number(path: str) -> int:
+    # Segment or snapshot number from its file name
+    return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+
+def _files(directory: str, pattern: str) -> List[Tuple[int, str]]:
+    paths = glob.glob(os.path.join(directory, pattern))
+    return sorted((_number(path), path) for path in paths)
+
+
+def _encode_request(request) -> bytes:
+    fields = (
+        request.request_id,
+        VARIANT_CODES[request.selected_model],
+        request.timestamp,
+        math.nan if request.covariate is None else request.covariate,
+    )
+    if not request.segments:
+        return _REQUEST_RECORD.pack(REQUEST, _REQUEST.size, *fields)
+    payload = _REQUEST.pack(*fields) + json.dumps(request.segments).encode()
+    return _RECORD.pack(REQUEST, len(payload)) + payload
+
+
+def _encode_outcome(outcome) -> bytes:
+    fields = (outcome.request_id, outcome.outcome_value, outcome.timestamp)
+    if not outcome.metrics:
+        return _OUTCOME_RECORD.pack(OUTCOME, _OUTCOME.size, *fields)
+    payload = _OUTCOME.pack(*fields) + json.dumps(outcome.metrics).encode()
+    return _RECORD.pack(OUTCOME, len(payload)) + payload
+
+
+class WriteAheadLog:
+    """
+    Segmented, group-committed append-only log in a directory.
+
+    Parameters:
+    directory : str
+        Directory of the log segments (and snapshots); created if needed.
+    sync_interval : float
+        Maximum time in seconds between a write and its fsync.
+    sync_batch : int
+        Number of pending records that triggers an fsync before
+        sync_interval has passed.
+    segment_bytes : int
+        Size after which group commits move on to a new segment.
+
+    Notes:
+    - A write is durable once the group commit that follows it has
+      finished; call sync() to wait for that explicitly. A crash loses at
+      most the last sync_interval seconds of writes.
+    - A group commit that fails (e.g. a full disk) is logged and retried
+      with the same records by the next one. sync() and close() raise the
+      error while the buffered records still cannot be written.
+    - Writes always start a new segment, after the highest existing one.
+    - Thread-safe. Request ids must be integers (see src.ids).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sync_interval: float = 0.01,
+        sync_batch: int = 4096,
+        segment_bytes: int = 64 * 2**20,
+    ):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.sync_batch = sync_batch
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()  # guards the buffer
+        # Held while writing to the segments, by group commits and rotation
+        self._sync_lock = threading.Lock()
+        self._buffer: List[bytes] = []
+        self._pending = 0
+        segments = _files(directory, _SEGMENTS)
+        self.segment_number = segments[-1][0] + 1 if segments else 0
+        self._file = self._open_segment(self.segment_number)
+        # Bytes of committed blocks in the current segment
+        self._size = 0
+        # Set when a commit failed and may have written part of a block
+        self._torn = False
+
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._syncer = threading.Thread(
+            target=self._run_syncer, name="krisis-wal-sync", daemon=True
+        )
+        self._syncer.start()
+
+    def _open_segment(self, number: int):
+        path = os.path.join(self.directory, _SEGMENT.format(number))
+        return open(path, "ab", buffering=0)
+
+    # -- appends ----------------------------------------------------------
+
+    def _append(self, record: bytes, records: int) -> None:
+        with self._lock:
+            self._buffer.append(record)
+            self._pending += records
+            full = self._pending >= self.sync_batch
+        if full:
+            self._wake.set()
+
+    def log_request(self, request) -> None:
+        self._append(_encode_request(request), 1)
+
+    def log_requests(self, requests) -> None:
+        self._append(b"".join(map(_encode_request, requests)), len(requests))
+
+    def log_outcome(self, outcome) -> None:
+        self._append(_encode_outcome(outcome), 1)
+
+    def log_outcomes(self, request_ids, values, timestamp) -> None:
+        payload = b"".join(
+            (
+                _OUTCOMES.pack(timestamp, len(request_ids)),
+                np.asarray(request_ids, dtype=np.int64).tobytes(),
+                np.asarray(values, dtype=np.float64).tobytes(),
+            )
+        )
+        self._append(_RECORD.pack(OUTCOMES, len(payload)) + payload, len(request_ids))
+
+    # -- group commit and segments ----------------------------------------
+
+    def _run_syncer(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except Exception:
+                # Records stay buffered; sync() tries again on the next tick
+                logger.exception("Group commit of the write-ahead log failed")
+
+    def sync(self) -> None:
+        # Make every write made so far durable
+        with self._sync_lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        # Write the buffer as one block and fsync; called with _sync_lock
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            pending, self._pending = self._pending, 0
+        if not records:
+            return
+        data = b"".join(records)
+        try:
+            if self._torn:
+                # Drop what a failed commit left after the last good block
+                self._file.truncate(self._size)
+            self._torn = True
+            self._file.write(_BLOCK.pack(len(data), zlib.crc32(data)))
+            self._file.write(data)
+            os.fsync(self._file.fileno())
+            self._torn = False
+        except BaseException:
+            # Put the records back in front of those appended meanwhile
+            with self._lock:
+                self._buffer[:0] = records
+                self._pending += pending
+            raise
+        self._size += _BLOCK.size + len(data)
+        if self._size >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        # Called with _sync_lock held, after a commit. The new segment is
+        # opened first, so a failure leaves the current one in use.
+        file = self._open_segment(self.segment_number + 1)
+        self._file.close()
+        self.segment_number += 1
+        self._file = file
+        self._size = 0
+
+    def rotate(self) -> int:
+        # Commit the buffer and start a new segment; returns its number
+        with self._sync_lock:
+            self._commit()
+            self._rotate()
+            return self.segment_number
+
+    def remove_before(self, number: int) -> None:
+        # Delete the segments and snapshots numbered below number
+        for pattern in (_SEGMENTS, _SNAPSHOTS):
+            for segment, path in _files(self.directory, pattern):
+                if segment < number:
+                    os.remove(path)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._wake.set()
+        self._syncer.join()
+        try:
+            self.sync()
+        finally:
+            self._file.close()
+
+
+# -- replay ---------------------------------------------------------------
+
+
+def _read_segment(path: str) -> Tuple[list, int]:
+    # (records, bytes of complete blocks); a torn or corrupt block ends the
+    # segment
+    with open(path, "rb") as handle:
+        data = handle.read()
+    records, position = [], 0
+    while position + _BLOCK.size <= len(data):
+        length, checksum = _BLOCK.unpack_from(data, position)
+        start = position + _BLOCK.size
+        end = start + length
+        block = data[start:end]
+        if len(block) < length or zlib.crc32(block) != checksum:
+            break
+        offset = 0
+        while offset < length:
+            kind, size = _RECORD.unpack_from(block, offset)
+            offset += _RECORD.size
+            payload_end = offset + size
+            records.append((kind, block[offset:payload_end]))
+            offset = payload_end
+        position = end
+    return records, position
+
+
+def _apply(storage: InMemoryStorage, kind: int, payload: bytes) -> None:
+    if kind == REQUEST:
+        request_id, code, timestamp, covariate = _REQUEST.unpack_from(payload)
+        head = _REQUEST.size
+        extra = payload[head:]
+        storage.save_request(
+            Request(
+                request_id=request_id,
+                selected_model=CODE_VARIANTS[code],
+                input_data=None,
+                timestamp=timestamp,
+                segments=json.loads(extra) if extra else None,
+                covariate=None if math.isnan(covariate) else covariate,
+            )
+        )
+    elif kind == OUTCOME:
+        request_id, value, timestamp = _OUTCOME.unpack_from(payload)
+        head = _OUTCOME.size
+        extra = payload[head:]
+        storage.save_outcome(
+            Outcome(request_id, value, timestamp, json.loads(extra) if extra else None)
+        )
+    elif kind == OUTCOMES:
+        timestamp, n = _OUTCOMES.unpack_from(payload)
+        ids = np.frombuffer(payload, dtype=np.int64, count=n, offset=_OUTCOMES.size)
+        values = np.frombuffer(
+            payload, dtype=np.float64, count=n, offset=_OUTCOMES.size + 8 * n
+        )
+        storage.save_outcomes(ids.tolist(), values, timestamp)
+    else:
+        raise ValueError(f"Unknown write-ahead log record type {kind}.")
+
+
+def replay(storage: InMemoryStorage, directory: str, start: int = 0) -> int:
+    """
+    Apply the logged writes of a directory to a storage.
+
+    Parameters:
+    storage : InMemoryStorage
+        Storage to apply the writes to; it must not have a wal attached.
+    directory : str
+        Log directory.
+    start : int
+        Number of the first segment to replay.
+
+    Returns:
+    int
+        Number of records applied.
+
+    Notes:
+    - A torn or corrupt block at the end of the last segment (a group
+      commit interrupted by a crash) is truncated away; anywhere else it
+      raises ValueError.
+    """
+    segments = [(n, path) for n, path in _files(directory, _SEGMENTS) if n >= start]
+    applied = 0
+    for i, (_, path) in enumerate(segments):
+        records, valid = _read_segment(path)
+        if valid < os.path.getsize(path):
+            if i < len(segments) - 1:
+                raise ValueError(f"Corrupt write-ahead log segment {path}.")
+            with open(path, "r+b") as handle:
+                handle.truncate(valid)
+        for kind, payload in records:
+            _apply(storage, kind, payload)
+        applied += len(records)
+    return applied
+
+
+def open_storage(
+    directory: str,
+    sync_interval: float = 0.01,
+    sync_batch: int = 4096,
+    segment_bytes: int = 64 * 2**20,
+    **storage_options,
+) -> InMemoryStorage:
+    """
+    Open a durable InMemoryStorage backed by a write-ahead log.
+
+    Parameters:
+    directory : str
+        Log directory; created if needed.
+    sync_interval, sync_batch, segment_bytes :
+        Passed to WriteAheadLog.
+    storage_options :
+        InMemoryStorage arguments, used when the directory has no snapshot
+        (a snapshot brings its own configuration).
+
+    Returns:
+    InMemoryStorage
+        The storage rebuilt from the newest snapshot and the segments
+        written after it, with a WriteAheadLog attached as storage.wal.
+
+    Notes:
+    - Request inputs are not logged, as in DatabaseStorage.
+    - Close the log with storage.wal.close() on shutdown.
+    """
+    os.makedirs(directory, exist_ok=True)
+    snapshots = _files(directory, _SNAPSHOTS)
+    if snapshots:
+        start, path = snapshots[-1]
+        storage = load_snapshot(path)
+    else:
+        start = 0
+        storage = InMemoryStorage(**storage_options)
+    replay(storage, directory, start)
+    storage.wal = WriteAheadLog(directory, sync_interval, sync_batch, segment_bytes)
+    return storage
+
+
+def checkpoint(storage: InMemoryStorage) -> str:
+    """
+    Compact the write-ahead log of a storage into a snapshot.
+
+    Parameters:
+    storage : InMemoryStorage
+        Storage returned by open_storage.
+
+    Returns:
+    str
+        Path of the snapshot written.
+
+    Behavior:
+    - Moves the log to a new segment, writes a snapshot of the storage
+      covering every earlier segment, then deletes those segments and
+      older snapshots, so restart time and disk use stay bounded.
+    - Must not run concurrently with writes to the storage.
+    """
+    wal = storage.wal
+    number = wal.rotate()
+    path = os.path.join(wal.directory, _SNAPSHOT.format(number))
+    save_snapshot(storage, path)
+    wal.remove_before(number)
+    return path
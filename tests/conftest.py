@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src import core
+
+
+@pytest.fixture
+def use_storage():
+    # Point the module-level storage in src.core at a test storage; the
+    # previous one is restored when the test ends
+    previous = core.storage
+
+    def use(storage):
+        core.set_storage(storage)
+        return storage
+
+    yield use
+    core.set_storage(previous)
+
+
+@pytest.fixture
+def populate(use_storage):
+    # Route n requests through src.core and record outcomes: one by one
+    # (with a named metric), in bulk, and overwriting the first ten
+    def populate(storage, n=500, seed=0):
+        rng = np.random.default_rng(seed)
+        use_storage(storage)
+        core.register_models(lambda x: x, lambda x: x)
+        _, request_ids = core.route_requests(
+            list(range(n)),
+            0.5,
+            segments=[{"country": "DE" if i % 3 else "FR"} for i in range(n)],
+            covariates=rng.normal(size=n).tolist(),
+        )
+        half = n // 2
+        for request_id in request_ids[:half]:
+            core.record_delayed_outcome(
+                request_id, float(rng.normal()), metrics={"clicks": 1.0}
+            )
+        core.record_delayed_outcomes(request_ids[half:], rng.normal(size=n - half))
+        core.record_delayed_outcomes(request_ids[:10], np.zeros(10))
+        return request_ids
+
+    return populate
@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from src.adapters import HTTPModelAdapter, ModelAdapterError
+from src.db_models import DBModel
+
+
+class _StubModelHandler(BaseHTTPRequestHandler):
+    # Local stand-in for a remote model: predicts 2 * x for every input
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # One handler instance is created per TCP connection
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.failures > 0
+            if fail:
+                self.server.failures -= 1
+
+        if fail:
+            status, payload = 503, b"{}"
+        else:
+            inputs = json.loads(body)["inputs"]
+            status = 200
+            payload = json.dumps({"predictions": [2 * x for x in inputs]}).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ShortKeepAliveHandler(_StubModelHandler):
+    # Drops connections idle for longer than a server keep-alive timeout
+    timeout = 0.2
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.failures = 0
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def server():
+    server = _serve(_StubModelHandler)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/predict"
+
+
+# Sequential predictions reuse a single keep-alive connection
+
+
+def test_adapter_reuses_connections(server):
+    with HTTPModelAdapter(_url(server)) as adapter:
+        predictions = [adapter(x) for x in range(50)]
+
+    assert predictions == [2 * x for x in range(50)]
+    assert server.requests == 50
+    assert server.connections == 1
+
+
+# Large batches are split into chunks and reassembled in order
+
+
+def test_adapter_batches(server):
+    with HTTPModelAdapter(_url(server), batch=True, max_batch_size=100) as adapter:
+        predictions = adapter(np.arange(1000))
+
+    assert predictions == [2 * x for x in range(1000)]
+    assert server.requests == 10
+    assert server.connections <= adapter.pool_size
+
+
+# 5xx responses are retried, but only a bounded number of times
+
+
+def test_adapter_retries(server):
+    server.failures = 2
+    with HTTPModelAdapter(_url(server), max_retries=2, backoff=0) as adapter:
+        assert adapter(3) == 6
+
+    server.failures = 3
+    with HTTPModelAdapter(_url(server), max_retries=2, backoff=0) as adapter:
+        with pytest.raises(ModelAdapterError):
+            adapter(3)
+
+
+# Retries do not reuse pooled connections the server has since closed
+
+
+def test_adapter_retries_on_fresh_connection():
+    server = _serve(_ShortKeepAliveHandler)
+    # Slow enough that concurrent chunks each open a connection
+    server.delay = 0.05
+    try:
+        with HTTPModelAdapter(
+            _url(server),
+            batch=True,
+            max_batch_size=1,
+            pool_size=4,
+            max_retries=1,
+            backoff=0,
+        ) as adapter:
+            assert adapter([1, 2, 3, 4]) == [2, 4, 6, 8]
+            assert server.connections > 1
+
+            time.sleep(0.5)
+            assert adapter([5]) == [10]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# A models table row can be turned into a registered model
+
+
+def test_adapter_from_db_model(server):
+    from src.core import register_models, route_request
+
+    row = DBModel(
+        model_id="remote",
+        adapter_type="http_endpoint",
+        location=_url(server),
+        model_metadata={"timeout": 2.0},
+    )
+    adapter = HTTPModelAdapter.from_db_model(row)
+    assert adapter.timeout == 2.0
+    # Endpoint URLs with long paths or query strings fit in the column
+    assert DBModel.__table__.c.location.type.length >= 2048
+
+    register_models(adapter, adapter)
+    prediction, _ = route_request(21, 0.5)
+    assert prediction == 42
+    adapter.close()
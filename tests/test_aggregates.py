@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from src.aggregates import TimeBucketedSummaries
+from src.models import ModelVariant, OutcomeSummary, ProportionSummary
+
+
+def _fill(buckets, rng, n=3000, span=5 * 86400, binary=False):
+    rows = []
+    for _ in range(n):
+        variant = ModelVariant.A if rng.random() < 0.5 else ModelVariant.B
+        timestamp = float(rng.uniform(0, span))
+        value = float(rng.random() < 0.3) if binary else float(rng.normal())
+        buckets.add(variant, timestamp, value)
+        rows.append((variant, timestamp, value))
+    return rows
+
+
+# Windows assembled from roll-ups match a scan over the raw outcomes
+
+
+def test_window_matches_scan_of_outcomes():
+    rng = np.random.default_rng(20)
+    buckets = TimeBucketedSummaries()
+    rows = _fill(buckets, rng)
+
+    for _ in range(50):
+        # Minute-aligned ranges, so the bucket boundaries are exact
+        start, end = sorted(rng.integers(0, 5 * 1440, 2) * 60.0)
+        window = buckets.window(start, end)
+        for variant in ModelVariant:
+            values = [v for var, t, v in rows if var == variant and start <= t < end]
+            assert window[variant].n == len(values)
+            if values:
+                assert abs(window[variant].mean - np.mean(values)) < 1e-9
+
+    everything = buckets.window()
+    assert sum(summary.n for summary in everything.values()) == len(rows)
+
+
+def test_window_with_removals_and_counters():
+    rng = np.random.default_rng(21)
+    buckets = TimeBucketedSummaries(ProportionSummary)
+    rows = _fill(buckets, rng, n=500, binary=True)
+    for variant, timestamp, value in rows[:100]:
+        buckets.remove(variant, timestamp, value)
+
+    window = buckets.window(3600.0, 3 * 86400.0)
+    kept = [row for row in rows[100:] if 3600.0 <= row[1] < 3 * 86400.0]
+    for variant in ModelVariant:
+        values = [v for var, _, v in kept if var == variant]
+        assert window[variant].trials == len(values)
+        assert window[variant].successes == sum(values)
+
+
+def test_resolutions_must_nest():
+    with pytest.raises(ValueError):
+        TimeBucketedSummaries(OutcomeSummary, (60, 90))
+
+
+# Segment values beyond the cap share one cell
+
+
+def test_segment_cap_and_cube():
+    from src.aggregates import OTHER_SEGMENT, SegmentCap, SegmentCube
+
+    cap = SegmentCap(max_values=2)
+    segments = {"country": "DE", "tier": "gold"}
+    assert cap.apply(segments) is segments
+    assert cap.apply({"country": "FR"}) == {"country": "FR"}
+    assert cap.apply({"country": "US", "tier": "gold"}) == {
+        "country": OTHER_SEGMENT,
+        "tier": "gold",
+    }
+    # Admission is permanent
+    assert cap.apply({"country": "DE"}) == {"country": "DE"}
+
+    cube = SegmentCube()
+    cube.add(ModelVariant.A, {"country": "DE", "tier": "gold"}, 1.0)
+    cube.add(ModelVariant.B, {"country": "DE"}, 3.0)
+    cube.add(ModelVariant.B, {"country": "DE"}, 5.0)
+    cube.remove(ModelVariant.B, {"country": "DE"}, 5.0)
+
+    assert set(cube.dimensions) == {"country", "tier"}
+    germany = cube.slice("country")["DE"]
+    assert (germany[ModelVariant.A].n, germany[ModelVariant.B].mean) == (1, 3.0)
+    assert cube.slice("platform") == {}
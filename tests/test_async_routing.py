@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from src.core import register_models_async, route_request_async
+from src.storage import InMemoryStorage
+
+# Artificial latency of the stub remote model
+LATENCY = 0.05
+
+
+def _stub_model(tag, state=None):
+    async def predict(x):
+        if state is not None:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(LATENCY)
+        if state is not None:
+            state["in_flight"] -= 1
+        return (tag, x)
+
+    return predict
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(use_storage):
+    # Keep these requests out of the shared module-level storage
+    return use_storage(InMemoryStorage())
+
+
+# Concurrent requests overlap their model latency on one event loop
+
+
+def test_async_routing_overlaps_model_latency(isolated_storage):
+    register_models_async(_stub_model("A"), _stub_model("B"))
+    n_requests = 500
+
+    async def main():
+        return await asyncio.gather(
+            *(route_request_async(i, 0.5) for i in range(n_requests))
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    # Sequential execution would take n_requests * LATENCY = 25s
+    assert elapsed < (n_requests * LATENCY) / 10
+
+    for i, ((tag, x), request_id) in enumerate(results):
+        assert x == i
+        assert isolated_storage.get_request(request_id).selected_model.value == tag
+
+
+# In-flight predictions never exceed the per-variant limit
+
+
+def test_async_routing_respects_concurrency_limit():
+    state = {"in_flight": 0, "peak": 0}
+    register_models_async(
+        _stub_model("A", state), _stub_model("B"), max_concurrency={"A": 5}
+    )
+
+    async def main():
+        await asyncio.gather(*(route_request_async(i, 1.0) for i in range(40)))
+
+    asyncio.run(main())
+
+    assert state["peak"] == 5
+
+
+# Slow models time out without blocking the other variant
+
+
+def test_async_routing_timeout():
+    async def too_slow(x):
+        await asyncio.sleep(1)
+
+    register_models_async(too_slow, _stub_model("B"), timeout={"A": 0.01})
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(route_request_async(1, 1.0))
+
+    (tag, _), _ = asyncio.run(route_request_async(1, 0.0))
+    assert tag == "B"
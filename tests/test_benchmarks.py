@@ -0,0 +1,52 @@
+from benchmarks.run import (
+    _format_overhead,
+    _format_report,
+    instrumentation_overhead,
+    run_benchmarks,
+)
+from src import core, instrumentation
+
+
+def test_benchmarks_report_every_operation():
+    previous = core.storage
+    report = run_benchmarks(sizes=[50], backends=["memory", "database"])
+
+    # The suite restores the module-level storage it swapped out
+    assert core.storage is previous
+    assert [(r["backend"], r["size"]) for r in report["results"]] == [
+        ("memory", 50),
+        ("database", 50),
+    ]
+    for result in report["results"]:
+        assert set(result["operations"]) == {
+            "route_request",
+            "record_delayed_outcome",
+            "compile_evidence",
+            "compute_statistics",
+        }
+        assert result["operations"]["route_request"]["calls"] == 50
+        assert result["peak_memory_bytes"] > 0
+        for operation in result["operations"].values():
+            latency = operation["latency_us"]
+            assert 0 <= latency["p50"] <= latency["p99"] <= latency["max"]
+
+    # Comparing a run with itself gives ratios of 1
+    assert "1.00x" in _format_report(report, baseline=report)
+
+
+def test_instrumentation_overhead_reports_every_mode():
+    previous = core.storage
+    overhead = instrumentation_overhead(size=200, repeats=1, backend="memory")
+
+    # Storage and instrumentation are left as they were found
+    assert core.storage is previous
+    assert not instrumentation.enabled
+    assert set(overhead) == {"off", "calls", "stages"}
+    assert "route_request_overhead_us" not in overhead["off"]
+    for mode in ("calls", "stages"):
+        assert overhead[mode]["route_request_us"] > 0
+        assert overhead[mode]["record_delayed_outcome_overhead_us"] == (
+            overhead[mode]["record_delayed_outcome_us"]
+            - overhead["off"]["record_delayed_outcome_us"]
+        )
+    assert _format_overhead(overhead).splitlines()[0].startswith("mode")
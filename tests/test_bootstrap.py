@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from src.bootstrap import (
+    PoissonBootstrap,
+    bootstrap_confidence_interval,
+    bootstrap_distribution,
+)
+from src.models import OutcomeSummary
+from src.statistics import compute_statistics
+
+
+# Results depend on the seed only, not on the number of worker processes
+
+
+@pytest.mark.parametrize("method", ["index", "poisson"])
+def test_bootstrap_is_deterministic_across_workers(method):
+    rng = np.random.default_rng(10)
+    arr1 = rng.exponential(1.0, 300)
+    arr2 = rng.exponential(1.2, 200)
+
+    inline = bootstrap_distribution(
+        arr1, arr2, n_resamples=600, seed=42, method=method, n_workers=1
+    )
+    pooled = bootstrap_distribution(
+        arr1, arr2, n_resamples=600, seed=42, method=method, n_workers=2
+    )
+
+    assert len(inline) == 600
+    assert np.allclose(inline, pooled)
+
+
+# The bootstrap interval agrees with Welch when the CLT applies
+
+
+@pytest.mark.parametrize("method", ["index", "poisson"])
+def test_bootstrap_interval_matches_welch_for_normal_data(method):
+    rng = np.random.default_rng(11)
+    arr1 = rng.normal(0.5, 0.1, 2000)
+    arr2 = rng.normal(0.52, 0.1, 2000)
+
+    welch = compute_statistics(arr1, arr2)
+    lower, upper = bootstrap_confidence_interval(
+        arr1, arr2, n_resamples=2000, seed=1, method=method
+    )
+
+    width = welch["ci_upper"] - welch["ci_lower"]
+    assert abs(lower - welch["ci_lower"]) < 0.1 * width
+    assert abs(upper - welch["ci_upper"]) < 0.1 * width
+
+
+# Feeding the Poisson bootstrap chunk by chunk equals one pass over all data
+
+
+def test_poisson_bootstrap_streams_chunks():
+    values = np.random.default_rng(12).lognormal(0.0, 1.5, 5000)
+
+    whole = PoissonBootstrap(n_resamples=500, seed=3)
+    whole.update(values)
+    streamed = PoissonBootstrap(n_resamples=500, seed=3)
+    for start in range(0, len(values), 777):
+        end = start + 777
+        streamed.update(values[start:end])
+
+    assert streamed.n == len(values)
+    assert np.allclose(whole.means, streamed.means)
+    # Poisson(1) weights keep the resampled means centred on the sample mean
+    assert abs(np.mean(whole.means) - values.mean()) < 0.05 * values.mean()
+
+
+def test_compute_statistics_bootstrap_option():
+    rng = np.random.default_rng(13)
+    arr1 = rng.exponential(1.0, 500)
+    arr2 = rng.exponential(1.5, 500)
+
+    results = compute_statistics(
+        arr1, arr2, ci_method="bootstrap", n_resamples=1000, seed=5
+    )
+    assert results["ci_lower"] < results["delta"] < results["ci_upper"]
+    assert results == compute_statistics(
+        arr1, arr2, ci_method="bootstrap", n_resamples=1000, seed=5
+    )
+
+    with pytest.raises(ValueError):
+        compute_statistics(
+            OutcomeSummary.from_values(arr1),
+            OutcomeSummary.from_values(arr2),
+            ci_method="bootstrap",
+        )
+    with pytest.raises(ValueError):
+        compute_statistics(arr1, arr2, ci_method="jackknife")
@@ -0,0 +1,193 @@
+import pytest
+from sqlalchemy import event
+
+from src.core import (
+    compile_evidence,
+    create_experiment,
+    drop_experiment,
+    record_delayed_outcome,
+    register_models,
+    registry,
+    route_request,
+)
+from src.database import get_engine, get_session_factory, init_db
+from src.db_models import DBExperiments
+from src.experiments import ExperimentRegistry, config_from_db
+from src.models import ExperimentConfig, ModelVariant, Request
+from src.storage import DatabaseStorage
+
+
+def _config(
+    experiment_id, traffic_split=0.5, confidence_level=0.95, metric_type="continuous"
+):
+    return ExperimentConfig(
+        experiment_id=experiment_id,
+        model_a_id="model-a",
+        model_b_id="model-b",
+        traffic_split=traffic_split,
+        confidence_level=confidence_level,
+        metric_type=metric_type,
+        status="running",
+    )
+
+
+@pytest.fixture
+def experiments():
+    created = []
+
+    def create(*args, **kwargs):
+        experiment = create_experiment(_config(*args, **kwargs))
+        created.append(experiment.experiment_id)
+        return experiment
+
+    yield create
+    for experiment_id in created:
+        if experiment_id in registry:
+            drop_experiment(experiment_id)
+
+
+# Routing, outcomes and evidence are scoped to one experiment
+
+
+def test_experiments_are_isolated(experiments):
+    checkout = experiments("checkout", traffic_split=1.0)
+    search = experiments("search", confidence_level=0.9)
+
+    register_models(lambda x: "checkout-A", lambda x: "checkout-B", "checkout")
+    register_models(lambda x: "search-A", lambda x: "search-B", "search")
+
+    for i in range(10):
+        prediction, request_id = route_request(i, experiment_id="checkout")
+        assert prediction == "checkout-A"
+        record_delayed_outcome(request_id, 1.0, experiment_id="checkout")
+
+        prediction, request_id = route_request(i, 0.5, experiment_id="search")
+        assert prediction.startswith("search-")
+        record_delayed_outcome(request_id, float(i), experiment_id="search")
+
+        # An id from one experiment is unknown to the other
+        with pytest.raises(ValueError):
+            record_delayed_outcome(request_id, 1.0, experiment_id="checkout")
+
+    assert checkout.storage.get_variant_summary(ModelVariant.A).n == 10
+    assert checkout.storage.get_variant_summary(ModelVariant.B).n == 0
+    assert sum(s.n for s in search.storage.get_variant_summaries().values()) == 10
+
+    assert compile_evidence("checkout") == "Not enough data to compute statistics."
+
+
+# Evidence uses the experiment's confidence level
+
+
+def test_experiment_confidence_level(experiments):
+    experiments("pricing", confidence_level=0.9)
+    register_models(lambda x: x, lambda x: x, "pricing")
+
+    for i in range(40):
+        _, request_id = route_request(i, unit_key=i, experiment_id="pricing")
+        record_delayed_outcome(request_id, float(i % 7), experiment_id="pricing")
+
+    evidence = compile_evidence("pricing")
+    assert "90% Confidence Interval" in evidence
+
+
+# Dropping an experiment removes it and its data
+
+
+def test_drop_experiment(experiments):
+    experiments("ranking")
+    register_models(lambda x: x, lambda x: x, "ranking")
+    route_request(1, experiment_id="ranking")
+
+    dropped = drop_experiment("ranking")
+    assert len(dropped.storage.requests) == 1
+    assert "ranking" not in registry
+
+    with pytest.raises(ValueError):
+        route_request(1, experiment_id="ranking")
+    with pytest.raises(ValueError):
+        drop_experiment("ranking")
+
+
+# Persisted experiment rows convert to runtime configs
+
+
+def test_config_from_db():
+    row = DBExperiments(
+        experiment_id="exp",
+        model_a_id="a",
+        model_b_id="b",
+        probability_split=0.3,
+        metric_type="binary",
+        confidence_level=0.99,
+        status="running",
+    )
+    config = config_from_db(row)
+
+    assert config.traffic_split == 0.3
+    assert config.metric_type == "binary"
+    assert config.confidence_level == 0.99
+
+
+# Database-backed experiments satisfy the requests -> experiments foreign key
+
+
+def test_database_experiment_rows_are_created():
+    engine = get_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _enforce_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    init_db(engine)
+    session_factory = get_session_factory(engine)
+    registry = ExperimentRegistry(
+        lambda eid: DatabaseStorage(session_factory, experiment_id=eid)
+    )
+    experiment = registry.create(_config("persisted"))
+    storage = experiment.storage
+
+    storage.save_request(Request(1, ModelVariant.A, None, 0.0))
+    storage.flush()
+    assert storage.get_request(1).selected_model == ModelVariant.A
+    with session_factory() as session:
+        assert session.get(DBExperiments, "persisted") is not None
+
+    # A second storage for the same experiment reuses the row
+    DatabaseStorage(session_factory, experiment_id="persisted").close()
+    storage.close()
+
+
+# Binary experiments aggregate counters and report a proportion test
+
+
+def test_binary_experiment_evidence(experiments):
+    from src.models import ProportionSummary
+
+    experiment = experiments("signup", metric_type="binary")
+    register_models(lambda x: x, lambda x: x, experiment_id="signup")
+
+    for i in range(200):
+        _, request_id = route_request(i, experiment_id="signup")
+        record_delayed_outcome(request_id, float(i % 5 == 0), experiment_id="signup")
+
+    with pytest.raises(ValueError):
+        record_delayed_outcome(request_id, 3.0, experiment_id="signup")
+
+    summaries = experiment.storage.get_variant_summaries()
+    assert isinstance(summaries[ModelVariant.A], ProportionSummary)
+    assert sum(summary.successes for summary in summaries.values()) == 40
+
+    evidence = compile_evidence(experiment_id="signup")
+    assert 0 <= evidence["Model A Mean Outcome"] <= 1
+    assert 0 <= evidence["Two-Proportion z-test p-value"] <= 1
+
+    # A bootstrap only replaces the interval; the counter-based results stay
+    bootstrapped = compile_evidence(experiment_id="signup", ci_method="bootstrap")
+    interval = "95% Confidence Interval"
+    assert {**bootstrapped, interval: None} == {**evidence, interval: None}
+    lower, upper = bootstrapped[interval]
+    assert lower <= bootstrapped["Difference in Means (B - A)"] <= upper
+    for value in bootstrapped.values():
+        values = value if isinstance(value, tuple) else (value,)
+        assert all(type(v) in (float, int) for v in values)
@@ -0,0 +1,90 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from src import ids
+from src.ids import IdGenerator
+
+# Ids increase strictly and encode their generation time and node
+
+
+def test_ids_are_time_ordered():
+    generator = IdGenerator(node_id=5)
+    before = time.time()
+    request_ids = [generator.next_id() for _ in range(10_000)]
+    request_ids += generator.next_ids(10_000)
+    after = time.time()
+
+    assert all(a < b for a, b in zip(request_ids, request_ids[1:]))
+    assert all(0 < request_id < 2**63 for request_id in request_ids)
+    assert ids.node_of(request_ids[0]) == ids.node_of(request_ids[-1]) == 5
+    # Bursts above 4096 ids/ms may borrow a few milliseconds ahead
+    assert before - 0.001 <= ids.timestamp_of(request_ids[0])
+    assert ids.timestamp_of(request_ids[-1]) <= after + 0.1
+    assert ids.min_id_at(before - 0.001) <= request_ids[0]
+
+    with pytest.raises(ValueError):
+        IdGenerator(node_id=1024)
+
+
+# Concurrent generation never hands out an id twice
+
+
+def test_ids_are_unique_across_threads():
+    generator = IdGenerator()
+    results = []
+
+    def worker():
+        results.append([generator.next_id() for _ in range(5_000)])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    combined = [request_id for part in results for request_id in part]
+    assert len(set(combined)) == len(combined)
+    for part in results:
+        assert part == sorted(part)
+
+
+# Forked workers are reseeded and never collide with each other or the parent
+
+
+def _generate(queue):
+    queue.put([ids.new_id() for _ in range(2_000)] + ids.new_ids(2_000))
+
+
+def test_forked_workers_get_distinct_node_ids():
+    fork = multiprocessing.get_context("fork")
+    # Advance the parent's sequence state so the children inherit it
+    parent_ids = ids.new_ids(5_000)
+    queue = fork.Queue()
+    processes = [fork.Process(target=_generate, args=(queue,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    parent_ids += [ids.new_id() for _ in range(2_000)]
+    results = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    combined = parent_ids + [request_id for part in results for request_id in part]
+    assert len(set(combined)) == len(combined)
+    nodes = {ids.node_of(part[0]) for part in results}
+    assert len(nodes) == len(processes)
+    assert ids.node_of(parent_ids[-1]) not in nodes
+
+
+def test_set_node_id():
+    previous = ids._generator.node_id
+    try:
+        ids.set_node_id(7)
+        assert ids.node_of(ids.new_id()) == 7
+        with pytest.raises(ValueError):
+            ids.set_node_id(1024)
+    finally:
+        ids.set_node_id(previous)
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from src import core
+from src.ingest import iter_outcome_chunks, load_outcomes
+from src.models import ModelVariant
+from src.storage import InMemoryStorage
+
+
+@pytest.fixture
+def routed(use_storage):
+    # Fresh storage with 100 routed requests
+    use_storage(InMemoryStorage(columnar=True))
+    core.register_models(lambda x: x, lambda x: x)
+    _, request_ids = core.route_requests(list(range(100)), 0.5)
+    return request_ids
+
+
+# record_delayed_outcomes counts what it could not attribute
+
+
+def test_record_delayed_outcomes(routed):
+    counts = core.record_delayed_outcomes(routed + ["unknown"], [1.0] * 101)
+
+    assert counts == {"recorded": 100, "late": 0, "unknown": 1}
+    summaries = core.storage.get_variant_summaries()
+    assert sum(summary.n for summary in summaries.values()) == 100
+
+
+# JSONL and CSV files are streamed in bounded chunks
+
+
+@pytest.mark.parametrize("file_format", ["jsonl", "csv"])
+def test_load_outcome_file(routed, tmp_path, file_format):
+    path = tmp_path / f"outcomes.{file_format}"
+    with open(path, "w") as handle:
+        if file_format == "csv":
+            handle.write("request_id,outcome\n")
+        for i, request_id in enumerate(routed):
+            if file_format == "csv":
+                handle.write(f"{request_id},{i}\n")
+            else:
+                handle.write(json.dumps({"request_id": request_id, "outcome": i}))
+                handle.write("\n")
+
+    chunks = list(iter_outcome_chunks(str(path), chunk_size=30))
+    assert [len(ids) for ids, _ in chunks] == [30, 30, 30, 10]
+
+    totals = load_outcomes(str(path), chunk_size=30)
+    assert totals == {"recorded": 100, "late": 0, "unknown": 0}
+
+    values = core.storage.get_outcomes_by_variant(
+        ModelVariant.A
+    ) + core.storage.get_outcomes_by_variant(ModelVariant.B)
+    assert sorted(values) == [float(i) for i in range(100)]
@@ -0,0 +1,104 @@
+import pytest
+
+from src import instrumentation
+from src.core import (
+    record_delayed_outcome,
+    record_delayed_outcomes,
+    register_models,
+    route_request,
+    route_requests,
+)
+from src.storage import InMemoryStorage
+
+
+@pytest.fixture
+def instrumented(use_storage):
+    storage = use_storage(InMemoryStorage())
+    register_models(lambda x: x, lambda x: x)
+    instrumentation.reset()
+    instrumentation.enable()
+    yield storage
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_stage_latencies_and_counters(instrumented):
+    instrumentation.enable(stages=True)
+    request_ids = [route_request(i, probability_split=0.5)[1] for i in range(30)]
+    for request_id in request_ids[:20]:
+        record_delayed_outcome(request_id, 1.0)
+    with pytest.raises(ValueError):
+        record_delayed_outcome("missing", 1.0)
+    record_delayed_outcomes(request_ids[20:] + ["missing"], [1.0] * 11)
+
+    snapshot = instrumentation.snapshot()
+
+    assert set(snapshot["route"]) == {"id", "assign", "save_request", "model", "total"}
+    assert set(snapshot["record"]) == {"lookup", "save_outcome", "total"}
+    for stage in snapshot["route"].values():
+        assert stage["count"] == 30
+        assert stage["buckets"][-1] == (float("inf"), 30)
+    for stage in snapshot["record"].values():
+        assert stage["count"] == 20
+    total = snapshot["route"]["total"]
+    assert 0 < total["p50_seconds"] <= total["p99_seconds"]
+    # The total spans all stages
+    assert total["sum_seconds"] == pytest.approx(
+        sum(snapshot["route"][s]["sum_seconds"] for s in ("id", "assign", "model"))
+        + snapshot["route"]["save_request"]["sum_seconds"]
+    )
+
+    assert sum(snapshot["requests_routed"].values()) == 30
+    # Bulk outcomes are counted per variant like single ones
+    routed_a = sum(
+        instrumented.get_request(request_id).selected_model.value == "A"
+        for request_id in request_ids
+    )
+    assert snapshot["outcomes_recorded"] == {"A": routed_a, "B": 30 - routed_a}
+    assert snapshot["orphan_outcomes"] == {"unknown": 2, "late": 0}
+
+
+def test_prometheus_export(instrumented):
+    route_requests([1, 2, 3], probability_split=1.0)
+    request_id = route_request(1, probability_split=1.0)[1]
+    record_delayed_outcome(request_id, 1.0)
+
+    text = instrumentation.export_prometheus()
+
+    assert "# TYPE krisis_route_stage_seconds histogram" in text
+    assert 'krisis_route_stage_seconds_bucket{stage="total",le="+Inf"} 1' in text
+    assert 'krisis_record_stage_seconds_count{stage="total"} 1' in text
+    assert 'krisis_requests_routed_total{variant="A"} 4' in text
+    assert 'krisis_outcomes_recorded_total{variant="A"} 1' in text
+
+
+# Without stage timing only the whole call is timed
+
+
+def test_call_latency_without_stage_timing(instrumented):
+    request_ids = [route_request(i, probability_split=0.5)[1] for i in range(30)]
+    for request_id in request_ids[:20]:
+        record_delayed_outcome(request_id, 1.0)
+
+    snapshot = instrumentation.snapshot()
+
+    assert snapshot["route"]["total"]["count"] == 30
+    assert snapshot["route"]["total"]["sum_seconds"] > 0
+    assert snapshot["route"]["model"]["count"] == 0
+    assert snapshot["record"]["total"]["count"] == 20
+    assert snapshot["record"]["lookup"]["count"] == 0
+    assert sum(snapshot["requests_routed"].values()) == 30
+    assert set(snapshot["requests_routed"]) <= {"A", "B"}
+    assert sum(snapshot["outcomes_recorded"].values()) == 20
+
+
+def test_disabled_instrumentation_records_nothing(instrumented):
+    instrumentation.disable()
+    request_id = route_request(1, probability_split=0.5)[1]
+    record_delayed_outcome(request_id, 1.0)
+
+    snapshot = instrumentation.snapshot()
+
+    assert snapshot["enabled"] is False
+    assert snapshot["route"]["total"]["count"] == 0
+    assert snapshot["requests_routed"] == {}
@@ -55,3 +55,121 @@ def test_system_integrates_end_to_end():
     # Counts should be sane
     assert evidence["Number of Outcomes for Model A"] >= 0
     assert evidence["Number of Outcomes for Model B"] >= 0
+
+
+def test_metric_evidence_end_to_end(use_storage):
+    from src.core import compile_metric_evidence
+    from src.storage import InMemoryStorage
+
+    use_storage(InMemoryStorage())
+    register_models(lambda x: x, lambda x: x)
+    for i in range(40):
+        _, req_id = route_request(i, probability_split=0.5)
+        metrics = {"click": float(i % 2), "revenue": float(i)}
+        if i < 2:
+            metrics["retention"] = 1.0
+        record_delayed_outcome(req_id, 1.0, metrics=metrics)
+
+    evidence = compile_metric_evidence()
+
+    assert set(evidence) == {"click", "revenue", "retention"}
+    assert isinstance(evidence["revenue"], dict)
+    assert "95% Confidence Interval" in evidence["click"]
+    assert evidence["retention"] == "Not enough data to compute statistics."
+
+
+def test_windowed_evidence_and_trend(use_storage):
+    import pytest
+    from src.aggregates import DEFAULT_RESOLUTIONS
+    from src.core import compile_evidence_trend
+    from src.models import Outcome
+    from src.storage import InMemoryStorage
+
+    storage = use_storage(InMemoryStorage(time_buckets=DEFAULT_RESOLUTIONS))
+    register_models(lambda x: x, lambda x: x)
+    for i in range(200):
+        _, req_id = route_request(i, probability_split=0.5)
+        # First day: no difference; second day: B is better
+        day = i % 2
+        is_b = storage.get_request(req_id).selected_model.value == "B"
+        value = 1.0 + day * is_b
+        storage.save_outcome(Outcome(req_id, value + (i % 7) / 10, day * 86400.0))
+
+    first_day = compile_evidence(start=0.0, end=86400.0)
+    trend = compile_evidence_trend(0.0, 2 * 86400.0)
+
+    assert abs(first_day["Difference in Means (B - A)"]) < 0.3
+    assert [window_start for window_start, _ in trend] == [0.0, 86400.0]
+    assert trend[0][1] == first_day
+    assert trend[1][1]["Difference in Means (B - A)"] > 0.7
+
+    # Time buckets are opt-in; without them windows are refused
+    use_storage(InMemoryStorage())
+    with pytest.raises(ValueError, match="time_buckets"):
+        compile_evidence(start=0.0, end=86400.0)
+    with pytest.raises(ValueError, match="time_buckets"):
+        compile_evidence_trend(0.0, 2 * 86400.0)
+
+
+def test_segment_evidence_end_to_end(use_storage):
+    import numpy as np
+    from src.core import compile_segment_evidence, route_requests
+    from src.storage import InMemoryStorage
+
+    storage = use_storage(InMemoryStorage())
+    register_models(lambda x: x, lambda x: x)
+    segments = [{"country": "DE" if i % 2 else "FR"} for i in range(200)]
+    segments[0] = {"country": "US"}
+    _, request_ids = route_requests(
+        np.arange(200), probability_split=0.5, segments=segments
+    )
+    for i, req_id in enumerate(request_ids):
+        # B is only better in DE
+        is_b = storage.get_request(req_id).selected_model.value == "B"
+        value = 1.0 + (i % 2) * is_b + (i % 5) / 10
+        record_delayed_outcome(req_id, value)
+
+    evidence = compile_segment_evidence("country")
+
+    assert set(evidence) == {"DE", "FR", "US"}
+    assert evidence["DE"]["Difference in Means (B - A)"] > 0.7
+    assert abs(evidence["FR"]["Difference in Means (B - A)"]) < 0.3
+    assert evidence["US"] == "Not enough data to compute statistics."
+
+
+def test_cuped_evidence_end_to_end(use_storage):
+    import numpy as np
+    import pytest
+    from src.storage import InMemoryStorage
+
+    use_storage(InMemoryStorage())
+    register_models(lambda x: x, lambda x: x)
+    rng = np.random.default_rng(13)
+    pre_period = rng.exponential(20, 400)
+    for covariate in pre_period:
+        _, req_id = route_request(None, probability_split=0.5, covariate=covariate)
+        record_delayed_outcome(req_id, covariate + rng.normal(0, 2))
+
+    raw = compile_evidence()
+    adjusted = compile_evidence(cuped=True)
+    with pytest.raises(ValueError):
+        compile_evidence(cuped=True, ci_method="bootstrap")
+
+    def width(evidence):
+        lower, upper = evidence["95% Confidence Interval"]
+        return upper - lower
+
+    assert adjusted["CUPED Variance Reduction"] > 0.9
+    assert width(adjusted) < width(raw) / 3
+    assert (
+        adjusted["Number of Outcomes for Model A"]
+        + adjusted["Number of Outcomes for Model B"]
+        == 400
+    )
+
+    # Every path reports plain Python numbers
+    bootstrapped = compile_evidence(ci_method="bootstrap")
+    for evidence in (raw, adjusted, bootstrapped):
+        for value in evidence.values():
+            values = value if isinstance(value, tuple) else (value,)
+            assert all(type(v) in (float, int) for v in values)
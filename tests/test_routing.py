@@ -34,3 +34,105 @@ def test_assignment_distribution_approximately_balanced():
 
     # Allow randomness, but should be close to 50%
     assert 0.40 <= ratio_a <= 0.60
+
+
+# Test 5: Hash-based routing is deterministic per unit
+
+
+def test_unit_key_routing_is_deterministic():
+    from src.routing import assign_variant
+
+    def model_a(x):
+        return "A"
+
+    def model_b(x):
+        return "B"
+
+    register_models(model_a, model_b)
+
+    for user in range(200):
+        key = f"user-{user}"
+        first, _ = route_request(1, 0.5, unit_key=key)
+        second, _ = route_request(1, 0.5, unit_key=key)
+
+        assert first == second == assign_variant(key, 0.5).value
+
+
+# Test 6: Hash-based routing respects the split
+
+
+def test_unit_key_assignment_distribution():
+    from src.routing import get_bucket_table
+
+    table = get_bucket_table(0.3, salt="exp-1")
+    count_a = sum(table.assign(f"user-{i}") == ModelVariant.A for i in range(20_000))
+
+    assert 0.28 <= count_a / 20_000 <= 0.32
+
+
+# Test 7: Ramping the split only moves the buckets between the cutoffs
+
+
+def test_ramp_moves_only_required_units():
+    from src.routing import BucketTable
+
+    before = BucketTable(0.5, salt="exp-1")
+    after = BucketTable(0.6, salt="exp-1")
+
+    moved = 0
+    for i in range(20_000):
+        old, new = before.assign(i), after.assign(i)
+        if old != new:
+            # Ramping towards A can only move units from B to A
+            assert old == ModelVariant.B and new == ModelVariant.A
+            assert before.bucket(i) in before.moved_buckets(after)
+            moved += 1
+
+    assert len(before.moved_buckets(after)) == 1000
+    assert 0.08 <= moved / 20_000 <= 0.12
+
+
+# Test 8: Batch routing calls each model once and keeps input order
+
+
+def test_batch_routing_preserves_order():
+    import numpy as np
+    from src.core import route_requests
+
+    calls = {"A": 0, "B": 0}
+
+    def model_a(batch):
+        calls["A"] += 1
+        return batch + 1
+
+    def model_b(batch):
+        calls["B"] += 1
+        return batch * 10.0
+
+    register_models(model_a, model_b)
+
+    X_batch = np.arange(1000)
+    predictions, request_ids = route_requests(X_batch, 0.5)
+
+    assert calls == {"A": 1, "B": 1}
+    assert len(set(request_ids)) == 1000
+
+    for x, prediction, request_id in zip(X_batch, predictions, request_ids):
+        variant = storage.get_request(request_id).selected_model
+        expected = x + 1 if variant == ModelVariant.A else x * 10.0
+        assert prediction == expected
+
+
+# Test 9: Batch routing with unit keys matches single-request routing
+
+
+def test_batch_routing_with_unit_keys():
+    from src.core import route_requests
+    from src.routing import assign_variant
+
+    register_models(lambda batch: ["A"] * len(batch), lambda batch: ["B"] * len(batch))
+
+    keys = [f"user-{i}" for i in range(300)]
+    predictions, _ = route_requests(list(range(300)), 0.2, unit_keys=keys)
+
+    assert list(predictions) == [assign_variant(k, 0.2).value for k in keys]
@@ -0,0 +1,141 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from src.models import ModelVariant, Outcome, Request
+from src.shared import SharedSummaries
+from src.storage import ConcurrentInMemoryStorage, InMemoryStorage
+
+fork = multiprocessing.get_context("fork")
+
+
+def _values(worker, n=200):
+    # Outcomes recorded by one worker: variant A for even rows, B for odd
+    return np.random.default_rng(worker).normal(loc=worker, size=n)
+
+
+def _record(shared, worker, metric_type="continuous", columnar=False):
+    # Worker process body: record outcomes one by one and in bulk
+    storage = InMemoryStorage(columnar=columnar, metric_type=metric_type, shared=shared)
+    values = _values(worker)
+    if metric_type == "binary":
+        values = (values > worker).astype(float)
+    request_ids = list(range(worker * 1000, worker * 1000 + len(values)))
+    now = time.time()
+    storage.save_requests(
+        [
+            Request(request_id, ModelVariant.B if i % 2 else ModelVariant.A, i, now)
+            for i, request_id in enumerate(request_ids)
+        ]
+    )
+    half = len(values) // 2
+    for request_id, value in zip(request_ids[:half], values[:half]):
+        storage.save_outcome(Outcome(request_id, float(value), now))
+    storage.save_outcomes(request_ids[half:], values[half:], now)
+
+
+def _expected(workers, metric_type="continuous"):
+    storage = InMemoryStorage(metric_type=metric_type)
+    for worker in workers:
+        values = _values(worker)
+        if metric_type == "binary":
+            values = (values > worker).astype(float)
+        for i, value in enumerate(values):
+            storage.summaries[ModelVariant.B if i % 2 else ModelVariant.A].update(
+                float(value)
+            )
+    return storage.summaries
+
+
+def _run(shared, workers, **options):
+    processes = [
+        fork.Process(target=_record, args=(shared, worker), kwargs=options)
+        for worker in workers
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+@pytest.fixture
+def shared():
+    shared = SharedSummaries(slots=8)
+    yield shared
+    shared.close()
+    shared.unlink()
+
+
+# Summaries recorded by several worker processes are merged by any reader
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_workers_are_merged(shared, columnar):
+    _run(shared, [1, 2, 3], columnar=columnar)
+
+    expected = _expected([1, 2, 3])
+    reader = InMemoryStorage(shared=shared)
+    merged = reader.get_variant_summaries()
+    for variant in ModelVariant:
+        assert merged[variant].n == expected[variant].n
+        assert merged[variant].mean == pytest.approx(expected[variant].mean)
+        assert merged[variant].m2 == pytest.approx(expected[variant].m2)
+    assert reader.get_variant_summary(ModelVariant.A).n == expected[ModelVariant.A].n
+
+    attached = SharedSummaries.attach(shared.name)
+    try:
+        assert attached.read()[ModelVariant.B].n == expected[ModelVariant.B].n
+    finally:
+        attached.close()
+
+
+# The slot of an exited worker is reused and its outcomes are kept
+
+
+def test_exited_worker_slot_is_reused():
+    shared = SharedSummaries(slots=1)
+    try:
+        _run(shared, [1])
+        _run(shared, [2])
+
+        expected = _expected([1, 2])
+        merged = shared.read()
+        for variant in ModelVariant:
+            assert merged[variant].n == expected[variant].n
+            assert merged[variant].mean == pytest.approx(expected[variant].mean)
+
+        # The only slot now belongs to a live process
+        shared.claim()
+        with pytest.raises(RuntimeError):
+            shared.claim()
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_binary_metric():
+    shared = SharedSummaries(slots=4, metric_type="binary")
+    try:
+        _run(shared, [1, 2], metric_type="binary")
+        expected = _expected([1, 2], metric_type="binary")
+        merged = shared.read()
+        for variant in ModelVariant:
+            assert merged[variant].successes == expected[variant].successes
+            assert merged[variant].trials == expected[variant].trials
+
+        with pytest.raises(ValueError):
+            InMemoryStorage(shared=shared)
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+# Shards of a ConcurrentInMemoryStorage cannot share one process slot
+
+
+def test_concurrent_storage_rejects_shared(shared):
+    with pytest.raises(ValueError):
+        ConcurrentInMemoryStorage(num_shards=4, shared=shared)
@@ -0,0 +1,157 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.models import ModelVariant, Outcome, Request
+from src.snapshot import FORMAT_VERSION, load_snapshot, save_snapshot
+from src.storage import InMemoryStorage
+
+
+# A restored storage reports the same requests, outcomes and aggregates
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_snapshot_round_trip(tmp_path, columnar, populate):
+    storage = InMemoryStorage(columnar=columnar, chunk_size=64)
+    request_ids = populate(storage)
+    path = str(tmp_path / "state.snap")
+    save_snapshot(storage, path)
+    restored = load_snapshot(path)
+
+    assert len(restored.requests) == len(request_ids)
+    assert len(restored.outcomes) == len(request_ids)
+    for request_id in request_ids[::37]:
+        before, after = storage.get_request(request_id), restored.get_request(
+            request_id
+        )
+        assert after.selected_model == before.selected_model
+        assert after.timestamp == before.timestamp
+        assert after.covariate == before.covariate
+        assert after.segments == before.segments
+        assert restored.outcomes[request_id].outcome_value == pytest.approx(
+            storage.outcomes[request_id].outcome_value
+        )
+        assert (
+            restored.outcomes[request_id].metrics
+            == storage.outcomes[request_id].metrics
+        )
+    for variant in ModelVariant:
+        expected = storage.get_variant_summary(variant)
+        summary = restored.get_variant_summary(variant)
+        assert (summary.n, summary.mean, summary.m2) == (
+            expected.n,
+            expected.mean,
+            expected.m2,
+        )
+        assert sorted(restored.get_outcomes_by_variant(variant)) == pytest.approx(
+            sorted(storage.get_outcomes_by_variant(variant))
+        )
+    assert restored.get_segment_summaries("country").keys() == {"DE", "FR"}
+    assert restored.get_metric_summaries()[ModelVariant.A].names == ("clicks",)
+    assert restored.get_request(-1) is None and -1 not in restored.requests
+
+    # Overwriting a restored outcome backs its segments and metrics out of
+    # the aggregates, exactly as in the original storage
+    for target in (storage, restored):
+        target.save_outcome(Outcome(request_ids[20], 5.0, time.time()))
+        target.save_outcomes(request_ids[30:40], np.full(10, 2.0), time.time())
+    for value in ("DE", "FR"):
+        for variant in ModelVariant:
+            expected = storage.get_segment_summaries("country")[value][variant]
+            summary = restored.get_segment_summaries("country")[value][variant]
+            assert summary.n == expected.n
+            assert summary.mean == pytest.approx(expected.mean)
+    for variant in ModelVariant:
+        expected = storage.get_metric_summaries()[variant]
+        summary = restored.get_metric_summaries()[variant]
+        assert summary.n == expected.n
+        assert summary.mean == pytest.approx(expected.mean)
+
+
+# The restored storage keeps accepting writes, and can be snapshot again
+
+
+def test_restored_storage_is_writable(tmp_path, populate):
+    storage = InMemoryStorage(columnar=True, chunk_size=64)
+    request_ids = populate(storage)
+    path = str(tmp_path / "state.snap")
+    save_snapshot(storage, path)
+    restored = load_snapshot(path)
+
+    # Overwrite restored outcomes, in bulk and one by one
+    unknown = restored.save_outcomes(request_ids[:10] + [-1], np.ones(11), time.time())
+    assert unknown == [-1]
+    restored.save_outcome(Outcome(request_ids[10], 2.0, time.time()))
+    # Log and resolve new requests
+    new_id = max(request_ids) + 1
+    restored.save_request(Request(new_id, ModelVariant.A, None, time.time()))
+    restored.save_outcome(Outcome(new_id, 3.0, time.time()))
+
+    assert restored.outcomes[request_ids[0]].outcome_value == 1.0
+    assert restored.outcomes[request_ids[10]].outcome_value == 2.0
+    assert restored.outcomes[new_id].outcome_value == 3.0
+    summaries = restored.get_variant_summaries()
+    assert sum(summary.n for summary in summaries.values()) == len(request_ids) + 1
+    for variant in ModelVariant:
+        values = restored.get_outcomes_by_variant(variant)
+        assert summaries[variant].mean == pytest.approx(np.mean(values))
+
+    del restored.requests[request_ids[20]]
+    assert request_ids[20] not in restored.requests
+
+    # Writes go to private pages, not to the file
+    assert load_snapshot(path).outcomes[request_ids[0]].outcome_value != 1.0
+
+    save_snapshot(restored, path)
+    again = load_snapshot(path)
+    assert len(again.requests) == len(request_ids)
+    assert again.outcomes[new_id].outcome_value == 3.0
+    assert again.get_request(request_ids[20]) is None
+    assert again.get_request(request_ids[31]).segments == {"country": "DE"}
+    assert again.outcomes[request_ids[31]].metrics == {"clicks": 1.0}
+
+
+# Restored requests keep expiring from the attribution window
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_restored_requests_are_evicted(tmp_path, columnar):
+    storage = InMemoryStorage(columnar=columnar, attribution_window=100.0)
+    # Requests 1-50 are resolved right away; by t=200 those of 51-99 have
+    # left the window, 100-200 are still pending
+    for request_id in range(1, 201):
+        storage.save_request(
+            Request(request_id, ModelVariant.A, None, float(request_id))
+        )
+        if request_id <= 50:
+            storage.save_outcome(Outcome(request_id, 1.0, float(request_id)))
+    evicted = storage.metrics["evicted_requests"]
+    assert 0 < evicted < 150 and 60 not in storage.requests
+    path = str(tmp_path / "state.snap")
+    save_snapshot(storage, path)
+    restored = load_snapshot(path)
+
+    assert restored.is_late_outcome(60)
+    assert 150 in restored.requests
+    # Far enough ahead for every pending request to leave the window
+    restored.save_request(Request(201, ModelVariant.B, None, 310.0))
+    assert restored.metrics["evicted_requests"] == 150
+    assert 150 not in restored.requests and restored.is_late_outcome(150)
+    assert len(restored.requests) == 51
+    assert restored.outcomes[1].outcome_value == 1.0
+
+
+def test_snapshot_rejects_unsupported_input(tmp_path):
+    path = str(tmp_path / "state.snap")
+    storage = InMemoryStorage()
+    storage.save_request(Request("r1", ModelVariant.A, None, time.time()))
+    with pytest.raises(ValueError):
+        save_snapshot(storage, path)
+
+    save_snapshot(InMemoryStorage(), path)
+    with open(path, "r+b") as handle:
+        handle.seek(8)
+        handle.write((FORMAT_VERSION + 1).to_bytes(4, "little"))
+    with pytest.raises(ValueError):
+        load_snapshot(path)
@@ -179,3 +179,227 @@ def test_effect_size():
     pooled_std = pooled_var**0.5
 
     assert abs(effect_size - ((mean_B - mean_A) / pooled_std)) < 1e-9
+
+
+# Testing compute_statistics() with running summaries
+
+
+def test_compute_statistics_accepts_summaries():
+    import numpy as np
+    from src.models import OutcomeSummary
+    from src.statistics import compute_statistics
+
+    arr1 = np.random.normal(loc=0.5, scale=0.1, size=50).tolist()
+    arr2 = np.random.normal(loc=0.6, scale=0.1, size=60).tolist()
+
+    from_lists = compute_statistics(arr1, arr2)
+    from_summaries = compute_statistics(
+        OutcomeSummary.from_values(arr1), OutcomeSummary.from_values(arr2)
+    )
+
+    for key, value in from_lists.items():
+        assert abs(from_summaries[key] - value) < 1e-9
+
+
+# Testing sequential (always-valid) inference under continuous monitoring
+
+
+def _peeking_rejections(sequential, n_simulations=200, n_looks=40, batch=25):
+    import numpy as np
+    from src.models import OutcomeSummary
+    from src.statistics import compute_statistics
+
+    rng = np.random.default_rng(7)
+    rejected = 0
+    for _ in range(n_simulations):
+        a = rng.normal(0.5, 0.1, n_looks * batch)
+        b = rng.normal(0.5, 0.1, n_looks * batch)
+        for look in range(1, n_looks + 1):
+            n = look * batch
+            results = compute_statistics(
+                OutcomeSummary.from_sums(n, a[:n].sum(), (a[:n] ** 2).sum()),
+                OutcomeSummary.from_sums(n, b[:n].sum(), (b[:n] ** 2).sum()),
+                sequential=sequential,
+            )
+            if sequential:
+                significant = results["always_valid_p_value"] <= 0.05
+            else:
+                significant = not results["ci_lower"] <= 0 <= results["ci_upper"]
+            if significant:
+                rejected += 1
+                break
+    return rejected / n_simulations
+
+
+def test_sequential_controls_false_positives_under_peeking():
+    # Peeking at the fixed-horizon interval inflates false positives well
+    # beyond 5%, while the always-valid p-value keeps them below alpha
+    assert _peeking_rejections(sequential=False) > 0.1
+    assert _peeking_rejections(sequential=True) <= 0.05
+
+
+def test_sequential_detects_real_effect():
+    import numpy as np
+    from src.statistics import compute_statistics
+
+    rng = np.random.default_rng(8)
+    arr1 = rng.normal(0.5, 0.1, 2000)
+    arr2 = rng.normal(0.52, 0.1, 2000)
+
+    results = compute_statistics(arr1, arr2, sequential=True)
+
+    # Confidence sequences are wider than the fixed-horizon interval
+    assert results["cs_lower"] < results["ci_lower"]
+    assert results["cs_upper"] > results["ci_upper"]
+    assert results["cs_lower"] > 0
+    assert results["always_valid_p_value"] < 0.05
+
+
+# Testing vectorised multi-metric statistics against the scalar path
+
+
+def test_metric_statistics_match_scalar_statistics():
+    import numpy as np
+    from src.models import MetricSummary
+    from src.statistics import compute_metric_statistics, compute_statistics
+
+    rng = np.random.default_rng(9)
+    names = ("click", "revenue", "latency")
+    values_A = np.column_stack(
+        [rng.binomial(1, 0.1, 400), rng.exponential(5, 400), rng.normal(80, 9, 400)]
+    ).astype(float)
+    values_B = np.column_stack(
+        [rng.binomial(1, 0.12, 300), rng.exponential(6, 300), rng.normal(78, 9, 300)]
+    ).astype(float)
+    values_B[::4, 1] = np.nan  # revenue missing for some requests
+
+    results = compute_metric_statistics(
+        MetricSummary.from_values(names, values_A),
+        MetricSummary.from_values(names, values_B),
+        confidence_level=0.9,
+    )
+
+    assert results["metrics"] == names
+    for i in range(len(names)):
+        column_B = values_B[:, i][~np.isnan(values_B[:, i])]
+        expected = compute_statistics(values_A[:, i], column_B, 0.9)
+        for key, value in expected.items():
+            assert abs(results[key][i] - value) < 1e-9
+
+
+def test_metric_statistics_need_two_observations_per_metric():
+    import numpy as np
+    from src.models import MetricSummary
+    from src.statistics import compute_metric_statistics
+
+    summary_A = MetricSummary.from_values(("x", "y"), [[1.0, np.nan], [2.0, 5.0]])
+    summary_B = MetricSummary.from_values(("x", "y"), [[3.0, 1.0], [3.0, 2.0]])
+
+    results = compute_metric_statistics(summary_A, summary_B)
+
+    assert results["ci_lower"][0] < results["delta"][0] < results["ci_upper"][0]
+    assert np.isnan(results["delta"][1])
+    assert results["n_A"].tolist() == [2, 1]
+
+
+# Testing binary metrics from success/trial counters
+
+
+def test_newcombe_interval_matches_published_example():
+    from src.statistics import calculate_newcombe_interval
+
+    # Newcombe (1998), example (a): 56/70 vs 48/80, method 10
+    lower, upper = calculate_newcombe_interval(48, 80, 56, 70, 0.95)
+
+    assert abs(lower - 0.0524) < 1e-4
+    assert abs(upper - 0.3339) < 1e-4
+
+
+def test_compute_statistics_with_proportion_summaries():
+    import numpy as np
+    from scipy import stats
+    from src.models import ProportionSummary
+    from src.statistics import compute_statistics
+
+    summary_A = ProportionSummary(successes=120, trials=1000)
+    summary_B = ProportionSummary(successes=150, trials=1000)
+
+    results = compute_statistics(summary_A, summary_B)
+
+    pooled = 270 / 2000
+    z = 0.03 / np.sqrt(pooled * (1 - pooled) * (2 / 1000))
+    assert abs(results["mean_A"] - 0.12) < 1e-12
+    assert abs(results["delta"] - 0.03) < 1e-12
+    assert abs(results["z"] - z) < 1e-9
+    assert abs(results["p_value"] - 2 * stats.norm.sf(z)) < 1e-9
+    assert results["ci_lower"] < 0.03 < results["ci_upper"]
+    assert results["n_A"] == results["n_B"] == 1000
+
+    # All-zero outcomes give a degenerate but valid result
+    empty = compute_statistics(
+        ProportionSummary(successes=0, trials=50), ProportionSummary(0, 50)
+    )
+    assert empty["p_value"] == 1.0
+    assert empty["ci_lower"] <= 0 <= empty["ci_upper"]
+
+
+# Testing CUPED variance reduction from covariate co-moments
+
+
+def test_covariate_summary_matches_batch_moments():
+    import numpy as np
+    from src.models import CovariateSummary
+
+    rng = np.random.default_rng(10)
+    x = rng.normal(10, 2, 300)
+    y = 0.8 * x + rng.normal(0, 1, 300)
+
+    running = CovariateSummary()
+    for xi, yi in zip(x, y):
+        running.update(xi, yi)
+    running.update(100.0, -5.0)
+    running.remove(100.0, -5.0)
+    merged = CovariateSummary.from_values(x[:120], y[:120])
+    merged.merge(CovariateSummary.from_values(x[120:], y[120:]))
+    from_sums = CovariateSummary.from_sums(
+        300, x.sum(), y.sum(), x @ x, y @ y, x @ y
+    )
+
+    expected = CovariateSummary.from_values(x, y)
+    for summary in (running, merged, from_sums):
+        assert summary.n == expected.n
+        for field in ("mean_x", "mean_y", "m2_x", "m2_y", "c_xy"):
+            assert abs(getattr(summary, field) - getattr(expected, field)) < 1e-6
+
+
+def test_cuped_statistics_match_adjusted_outcomes():
+    import numpy as np
+    from src.models import CovariateSummary
+    from src.statistics import compute_statistics
+
+    rng = np.random.default_rng(11)
+    x_A, x_B = rng.normal(10, 2, 500), rng.normal(10, 2, 400)
+    y_A = 0.9 * x_A + rng.normal(0, 1, 500)
+    y_B = 0.9 * x_B + 0.3 + rng.normal(0, 1, 400)
+
+    raw = compute_statistics(y_A, y_B)
+    cuped = compute_statistics(
+        CovariateSummary.from_values(x_A, y_A), CovariateSummary.from_values(x_B, y_B)
+    )
+
+    # theta is the pooled within-variant slope; the adjusted test is the
+    # Welch test on y - theta (x - mean x)
+    theta = cuped["theta"]
+    x_mean = np.concatenate([x_A, x_B]).mean()
+    expected = compute_statistics(
+        y_A - theta * (x_A - x_mean), y_B - theta * (x_B - x_mean)
+    )
+    for key, value in expected.items():
+        assert abs(cuped[key] - value) < 1e-9
+
+    assert abs(theta - 0.9) < 0.05
+    assert cuped["ci_upper"] - cuped["ci_lower"] < (
+        raw["ci_upper"] - raw["ci_lower"]
+    ) / 2
+    assert cuped["variance_reduction"] > 0.7
+    assert cuped["ci_lower"] < 0.3 < cuped["ci_upper"]
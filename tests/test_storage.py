@@ -0,0 +1,785 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from src.aggregates import DEFAULT_RESOLUTIONS
+from src.database import get_engine, get_session_factory, init_db
+from src.db_models import DBRequest
+from src.ids import SEQUENCE_BITS, TIMESTAMP_SHIFT
+from src.models import (
+    MetricSummary,
+    ModelVariant,
+    Outcome,
+    OutcomeSummary,
+    ProportionSummary,
+    Request,
+)
+from src.request_log import FREE, VARIANT_CODES
+from src.storage import ConcurrentInMemoryStorage, DatabaseStorage, InMemoryStorage
+
+
+def _route(storage, request_id, variant):
+    storage.save_request(
+        Request(
+            request_id=request_id,
+            selected_model=variant,
+            input_data=None,
+            timestamp=time.time(),
+        )
+    )
+
+
+def _record(storage, request_id, value):
+    storage.save_outcome(
+        Outcome(request_id=request_id, outcome_value=value, timestamp=time.time())
+    )
+
+
+# Running aggregates should match a full rescan of the outcomes
+
+
+def test_variant_summary_matches_outcomes():
+    storage = InMemoryStorage()
+    rng = np.random.default_rng(0)
+
+    for i in range(500):
+        variant = ModelVariant.A if i % 3 else ModelVariant.B
+        _route(storage, i, variant)
+        _record(storage, i, float(rng.normal(1.0, 2.0)))
+
+    for variant in ModelVariant:
+        values = storage.get_outcomes_by_variant(variant)
+        summary = storage.get_variant_summary(variant)
+
+        assert summary.n == len(values)
+        assert abs(summary.mean - np.mean(values)) < 1e-9
+        assert abs(summary.variance - np.var(values, ddof=1)) < 1e-9
+
+
+# Overwriting an outcome should replace, not double count, its value
+
+
+def test_overwritten_outcome_is_not_double_counted():
+    storage = InMemoryStorage()
+    _route(storage, 1, ModelVariant.A)
+    _route(storage, 2, ModelVariant.A)
+    _record(storage, 1, 1.0)
+    _record(storage, 2, 3.0)
+    _record(storage, 1, 5.0)
+
+    summary = storage.get_variant_summary(ModelVariant.A)
+    assert summary.n == 2
+    assert abs(summary.mean - 4.0) < 1e-9
+    assert abs(summary.variance - 2.0) < 1e-9
+
+
+# Merging summaries should equal summarising the concatenated data
+
+
+def test_summary_merge_and_from_sums():
+    left = [1.0, 2.0, 4.0]
+    right = [8.0, 16.0]
+
+    merged = OutcomeSummary.from_values(left)
+    merged.merge(OutcomeSummary.from_values(right))
+    combined = left + right
+
+    from_sums = OutcomeSummary.from_sums(
+        len(combined), sum(combined), sum(v * v for v in combined)
+    )
+
+    for summary in (merged, from_sums):
+        assert summary.n == 5
+        assert abs(summary.mean - np.mean(combined)) < 1e-9
+        assert abs(summary.variance - np.var(combined, ddof=1)) < 1e-9
+
+
+def _sqlite_session_factory():
+    engine = get_engine("sqlite://")
+    init_db(engine)
+    return get_session_factory(engine)
+
+
+def _count_requests(session_factory):
+    with session_factory() as session:
+        return session.execute(select(func.count()).select_from(DBRequest)).scalar()
+
+
+# Writes are buffered and become visible in the database after a flush
+
+
+def test_database_storage_buffers_until_flush():
+    session_factory = _sqlite_session_factory()
+    storage = DatabaseStorage(session_factory, batch_size=10_000, flush_interval=60)
+
+    _route(storage, 1, ModelVariant.A)
+    assert _count_requests(session_factory) == 0
+
+    # Buffered requests are still readable before they are written
+    assert storage.get_request(1).selected_model == ModelVariant.A
+
+    storage.flush()
+    assert _count_requests(session_factory) == 1
+    assert storage.get_request(1).selected_model == ModelVariant.A
+    storage.close()
+
+
+# A full buffer wakes the background flusher without any explicit call
+
+
+def test_database_storage_flushes_on_batch_size(tmp_path):
+    # A second engine on the same file counts rows over its own connection,
+    # so it does not race the flusher on a shared one
+    url = f"sqlite:///{tmp_path / 'krisis.db'}"
+    engine = get_engine(url)
+    init_db(engine)
+    storage = DatabaseStorage(
+        get_session_factory(engine), batch_size=50, flush_interval=60
+    )
+    counter = get_session_factory(get_engine(url))
+
+    for i in range(50):
+        _route(storage, i, ModelVariant.A)
+
+    # Written long before the 60s flush interval
+    deadline = time.time() + 5
+    while _count_requests(counter) < 50 and time.time() < deadline:
+        time.sleep(0.01)
+    assert _count_requests(counter) == 50
+    storage.close()
+
+
+# A row the database rejects does not hold back the rest of its batch
+
+
+def test_database_storage_isolates_rejected_rows():
+    session_factory = _sqlite_session_factory()
+    storage = DatabaseStorage(
+        session_factory, batch_size=10_000, flush_interval=60, max_row_attempts=2
+    )
+    _route(storage, 1, ModelVariant.A)
+    storage.flush()
+
+    # A duplicate primary key among valid rows
+    for i in range(10):
+        _route(storage, i + 1, ModelVariant.B)
+        _record(storage, i + 1, float(i))
+    storage.flush()
+    assert _count_requests(session_factory) == 10
+    assert storage.dead_letters == []
+
+    # Rejected again by the next flush (reads flush too), and given up on
+    # after max_row_attempts flushes
+    assert len(storage.get_all_outcomes()) == 10
+    assert [request.request_id for request in storage.dead_letters] == [1]
+
+    _route(storage, 11, ModelVariant.A)
+    storage.flush()
+    assert _count_requests(session_factory) == 11
+    storage.close()
+
+
+# Outcomes read back from the database match what was recorded
+
+
+def test_database_storage_outcomes_by_variant():
+    session_factory = _sqlite_session_factory()
+
+    with DatabaseStorage(session_factory, flush_interval=0.01) as storage:
+        for i in range(20):
+            variant = ModelVariant.A if i % 2 else ModelVariant.B
+            _route(storage, i, variant)
+            _record(storage, i, float(i))
+        # Overwrite one outcome before it is flushed and one after
+        _record(storage, 1, 100.0)
+        storage.flush()
+        _record(storage, 3, 300.0)
+
+        outcomes_A = storage.get_outcomes_by_variant(ModelVariant.A)
+        outcomes_B = storage.get_outcomes_by_variant(ModelVariant.B)
+
+        assert sorted(outcomes_A) == sorted(
+            [100.0, 300.0, 5.0, 7.0, 9.0, 11.0, 13.0, 15.0, 17.0, 19.0]
+        )
+        assert sorted(outcomes_B) == [float(i) for i in range(0, 20, 2)]
+        assert len(storage.get_all_outcomes()) == 20
+
+
+# Grouped SQL aggregates should agree with the raw outcome rows
+
+
+def test_database_storage_summaries_are_aggregated_in_sql():
+    session_factory = _sqlite_session_factory()
+    rng = np.random.default_rng(1)
+
+    with DatabaseStorage(session_factory, experiment_id="exp-1") as storage:
+        for i in range(200):
+            variant = ModelVariant.A if i % 4 else ModelVariant.B
+            _route(storage, i, variant)
+            _record(storage, i, float(rng.normal(10.0, 3.0)))
+
+        # Rows of another experiment must not leak into the aggregates
+        with DatabaseStorage(session_factory, experiment_id="exp-2") as other:
+            _route(other, "other", ModelVariant.A)
+            _record(other, "other", 1e6)
+
+        summaries = storage.get_variant_summaries()
+        for variant in ModelVariant:
+            values = storage.get_outcomes_by_variant(variant)
+            assert summaries[variant].n == len(values)
+            assert abs(summaries[variant].mean - np.mean(values)) < 1e-9
+            assert abs(summaries[variant].variance - np.var(values, ddof=1)) < 1e-6
+
+
+# Concurrent writers and lock-free evidence readers stay consistent
+
+
+def test_concurrent_storage_under_threads():
+    storage = ConcurrentInMemoryStorage(num_shards=8)
+    n_threads, per_thread = 8, 2000
+    errors = []
+    done = threading.Event()
+
+    def writer(thread_id):
+        for i in range(per_thread):
+            request_id = f"{thread_id}-{i}"
+            variant = ModelVariant.A if i % 2 else ModelVariant.B
+            _route(storage, request_id, variant)
+            _record(storage, request_id, float(i % 2))
+
+    def reader():
+        try:
+            while not done.is_set():
+                storage.get_variant_summaries()
+                storage.get_outcomes_by_variant(ModelVariant.A)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    writers = [threading.Thread(target=writer, args=(t,)) for t in range(n_threads)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert not errors
+    summaries = storage.get_variant_summaries()
+    assert summaries[ModelVariant.A].n == n_threads * per_thread // 2
+    assert summaries[ModelVariant.B].n == n_threads * per_thread // 2
+    assert summaries[ModelVariant.A].mean == 1.0
+    assert summaries[ModelVariant.B].mean == 0.0
+    assert len(storage.get_all_outcomes()) == n_threads * per_thread
+
+
+# Snowflake ids, whose low bits are almost always zero, spread over all shards
+
+
+def test_concurrent_storage_spreads_snowflake_ids():
+    storage = ConcurrentInMemoryStorage(num_shards=8)
+    # One id per millisecond: sequence 0 on node 3
+    request_ids = [(ms << TIMESTAMP_SHIFT) | (3 << SEQUENCE_BITS) for ms in range(800)]
+    for request_id in request_ids:
+        _route(storage, request_id, ModelVariant.A)
+    storage.save_outcomes(request_ids, np.ones(len(request_ids)), time.time())
+
+    for shard in storage._shards:
+        assert 50 <= len(shard.store.outcomes) <= 150
+    assert storage.get_variant_summaries()[ModelVariant.A].n == 800
+
+
+# Batches take each shard lock once; writes republish only what they changed
+
+
+class _CountingLock:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+
+    def __enter__(self):
+        self.acquired += 1
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+
+def test_concurrent_storage_batches_and_publishing():
+    storage = ConcurrentInMemoryStorage(num_shards=4)
+    locks = [_CountingLock() for _ in storage._shards]
+    for shard, lock in zip(storage._shards, locks):
+        shard.lock = lock
+
+    request_ids = list(range(1000))
+    storage.save_requests([Request(i, ModelVariant.A, None, 0.0) for i in request_ids])
+    assert [lock.acquired for lock in locks] == [1, 1, 1, 1]
+    storage.save_outcomes(request_ids, np.ones(1000), time.time())
+    assert [lock.acquired for lock in locks] == [2, 2, 2, 2]
+    assert storage.get_variant_summaries()[ModelVariant.A].n == 1000
+
+    # Outcomes without metrics leave the metric snapshot alone
+    shard = storage._shard(0)
+    metric_snapshot = shard.metric_snapshot
+    storage.save_outcome(Outcome(0, 2.0, time.time()))
+    assert shard.metric_snapshot is metric_snapshot
+    storage.save_outcome(Outcome(0, 3.0, time.time(), {"clicks": 1.0}))
+    assert shard.metric_snapshot is not metric_snapshot
+    assert storage.get_metric_summaries()[ModelVariant.A].n.tolist() == [1]
+    # Overwriting it without metrics backs the metric out
+    storage.save_outcome(Outcome(0, 4.0, time.time()))
+    assert storage.get_metric_summaries()[ModelVariant.A].n.tolist() == [0]
+    assert storage.get_variant_summaries()[ModelVariant.A].mean == pytest.approx(
+        (999 + 4.0) / 1000
+    )
+
+
+# The columnar request log behaves like the dict of Request objects
+
+
+def test_columnar_storage_matches_dict_storage():
+    dict_storage = InMemoryStorage()
+    columnar_storage = InMemoryStorage(columnar=True, chunk_size=64)
+    rng = np.random.default_rng(2)
+
+    for i in range(500):
+        variant = ModelVariant.A if rng.random() < 0.4 else ModelVariant.B
+        request = Request(
+            request_id=i, selected_model=variant, input_data=i, timestamp=i * 0.5
+        )
+        dict_storage.save_request(request)
+        columnar_storage.save_request(request)
+        if i % 3:
+            value = float(rng.normal())
+            for storage in (dict_storage, columnar_storage):
+                _record(storage, i, value)
+
+    assert columnar_storage.requests[7] == dict_storage.requests[7]
+    assert len(columnar_storage.requests) == 500
+    assert columnar_storage.get_request(-1) is None
+    for variant in ModelVariant:
+        assert columnar_storage.get_outcomes_by_variant(
+            variant
+        ) == dict_storage.get_outcomes_by_variant(variant)
+        assert columnar_storage.get_variant_summary(
+            variant
+        ) == dict_storage.get_variant_summary(variant)
+
+
+# Payloads can be dropped and fully deleted chunks are released
+
+
+def test_columnar_log_without_inputs_releases_chunks():
+    from src.request_log import ColumnarRequestLog
+
+    log = ColumnarRequestLog(chunk_size=100, store_input=False)
+    for i in range(250):
+        log[i] = Request(
+            request_id=i, selected_model=ModelVariant.B, input_data="x", timestamp=0.0
+        )
+
+    assert log[10].input_data is None
+    assert log.nbytes() == 3 * 100 * (1 + 8 + 8 + 8)
+
+    for i in range(100):
+        del log[i]
+
+    assert len(log) == 150
+    assert 5 not in log
+    assert log.nbytes() == 2 * 100 * (1 + 8 + 8 + 8)
+    assert log.get_variant(150) == ModelVariant.B
+
+
+# Unresolved requests are evicted once they leave the attribution window
+
+
+def test_attribution_window_evicts_unresolved_requests():
+    storage = InMemoryStorage(columnar=True, chunk_size=64, attribution_window=10.0)
+
+    for i in range(1000):
+        storage.save_request(
+            Request(
+                request_id=i,
+                selected_model=ModelVariant.A,
+                input_data=None,
+                timestamp=i * 0.1,
+            )
+        )
+        # Every tenth request gets its outcome right away
+        if i % 10 == 0:
+            _record(storage, i, 1.0)
+
+    # Memory is bounded by rate x window, not by the number of requests
+    unresolved = [rid for rid in storage.requests if rid not in storage.outcomes]
+    assert len(unresolved) <= 10.0 / 0.1 * (1 + 1 / storage.EVICTION_BUCKETS) + 1
+    assert storage.metrics["evicted_requests"] == 1000 - 100 - len(unresolved)
+
+    # Resolved requests survive eviction
+    assert storage.get_request(0) is not None
+    assert storage.get_variant_summary(ModelVariant.A).n == 100
+
+
+# Late outcomes for evicted ids are reported distinctly from unknown ids
+
+
+def test_late_outcome_is_reported(use_storage):
+    from src import core
+    from src.storage import LateOutcomeError
+
+    storage = use_storage(InMemoryStorage(attribution_window=1.0))
+    storage.save_request(
+        Request(
+            request_id=1,
+            selected_model=ModelVariant.B,
+            input_data=None,
+            timestamp=0.0,
+        )
+    )
+    storage.save_request(
+        Request(
+            request_id=2,
+            selected_model=ModelVariant.B,
+            input_data=None,
+            timestamp=1.5,
+        )
+    )
+
+    with pytest.raises(LateOutcomeError):
+        core.record_delayed_outcome(1, 1.0)
+    with pytest.raises(ValueError) as excinfo:
+        core.record_delayed_outcome(-1, 1.0)
+    assert not isinstance(excinfo.value, LateOutcomeError)
+    core.record_delayed_outcome(2, 1.0)
+
+    assert storage.metrics["late_outcomes"] == 1
+
+
+# Bulk outcome ingestion matches recording outcomes one by one
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        InMemoryStorage,
+        lambda: InMemoryStorage(columnar=True, chunk_size=64),
+        lambda: ConcurrentInMemoryStorage(num_shards=4),
+        # Requests are partly persisted, partly still buffered
+        lambda: DatabaseStorage(_sqlite_session_factory(), batch_size=100),
+    ],
+)
+def test_bulk_outcomes_match_single_outcomes(make_storage):
+    single, bulk = InMemoryStorage(), make_storage()
+    rng = np.random.default_rng(3)
+
+    for i in range(300):
+        variant = ModelVariant.A if rng.random() < 0.5 else ModelVariant.B
+        for storage in (single, bulk):
+            _route(storage, i, variant)
+
+    # Two batches: the second overwrites some outcomes and repeats an id
+    batches = [
+        (list(range(200)) + [-1], rng.normal(size=201)),
+        (list(range(150, 300)) + [299], rng.normal(size=151)),
+    ]
+    for request_ids, values in batches:
+        unknown = bulk.save_outcomes(request_ids, values, time.time())
+        assert unknown == ([-1] if -1 in request_ids else [])
+        for request_id, value in zip(request_ids, values):
+            if request_id != -1:
+                _record(single, request_id, float(value))
+
+    # Variants resolve in bulk, FREE for unknown ids
+    expected_codes = [
+        VARIANT_CODES[single.get_request(i).selected_model] for i in range(300)
+    ]
+    codes = bulk.get_variant_codes(list(range(300)) + [-1])
+    assert codes.tolist() == expected_codes + [FREE]
+
+    for variant in ModelVariant:
+        expected = single.get_variant_summary(variant)
+        actual = bulk.get_variant_summary(variant)
+        assert actual.n == expected.n
+        assert abs(actual.mean - expected.mean) < 1e-9
+        assert abs(actual.m2 - expected.m2) < 1e-6
+        assert sorted(bulk.get_outcomes_by_variant(variant)) == sorted(
+            single.get_outcomes_by_variant(variant)
+        )
+
+
+# Named outcome metrics are aggregated per variant alongside the outcome
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        InMemoryStorage,
+        lambda: InMemoryStorage(columnar=True, chunk_size=64),
+        lambda: ConcurrentInMemoryStorage(num_shards=4),
+        lambda: DatabaseStorage(_sqlite_session_factory(), batch_size=50),
+    ],
+)
+def test_metric_summaries_match_recorded_metrics(make_storage):
+    storage = make_storage()
+    rng = np.random.default_rng(4)
+    recorded = {}
+
+    for i in range(200):
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        _route(storage, i, variant)
+        metrics = {"revenue": float(rng.exponential(3.0))}
+        if i % 3:
+            metrics["click"] = float(rng.integers(0, 2))
+        recorded[i] = (variant, metrics)
+        storage.save_outcome(Outcome(i, 1.0, time.time(), metrics))
+
+    # Overwrites back out the metrics of the replaced outcome
+    for i in range(0, 200, 7):
+        metrics = {"click": 1.0}
+        recorded[i] = (recorded[i][0], metrics)
+        storage.save_outcome(Outcome(i, 1.0, time.time(), metrics))
+
+    summaries = storage.get_metric_summaries()
+    for variant in ModelVariant:
+        rows = [
+            [metrics.get("revenue", np.nan), metrics.get("click", np.nan)]
+            for v, metrics in recorded.values()
+            if v == variant
+        ]
+        expected = MetricSummary.from_values(("revenue", "click"), rows)
+        actual = summaries[variant].aligned(expected.names)
+        assert actual.n.tolist() == expected.n.tolist()
+        assert np.allclose(actual.mean, expected.mean)
+        assert np.allclose(actual.m2, expected.m2)
+
+
+# Binary metrics keep success/trial counters only
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        lambda: InMemoryStorage(metric_type="binary"),
+        lambda: InMemoryStorage(metric_type="binary", columnar=True, chunk_size=64),
+        lambda: ConcurrentInMemoryStorage(num_shards=4, metric_type="binary"),
+        lambda: DatabaseStorage(
+            _sqlite_session_factory(), experiment_id="exp", metric_type="binary"
+        ),
+    ],
+)
+def test_binary_storage_keeps_counters(make_storage):
+    storage = make_storage()
+    rng = np.random.default_rng(5)
+    expected = {variant: [0, 0] for variant in ModelVariant}
+    values = {}
+
+    for i in range(300):
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        _route(storage, i, variant)
+        values[i] = (variant, float(rng.random() < 0.3))
+
+    for request_id, (_, value) in list(values.items())[:200]:
+        _record(storage, request_id, value)
+    # Bulk path, overwriting some of the outcomes recorded above
+    bulk_ids = list(range(150, 300))
+    bulk_values = rng.integers(0, 2, len(bulk_ids)).astype(float)
+    storage.save_outcomes(bulk_ids, bulk_values, time.time())
+    for request_id, value in zip(bulk_ids, bulk_values):
+        values[request_id] = (values[request_id][0], float(value))
+
+    for variant, value in values.values():
+        expected[variant][0] += int(value)
+        expected[variant][1] += 1
+
+    with pytest.raises(ValueError):
+        _record(storage, 0, 0.5)
+    with pytest.raises(ValueError):
+        storage.save_outcomes([1, 2], [1.0, 2.0], time.time())
+
+    summaries = storage.get_variant_summaries()
+    for variant in ModelVariant:
+        assert isinstance(summaries[variant], ProportionSummary)
+        assert [summaries[variant].successes, summaries[variant].trials] == (
+            expected[variant]
+        )
+    if isinstance(storage, DatabaseStorage):
+        storage.close()
+
+
+# Windowed summaries only include outcomes recorded inside the window
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        lambda: InMemoryStorage(time_buckets=DEFAULT_RESOLUTIONS),
+        lambda: InMemoryStorage(
+            columnar=True, chunk_size=64, time_buckets=DEFAULT_RESOLUTIONS
+        ),
+        lambda: ConcurrentInMemoryStorage(
+            num_shards=4, time_buckets=DEFAULT_RESOLUTIONS
+        ),
+        lambda: DatabaseStorage(_sqlite_session_factory(), experiment_id="exp"),
+    ],
+)
+def test_window_summaries(make_storage):
+    storage = make_storage()
+    day = 86400.0
+    for i in range(60):
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        _route(storage, i, variant)
+        # Outcomes spread over three days, one per request
+        storage.save_outcome(Outcome(i, float(i), (i % 3) * day + 30.0))
+    # Bulk outcomes and an overwrite moving request 0 from day 0 to day 2
+    storage.save_outcomes([0], [100.0], 2 * day + 60.0)
+
+    day_one = storage.get_window_summaries(day, 2 * day)
+    assert sum(summary.n for summary in day_one.values()) == 20
+    day_two = storage.get_window_summaries(start=2 * day)
+    assert sum(summary.n for summary in day_two.values()) == 21
+    assert day_two[ModelVariant.B].n == 11
+    everything = storage.get_window_summaries()
+    assert sum(summary.n for summary in everything.values()) == 60
+
+    if isinstance(storage, DatabaseStorage):
+        storage.close()
+
+
+# Per-segment summaries agree with grouping the raw outcomes
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        lambda: InMemoryStorage(max_segment_values=3),
+        lambda: InMemoryStorage(columnar=True, chunk_size=64, max_segment_values=3),
+        lambda: ConcurrentInMemoryStorage(num_shards=4, max_segment_values=3),
+        lambda: DatabaseStorage(_sqlite_session_factory(), experiment_id="exp"),
+    ],
+)
+def test_segment_summaries(make_storage):
+    storage = make_storage()
+    rng = np.random.default_rng(6)
+    countries = ["DE", "FR", "US", "BR", "IN"]
+    expected = {}
+
+    for i in range(400):
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        country = countries[i % 5]
+        segments = {"country": country} if i % 10 else None
+        storage.save_request(Request(i, variant, None, time.time(), segments=segments))
+
+    values = rng.normal(size=400)
+    for i in range(300):
+        _record(storage, i, float(values[i]))
+    # Bulk outcomes, overwriting some recorded above
+    storage.save_outcomes(list(range(250, 400)), values[250:] + 1.0, time.time())
+
+    capped = not isinstance(storage, DatabaseStorage)
+    for i in range(400):
+        if i % 10 == 0:
+            continue
+        country = countries[i % 5]
+        # Request 0 has no segments, so FR, US and BR are admitted first
+        if capped and country not in ("FR", "US", "BR"):
+            country = "__other__"
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        value = values[i] + (1.0 if i >= 250 else 0.0)
+        expected.setdefault((country, variant), []).append(value)
+
+    segments = storage.get_segment_summaries("country")
+    assert set(segments) == {country for country, _ in expected}
+    for (country, variant), cell_values in expected.items():
+        summary = segments[country][variant]
+        assert summary.n == len(cell_values)
+        assert abs(summary.mean - np.mean(cell_values)) < 1e-9
+        assert abs(summary.variance - np.var(cell_values, ddof=1)) < 1e-6
+    assert storage.get_segment_summaries("platform") == {}
+
+    if isinstance(storage, DatabaseStorage):
+        assert storage.get_request(1).segments == {"country": "FR"}
+        storage.close()
+
+
+# CUPED co-moments agree with the covariates and outcomes recorded
+
+
+@pytest.mark.parametrize(
+    "make_storage",
+    [
+        lambda: InMemoryStorage(),
+        lambda: InMemoryStorage(columnar=True, chunk_size=64),
+        lambda: ConcurrentInMemoryStorage(num_shards=4),
+        lambda: DatabaseStorage(_sqlite_session_factory(), experiment_id="exp"),
+    ],
+)
+def test_covariate_summaries(make_storage):
+    from src.models import CovariateSummary
+
+    storage = make_storage()
+    rng = np.random.default_rng(12)
+    covariates = rng.normal(5, 1, 300)
+    values = covariates + rng.normal(size=300)
+
+    for i in range(300):
+        variant = ModelVariant.A if i % 2 else ModelVariant.B
+        # Every seventh request is routed without a covariate
+        covariate = None if i % 7 == 0 else float(covariates[i])
+        storage.save_request(
+            Request(i, variant, None, time.time(), covariate=covariate)
+        )
+
+    for i in range(150):
+        _record(storage, i, float(values[i]) - 10.0)
+    # Bulk outcomes, overwriting some recorded above
+    storage.save_outcomes(list(range(100, 300)), values[100:], time.time())
+    _record(storage, 1, float(values[1]))
+
+    final = values.copy()
+    final[2:100] -= 10.0
+
+    summaries = storage.get_covariate_summaries()
+    for variant, parity in ((ModelVariant.A, 1), (ModelVariant.B, 0)):
+        rows = [i for i in range(300) if i % 2 == parity and i % 7]
+        expected = CovariateSummary.from_values(covariates[rows], final[rows])
+        summary = summaries[variant]
+        assert summary.n == expected.n
+        for field in ("mean_x", "mean_y", "m2_x", "m2_y", "c_xy"):
+            assert abs(getattr(summary, field) - getattr(expected, field)) < 1e-6
+
+    if isinstance(storage, DatabaseStorage):
+        assert storage.get_request(1).covariate == covariates[1]
+        storage.close()
+
+
+# Requests are expired by id range, together with their outcomes
+
+
+def test_database_expire_requests():
+    from src import ids
+
+    storage = DatabaseStorage(_sqlite_session_factory(), experiment_id="exp")
+    other = DatabaseStorage(storage.session_factory, experiment_id="other")
+    generator = ids.IdGenerator()
+    old = generator.next_ids(50)
+    time.sleep(0.01)
+    cutoff = time.time()
+    new = generator.next_ids(30)
+
+    for request_id in old + new:
+        _route(storage, request_id, ModelVariant.A)
+        _record(storage, request_id, 1.0)
+    for request_id in old:
+        _route(other, request_id + 1_000_000, ModelVariant.A)
+
+    assert storage.expire_requests(cutoff) == 50
+    assert storage.get_request(old[0]) is None
+    assert storage.get_request(new[0]) is not None
+    assert storage.get_variant_summary(ModelVariant.A).n == 30
+    # Other experiments keep their requests
+    assert other.get_request(old[0] + 1_000_000) is not None
+    storage.close()
+    other.close()
@@ -0,0 +1,147 @@
+import errno
+import glob
+import os
+import time
+
+import pytest
+
+from src.models import ModelVariant, Outcome
+from src.wal import checkpoint, open_storage
+
+
+def _state(storage):
+    summaries = storage.get_variant_summaries()
+    covariates = storage.get_covariate_summaries()
+    return (
+        len(storage.requests),
+        {v: (s.n, round(s.mean, 9), round(s.m2, 9)) for v, s in summaries.items()},
+        {v: (s.n, round(s.c_xy, 9)) for v, s in covariates.items()},
+        {
+            value: {v: s.n for v, s in cell.items()}
+            for value, cell in storage.get_segment_summaries("country").items()
+        },
+        {v: s.n for v, s in storage.get_metric_summaries().items()},
+    )
+
+
+# Reopening the directory replays every logged write
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_replay_restores_state(tmp_path, columnar, populate):
+    directory = str(tmp_path / "wal")
+    storage = open_storage(directory, segment_bytes=1024, columnar=columnar)
+    request_ids = populate(storage, 300, seed=0)
+    storage.wal.close()
+    # Small segments rotate at every group commit
+    assert len(glob.glob(os.path.join(directory, "wal-*.log"))) > 1
+
+    restored = open_storage(directory, columnar=columnar)
+    assert _state(restored) == _state(storage)
+    assert restored.outcomes[request_ids[0]].outcome_value == 0.0
+    assert restored.get_request(request_ids[-1]).segments is not None
+    restored.wal.close()
+
+
+# A checkpoint compacts the log into a snapshot and deletes old segments
+
+
+def test_checkpoint_compacts_log(tmp_path, populate):
+    directory = str(tmp_path / "wal")
+    storage = open_storage(directory, segment_bytes=4096, columnar=True)
+    populate(storage, 300, seed=1)
+    snapshot = checkpoint(storage)
+    request_ids = populate(storage, 100, seed=2)
+    storage.save_outcome(Outcome(request_ids[0], 5.0, time.time()))
+    storage.wal.close()
+
+    files = sorted(os.listdir(directory))
+    assert [name for name in files if name.endswith(".snap")] == [
+        os.path.basename(snapshot)
+    ]
+    # Only segments written after the snapshot remain
+    number = os.path.basename(snapshot).split("-")[1].split(".")[0]
+    assert all(name >= f"wal-{number}" for name in files if name.startswith("wal-"))
+
+    restored = open_storage(directory)
+    assert _state(restored) == _state(storage)
+    assert restored.outcomes[request_ids[0]].outcome_value == 5.0
+    restored.wal.close()
+
+
+# A record torn by a crash is dropped; everything before it survives
+
+
+def test_torn_tail_is_truncated(tmp_path, populate):
+    directory = str(tmp_path / "wal")
+    storage = open_storage(directory)
+    populate(storage, 50, seed=3)
+    storage.wal.sync()
+    expected = _state(storage)
+    storage.wal.close()
+
+    (segment,) = glob.glob(os.path.join(directory, "wal-*.log"))
+    with open(segment, "ab") as handle:
+        handle.write(b"\x02\x18\x00\x00\x00partial")
+
+    restored = open_storage(directory)
+    assert _state(restored) == expected
+    assert restored.get_variant_summary(ModelVariant.A).n > 0
+    restored.wal.close()
+
+    # The tail was truncated, so the segment can be followed by new ones
+    again = open_storage(directory)
+    assert _state(again) == expected
+    again.wal.close()
+
+
+# A failed group commit keeps its records and retries them after the last
+# good block, without killing the background syncer
+
+
+class _FullDisk:
+    # Wraps a segment file; while full, writes store half their bytes and fail
+    def __init__(self, file):
+        self.file = file
+        self.full = True
+        self.failures = 0
+
+    def write(self, data):
+        if self.full:
+            self.failures += 1
+            half = len(data) // 2
+            self.file.write(data[:half])
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_failed_commit_is_retried(tmp_path, populate, caplog):
+    directory = str(tmp_path / "wal")
+    storage = open_storage(directory, sync_interval=0.01)
+    populate(storage, 100, seed=4)
+    storage.wal.sync()
+    disk = _FullDisk(storage.wal._file)
+    with storage.wal._sync_lock:
+        storage.wal._file = disk
+    request_ids = populate(storage, 100, seed=5)
+
+    deadline = time.monotonic() + 5
+    while disk.failures < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert disk.failures >= 2
+    assert "Group commit of the write-ahead log failed" in caplog.text
+    assert storage.wal._syncer.is_alive()
+    with pytest.raises(OSError):
+        storage.wal.sync()
+
+    disk.full = False
+    storage.save_outcome(Outcome(request_ids[-1], 7.0, time.time()))
+    storage.wal.close()
+
+    restored = open_storage(directory)
+    assert _state(restored) == _state(storage)
+    assert restored.outcomes[request_ids[-1]].outcome_value == 7.0
+    restored.wal.close()